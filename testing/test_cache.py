@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+from os.path import join, exists
+from xdoctest import utils
+
+
+def test_last_failed():
+    """
+    pytest testing/test_cache.py::test_last_failed -s
+    """
+    from xdoctest import runner
+    from xdoctest import cache as xdoc_cache
+    import os
+
+    source = utils.codeblock(
+        '''
+        def ok1():
+            """
+                Example:
+                    >>> print('running ok1')
+            """
+
+        def bad():
+            """
+                Example:
+                    >>> import os
+                    >>> print('running bad')
+                    >>> assert os.environ.get('XDOCTEST_TEST_LAST_FAILED')
+            """
+
+        def ok2():
+            """
+                Example:
+                    >>> print('running ok2')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        cache_dir = join(dpath, '.xdoctest_cache')
+        modpath = join(dpath, 'test_last_failed.py')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                cache_dir=cache_dir)
+        assert run_summary['n_failed'] == 1
+        assert exists(join(cache_dir, '.gitignore'))
+        lastfailed = xdoc_cache.Cache(cache_dir).get('lastfailed')
+        assert list(lastfailed.keys()) == [run_summary['failed'][0].node]
+
+        # Only the failed doctest is rerun
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                cache_dir=cache_dir,
+                                                last_failed=True)
+        assert run_summary['n_total'] == 1
+        assert 'running bad' in cap.text
+        assert 'running ok1' not in cap.text
+
+        # The failed doctest runs first
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                cache_dir=cache_dir,
+                                                failed_first=True)
+        assert run_summary['n_total'] == 3
+        assert cap.text.index('running bad') < cap.text.index('running ok1')
+        assert cap.text.index('running ok1') < cap.text.index('running ok2')
+
+        # Fixing the doctest clears it from the cache
+        os.environ['XDOCTEST_TEST_LAST_FAILED'] = '1'
+        try:
+            with utils.CaptureStdout() as cap:
+                run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                    cache_dir=cache_dir,
+                                                    last_failed=True)
+        finally:
+            os.environ.pop('XDOCTEST_TEST_LAST_FAILED')
+        assert run_summary['n_total'] == 1
+        assert run_summary['n_passed'] == 1
+        assert xdoc_cache.Cache(cache_dir).get('lastfailed') == {}
+
+        # Without failures everything is run
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                cache_dir=cache_dir,
+                                                last_failed=True)
+        assert run_summary['n_total'] == 3
+        assert 'no previously failed tests' in cap.text
+
+
+
+def test_pass_cache():
+    """
+    pytest testing/test_cache.py::test_pass_cache -s
+    """
+    from xdoctest import runner
+
+    source = utils.codeblock(
+        '''
+        def cached():
+            """
+                Example:
+                    >>> print('running cached')
+            """
+
+        def conditional():
+            """
+                Example:
+                    >>> # xdoctest: +REQUIRES(POSIX)
+                    >>> print('running conditional')
+            """
+
+        def bad():
+            """
+                Example:
+                    >>> print('running bad')
+                    >>> assert False
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        cache_dir = join(dpath, '.xdoctest_cache')
+        modpath = join(dpath, 'test_pass_cache.py')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        kw = dict(argv=[''], cache_dir=cache_dir, pass_cache=True)
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', **kw)
+        assert run_summary['n_cached'] == 0
+        assert run_summary['n_failed'] == 1
+
+        # Only the doctest without conditions that passed is cached
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', **kw)
+        assert run_summary['n_cached'] == 1
+        assert run_summary['n_total'] == 2
+        assert 'CACHED-PASS' in cap.text
+        assert '1 cached-pass' in cap.text
+        assert 'running bad' in cap.text
+        assert 'running cached' not in cap.text
+
+        # Changing the config invalidates the cached result
+        config = {'timeout': 100}
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', config=config,
+                                                **kw)
+        assert run_summary['n_cached'] == 0
+
+        # The cache can be cleared
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', config=config,
+                                                clear_pass_cache=True, **kw)
+        assert run_summary['n_cached'] == 0
+        assert 'running cached' in cap.text
+
+
+def test_collection_cache():
+    """
+    pytest testing/test_cache.py::test_collection_cache -s
+    """
+    from xdoctest import runner
+    from xdoctest import core
+    from xdoctest import cache as xdoc_cache
+    import os
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        cache_dir = join(dpath, '.xdoctest_cache')
+        modpath = join(dpath, 'test_collection_cache.py')
+        badpath = join(dpath, 'test_collection_cache_warn.py')
+
+        with open(modpath, 'w') as file:
+            file.write(utils.codeblock(
+                """
+                def func1():
+                    '''
+                    >>> print('running func1')
+                    '''
+                """))
+        # The docstring of this module cannot be parsed
+        with open(badpath, 'w') as file:
+            file.write(utils.codeblock(
+                """
+                def func():
+                    '''
+                    >>> x = (
+                    '''
+                """))
+
+        kw = dict(argv=[''], cache_dir=cache_dir, collection_cache=True)
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', **kw)
+        assert run_summary['n_passed'] == 1
+
+        # Warm runs load the examples without parsing the module
+        coll_cache = xdoc_cache.CollectionCache(cache_dir)
+        orig = core.parse_calldefs
+        core.parse_calldefs = None
+        try:
+            with utils.CaptureStdout() as cap:
+                run_summary = runner.doctest_module(modpath, 'all', **kw)
+            assert run_summary['n_passed'] == 1
+            assert 'running func1' in cap.text
+        finally:
+            core.parse_calldefs = orig
+
+        # Modified modules are parsed again
+        with open(modpath, 'a') as file:
+            file.write('\n\n' + utils.codeblock(
+                """
+                def func2():
+                    '''
+                    >>> print('running func2')
+                    '''
+                """))
+        st = os.stat(modpath)
+        os.utime(modpath, (st.st_atime, st.st_mtime + 10))
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', **kw)
+        assert run_summary['n_passed'] == 2
+        # The stale entry was replaced without leaving temporary files
+        refreshed = coll_cache.load(modpath, style='auto', analysis='auto',
+                                    parser_kw={})
+        assert len(refreshed) == 2
+        for _, _, fnames in os.walk(cache_dir):
+            assert not [fname for fname in fnames if fname.endswith('.tmp')]
+
+        # Modules that produce warnings are not cached
+        examples = list(core.parse_doctestables(
+            badpath, collection_cache=coll_cache))
+        assert coll_cache.load(badpath, style='auto', analysis='auto',
+                               parser_kw={}) is None
+        assert coll_cache.load(modpath, style='auto', analysis='auto',
+                               parser_kw={}) is not None
+        assert examples == []
+
+
+def test_code_cache(monkeypatch):
+    """
+    pytest testing/test_cache.py::test_code_cache -s
+    """
+    from xdoctest import runner
+    from xdoctest import cache as xdoc_cache
+    import os
+
+    compiled = []
+
+    def _logged_compile(source, *args, **kwargs):
+        compiled.append(source)
+        return compile(source, *args, **kwargs)
+    monkeypatch.setattr(xdoc_cache, 'compile', _logged_compile, raising=False)
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        cache_dir = join(dpath, '.xdoctest_cache')
+        modpath = join(dpath, 'test_code_cache.py')
+        with open(modpath, 'w') as file:
+            file.write(utils.codeblock(
+                """
+                def func1():
+                    '''
+                    >>> x = 1
+                    >>> print('running func1', x)
+                    running func1 1
+                    '''
+                """))
+
+        kw = dict(argv=[''], cache_dir=cache_dir, code_cache=True)
+        with utils.CaptureStdout():
+            run_summary = runner.doctest_module(modpath, 'all', **kw)
+        assert run_summary['n_passed'] == 1
+        assert len(compiled) == 2
+        assert exists(join(cache_dir, 'code'))
+
+        # Parts compiled by this process are reused from memory
+        with utils.CaptureStdout():
+            run_summary = runner.doctest_module(modpath, 'all', **kw)
+        assert run_summary['n_passed'] == 1
+        assert len(compiled) == 2
+
+        # Other processes load them from disk
+        xdoc_cache._CODE_MEMO.clear()
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', **kw)
+        assert run_summary['n_passed'] == 1
+        assert 'running func1 1' in cap.text
+        assert len(compiled) == 2
+
+        # Unreadable entries are recompiled and replaced
+        code_fpaths = [join(root, fname)
+                       for root, _, fnames in os.walk(join(cache_dir, 'code'))
+                       for fname in fnames]
+        for fpath in code_fpaths:
+            with open(fpath, 'wb') as file:
+                file.write(b'garbage')
+        xdoc_cache._CODE_MEMO.clear()
+        with utils.CaptureStdout():
+            run_summary = runner.doctest_module(modpath, 'all', **kw)
+        assert run_summary['n_passed'] == 1
+        assert len(compiled) == 4
+        for fpath in code_fpaths:
+            with open(fpath, 'rb') as file:
+                assert file.read() != b'garbage'
+        for _, _, fnames in os.walk(join(cache_dir, 'code')):
+            assert not [fname for fname in fnames if fname.endswith('.tmp')]
+
+
+if __name__ == '__main__':
+    """
+    CommandLine:
+        pytest testing/test_cache.py -s
+    """
+    import xdoctest
+    xdoctest.doctest_module(__file__)
@@ -319,6 +319,122 @@ def test_oneliner():
             doctests[0].run()
 
 
+def test_marker_prefilter(monkeypatch):
+    """
+    Modules that cannot contain doctests of the given style are not parsed.
+
+    pytest testing/test_core.py::test_marker_prefilter -s
+    """
+    from xdoctest import static_analysis
+    parsed = []
+    parse_static_calldefs = static_analysis.parse_static_calldefs
+
+    def _logged_parse(source=None, fpath=None):
+        parsed.append(fpath)
+        return parse_static_calldefs(source=source, fpath=fpath)
+    monkeypatch.setattr(static_analysis, 'parse_static_calldefs',
+                        _logged_parse)
+
+    sources = {
+        'has_ps1.py': '''
+            def foo():
+                """
+                >>> print('foo')
+                """
+            ''',
+        'has_header.py': '''
+            def bar():
+                """
+                Example:
+                    print('bar')
+                """
+            ''',
+        'no_doctest.py': '''
+            def baz():
+                """ Writes >> to a file """
+            ''',
+        'empty.py': '',
+    }
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'prefilter_pkg')
+        import os
+        os.makedirs(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        for fname, source in sources.items():
+            with open(join(dpath, fname), 'w') as file:
+                file.write(utils.codeblock(source))
+
+        parsed[:] = []
+        examples = list(core.parse_doctestables(dpath, style='freeform'))
+        assert [ex.callname for ex in examples] == ['foo']
+        assert sorted(map(os.path.basename, parsed)) == ['has_ps1.py']
+
+        # Google-style blocks are found by their header alone
+        parsed[:] = []
+        examples = list(core.parse_doctestables(dpath, style='auto'))
+        assert sorted(ex.callname for ex in examples) == ['bar', 'foo']
+        assert sorted(map(os.path.basename, parsed)) == [
+            'has_header.py', 'has_ps1.py']
+
+        # Without a style every module is parsed
+        parsed[:] = []
+        list(core.package_calldefs(dpath))
+        assert len(parsed) == 5
+
+
+def test_collect_jobs():
+    """
+    Collecting modules in worker processes gives the same doctests, warnings,
+    and errors as collecting them serially.
+
+    pytest testing/test_core.py::test_collect_jobs -s
+    """
+    import os
+    import warnings
+    import pytest
+    template = utils.codeblock(
+        '''
+        def func_{num}():
+            """
+            >>> print({num})
+            {num}
+            """
+        ''')
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'collect_jobs_pkg')
+        os.makedirs(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        for num in range(6):
+            with open(join(dpath, 'mod{}.py'.format(num)), 'w') as file:
+                file.write(template.format(num=num))
+        with open(join(dpath, 'broken.py'), 'w') as file:
+            file.write('def func(:\n    """\n    >>> pass\n    """\n')
+
+        def _collect(**kw):
+            with warnings.catch_warnings(record=True) as warnlist:
+                warnings.simplefilter('always')
+                examples = list(core.parse_doctestables(dpath, **kw))
+            return examples, [str(w.message) for w in warnlist]
+
+        serial, serial_warns = _collect()
+        parallel, parallel_warns = _collect(collect_jobs=3)
+        assert len(serial) == 6
+        assert [ex.node for ex in parallel] == [ex.node for ex in serial]
+        assert parallel_warns == serial_warns
+        assert any('Cannot parse module' in msg for msg in parallel_warns)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            calldefs = list(core.package_calldefs(dpath, collect_jobs=3))
+            assert [modpath for _, modpath in calldefs] == [
+                modpath for _, modpath in core.package_calldefs(dpath)]
+
+        with pytest.raises(SyntaxError):
+            _collect(collect_jobs=3, ignore_syntax_errors=False)
+
+
 def test_delayed_want_pass_cases():
     """
     The delayed want algorithm allows a want statement to match trailing
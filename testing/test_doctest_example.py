@@ -281,6 +281,165 @@ def test_want_error_msg_failure():
         self.run(on_error='raise')
 
 
+def test_module_globals_isolated():
+    """
+    Doctests see the names of their module, but cannot modify the module.
+
+    pytest testing/test_doctest_example.py::test_module_globals_isolated
+    """
+    from os.path import join
+    from xdoctest import core
+    source = utils.codeblock(
+        '''
+        CONST = 10
+
+        def helper():
+            return CONST
+
+        def func_layered():
+            """
+            >>> CONST = CONST + 1
+            >>> def inner():
+            ...     return CONST + helper()
+            >>> print(inner(), [CONST for _ in range(1)], EXTRA)
+            21 [11] extra
+            >>> del helper
+            >>> print('helper' in globals(), __name__)
+            False layered_globals_mod
+            """
+
+        def func_class():
+            """
+            >>> class Foo(object):
+            ...     value = CONST
+            >>> print(Foo.value, EXTRA)
+            10 extra
+            """
+        ''')
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'layered_globals_mod.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+        examples = list(core.parse_doctestables(modpath))
+        assert len(examples) == 2
+        for self in examples:
+            # Module names take precedence over the global namespace
+            self.global_namespace.update({'EXTRA': 'extra', 'CONST': -1})
+            result = self.run(on_error='raise', verbose=0)
+            assert result['passed']
+            assert self.module.CONST == 10
+            assert self.module.helper() == 10
+
+
+
+def test_capture_fd():
+    """
+    Output written directly to the file descriptors is captured with fd
+    capture, and stderr is shown when the doctest fails.
+
+    pytest testing/test_doctest_example.py::test_capture_fd
+    """
+    import pytest
+    import six
+    if six.PY2:
+        pytest.skip('fd capture requires Python 3')
+    string = utils.codeblock(
+        r'''
+        >>> import os, subprocess, sys
+        >>> _ = os.write(1, b'raw fd\n')
+        raw fd
+        >>> _ = subprocess.call([sys.executable, '-c', 'print("child")'])
+        child
+        >>> _ = os.write(2, b'to stderr\n')
+        >>> print('got')
+        want
+        ''')
+    self = doctest_example.DocTest(docsrc=string)
+    self.config['capture'] = 'fd'
+    result = self.run(on_error='return', verbose=0)
+    assert result['failed']
+    assert self.logged_stdout[0] == 'raw fd\n'
+    assert self.logged_stdout[1] == 'child\n'
+    assert self.logged_stderr[2] == 'to stderr\n'
+    fail_text = '\n'.join(self.repr_failure())
+    assert 'to stderr' in fail_text
+    assert 'Got:' in fail_text and 'want' in fail_text
+
+
+def test_max_capture_bytes():
+    """
+    Only the head and tail of the output are logged, but a want is checked
+    against the full output of its part.
+
+    pytest testing/test_doctest_example.py::test_max_capture_bytes
+    """
+    import six
+    string = utils.codeblock(
+        r'''
+        >>> print('start ' + 'x' * 1000 + ' end')
+        >>> print('a' * 1000)
+        aaa...aaa
+        >>> print('head ' + 'y' * 1000 + ' tail')
+        nope
+        ''')
+    captures = ['sys', 'fd'] if six.PY3 else ['sys']
+    for capture in captures:
+        self = doctest_example.DocTest(docsrc=string)
+        self.config['capture'] = capture
+        self.config['max_capture_bytes'] = 20
+        result = self.run(on_error='return', verbose=0)
+        assert result['failed']
+        assert self.failed_part is self._parts[2]
+        assert self.logged_stdout[0].startswith('start xxxx')
+        assert self.logged_stdout[0].endswith('xxxx end\n')
+        assert '<... 991 bytes truncated ...>' in self.logged_stdout[0]
+        assert len(self.logged_stdout[1]) < 100
+        fail_text = '\n'.join(self.repr_failure())
+        assert 'bytes truncated' in fail_text
+        assert 'y' * 100 not in fail_text
+
+    # A want can match the full output of earlier parts without a want
+    string = utils.codeblock(
+        r'''
+        >>> print('x' * 40)
+        >>> print('y')
+        xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx
+        y
+        ''')
+    for capture in captures:
+        self = doctest_example.DocTest(docsrc=string)
+        self.config['capture'] = capture
+        self.config['max_capture_bytes'] = 20
+        result = self.run(on_error='return', verbose=0)
+        assert result['passed']
+        assert '<... 21 bytes truncated ...>' in self.logged_stdout[0]
+
+
+def test_skipped_run_resets_state():
+    """
+    A doctest that is skipped without running does not keep the state of an
+    earlier run.
+
+    pytest testing/test_doctest_example.py::test_skipped_run_resets_state
+    """
+    string = utils.codeblock(
+        '''
+        >>> # xdoctest: +REQUIRES(module:not_a_real_module)
+        >>> import not_a_real_module
+        ''')
+    self = doctest_example.DocTest(docsrc=string)
+    self.mode = 'native'
+    # Pretend an earlier run left state behind
+    self.warn_list = ['stale warning']
+    self.global_namespace['stale'] = 1
+    self._unmatched_stdout = ['stale output']
+    result = self.run(on_error='return', verbose=0)
+    assert result['skipped']
+    assert self.warn_list is None
+    assert self.global_namespace == {}
+    assert self._unmatched_stdout == []
+
+
 if __name__ == '__main__':
     """
     CommandLine:
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+from os.path import join
+from xdoctest import utils
+
+
+def _git(dpath, *args):
+    import subprocess
+    subprocess.check_call(
+        ['git', '-c', 'user.name=xdoctest', '-c', 'user.email=xdoctest@test',
+         '-c', 'commit.gpgsign=false'] + list(args),
+        cwd=dpath, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def test_changed_since():
+    """
+    pytest testing/test_import_graph.py::test_changed_since -s
+    """
+    from xdoctest import runner
+    import os
+    import pytest
+    try:
+        _git('.', '--version')
+    except Exception:
+        pytest.skip('requires git')
+
+    template = utils.codeblock(
+        '''
+        {imports}
+
+        def func_{name}():
+            """
+                Example:
+                    >>> print('running {name}')
+            """
+        ''')
+    sources = {
+        'base.py': template.format(name='base', imports=''),
+        'direct.py': template.format(name='direct',
+                                     imports='from . import base'),
+        'indirect.py': template.format(name='indirect',
+                                       imports='import changed_pkg.direct'),
+        'unrelated.py': template.format(name='unrelated', imports='import os'),
+    }
+
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'changed_pkg')
+        os.makedirs(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        for fname, source in sources.items():
+            with open(join(dpath, fname), 'w') as file:
+                file.write(source)
+
+        _git(temp.dpath, 'init', '-q')
+        _git(temp.dpath, 'add', '.')
+        _git(temp.dpath, 'commit', '-q', '-m', 'initial')
+
+        with open(join(dpath, 'base.py'), 'a') as file:
+            file.write('\nCHANGED = True\n')
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(dpath, 'all', argv=[''],
+                                                changed_since='HEAD')
+
+        assert run_summary['n_total'] == 3
+        assert 'running base' in cap.text
+        assert 'running direct' in cap.text
+        assert 'running indirect' in cap.text
+        assert 'running unrelated' not in cap.text
+
+        # Nothing changed since the working tree
+        _git(temp.dpath, 'commit', '-q', '-a', '-m', 'second')
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(dpath, 'all', argv=[''],
+                                                changed_since='HEAD')
+        assert run_summary['n_total'] == 0
+
+        # Bad references are an error
+        with pytest.raises(RuntimeError):
+            with utils.CaptureStdout() as cap:
+                runner.doctest_module(dpath, 'all', argv=[''],
+                                      changed_since='not-a-ref')
+
+
+def test_changed_since_bad_ref_cli(capsys):
+    """
+    pytest testing/test_import_graph.py::test_changed_since_bad_ref_cli -s
+    """
+    from xdoctest import __main__
+    import pytest
+    try:
+        _git('.', '--version')
+    except Exception:
+        pytest.skip('requires git')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'bad_ref_mod.py')
+        with open(modpath, 'w') as file:
+            file.write(utils.codeblock(
+                '''
+                def func():
+                    """
+                    >>> print('running func')
+                    """
+                '''))
+        _git(temp.dpath, 'init', '-q')
+        _git(temp.dpath, 'add', '.')
+        _git(temp.dpath, 'commit', '-q', '-m', 'initial')
+
+        # A bad reference is reported like any other bad argument
+        with pytest.raises(SystemExit) as exc_info:
+            __main__.main(['xdoctest', modpath, 'all',
+                           '--changed-since', 'not-a-ref'])
+        assert exc_info.value.code == 2
+        captured = capsys.readouterr()
+        assert 'Traceback' not in captured.err
+        assert 'running func' not in captured.out
+        errlines = [line for line in captured.err.splitlines()
+                    if 'error' in line]
+        assert len(errlines) == 1
+        assert '--changed-since not-a-ref' in errlines[0]
+
+
+if __name__ == '__main__':
+    """
+    CommandLine:
+        pytest testing/test_import_graph.py -s
+    """
+    import xdoctest
+    xdoctest.doctest_module(__file__)
@@ -723,6 +723,83 @@ def test_gh_issue_25_parsing_failure():
     assert len(parts) == 1
 
 
+
+def test_long_multiline_statement():
+    """
+    Completing a long statement should tokenize each line once
+
+    pytest testing/test_parser.py::test_long_multiline_statement
+    """
+    n = 300
+    string = '\n'.join(
+        ['>>> x = ['] +
+        ['>>>     {},'.format(i) for i in range(n)] +
+        ['>>> ]', '>>> # comment', '>>> print(len(x))', str(n)])
+    self = parser.DoctestParser()
+    parts = self.parse(string)
+    assert len(parts) == 2
+    assert len(parts[0].exec_lines) == n + 3
+    assert parts[1].want == str(n)
+
+
+def test_comment_like_line_in_string():
+    """
+    A line inside a multiline string that looks like a comment does not
+    begin a statement.
+
+    pytest testing/test_parser.py::test_comment_like_line_in_string
+    """
+    string = utils.codeblock(
+        """
+        >>> s = \'\'\'
+        ... # not a comment \'\'\'
+        >>> t = \'\'\'
+        ... \'\'\'
+        >>> print(len(s))
+        18
+        """)
+    self = parser.DoctestParser()
+    source_lines = [line for line in string.splitlines()[:-1]]
+    ps1_linenos, mode_hint = self._locate_ps1_linenos(source_lines)
+    assert ps1_linenos == [0, 2, 4]
+    assert mode_hint == 'eval'
+
+
+
+def test_tokenize_once(monkeypatch):
+    """
+    Each statement is tokenized once and the tokens are shared by all stages
+    of the parser.
+
+    pytest testing/test_parser.py::test_tokenize_once
+    """
+    import tokenize
+    string = utils.codeblock(
+        '''
+        >>> x = [1,
+        ...      2]  # xdoctest: +SKIP
+        >>> # xdoctest: +REQUIRES(--foo)
+        >>> a = 1; b = 2
+        >>> a; b
+        2
+        ''')
+    calls = []
+    orig = tokenize.generate_tokens
+
+    def _counted(readline):
+        calls.append(readline)
+        return orig(readline)
+
+    monkeypatch.setattr(tokenize, 'generate_tokens', _counted)
+    self = parser.DoctestParser()
+    parts = self.parse(string)
+    directives = [list(map(str, p.directives)) for p in parts]
+    assert len(calls) == 4
+    assert directives == [['<Directive(+SKIP)>'],
+                          ['<Directive(+REQUIRES(--foo))>'], []]
+    assert parts[-1].compile_mode == 'single'
+
+
 if __name__ == '__main__':
     """
     CommandLine:
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from os.path import join
 from xdoctest import utils
+import sys
 
 
 def test_zero_args():
@@ -410,6 +411,820 @@ def test_hack_the_sys_argv():
     assert '1 passed' in cap.text
 
 
+def test_parallel_jobs():
+    """
+    pytest testing/test_runner.py::test_parallel_jobs -s
+    """
+    from xdoctest import runner
+    import os
+
+    source1 = utils.codeblock(
+        '''
+        def foo():
+            """
+                Example:
+                    >>> print('output of foo')
+            """
+
+        def bar():
+            """
+                Example:
+                    >>> import warnings
+                    >>> warnings.warn('a warning in bar')
+            """
+        ''')
+
+    source2 = utils.codeblock(
+        '''
+        def baz():
+            """
+                Example:
+                    >>> assert 1 == 2
+            """
+
+        def biz():
+            """
+                Example:
+                    >>> # xdoctest: +SKIP
+                    >>> print('skipped')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'test_parallel_pkg')
+        os.makedirs(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        with open(join(dpath, 'mod1.py'), 'w') as file:
+            file.write(source1)
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source2)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(dpath, 'all', argv=[''],
+                                                verbose=3, jobs=2)
+
+    assert run_summary['n_total'] == 4
+    assert run_summary['n_passed'] == 2
+    assert run_summary['n_failed'] == 1
+    assert run_summary['n_skipped'] == 1
+    assert len(run_summary['warned']) == 1
+    assert len(run_summary['times']) == 4
+    assert 'output of foo' in cap.text
+    assert 'a warning in bar' in cap.text
+    assert 'assert 1 == 2' in cap.text
+    assert 'mod2.py baz:0' in cap.text
+    assert '1 failed, 2 passed, 1 skipped, 1 warnings' in cap.text
+
+
+def test_isolate_fork():
+    """
+    pytest testing/test_runner.py::test_isolate_fork -s
+    """
+    from xdoctest import runner
+    import os
+    import pytest
+    if not hasattr(os, 'fork'):
+        pytest.skip('requires os.fork')
+
+    source = utils.codeblock(
+        '''
+        STATE = []
+
+        def mutate():
+            """
+                Example:
+                    >>> STATE.append(1)
+                    >>> print('mutated state')
+            """
+
+        def check():
+            """
+                Example:
+                    >>> assert STATE == []
+            """
+
+        def crash():
+            """
+                Example:
+                    >>> import os, signal
+                    >>> os.kill(os.getpid(), signal.SIGKILL)
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        modpath = join(dpath, 'test_isolate_fork.py')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                verbose=3, isolate='fork')
+
+    assert run_summary['n_passed'] == 2
+    assert run_summary['n_failed'] == 1
+    assert 'mutated state' in cap.text
+    assert 'was killed by signal' in cap.text
+    assert 'test_isolate_fork.py crash:0' in cap.text
+
+
+def test_stream():
+    """
+    pytest testing/test_runner.py::test_stream -s
+    """
+    from xdoctest import runner
+    from xdoctest import core
+    import os
+
+    template = utils.codeblock(
+        '''
+        def func_{name}():
+            """
+                Example:
+                    >>> print('running {name}')
+            """
+
+        def warns_{name}():
+            """
+                Example:
+                    >>> import warnings
+                    >>> warnings.warn('a warning in {name}')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'test_stream_pkg')
+        os.makedirs(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        for name in ['mod1', 'mod2']:
+            with open(join(dpath, name + '.py'), 'w') as file:
+                file.write(template.format(name=name))
+
+        orig = core.parse_calldefs
+
+        def _logged_parse_calldefs(module_identifier, *args, **kw):
+            print('collecting {}'.format(os.path.basename(module_identifier)))
+            return orig(module_identifier, *args, **kw)
+
+        core.parse_calldefs = _logged_parse_calldefs
+        try:
+            with utils.CaptureStdout() as cap:
+                run_summary = runner.doctest_module(dpath, 'all', argv=[''],
+                                                    stream=True)
+        finally:
+            core.parse_calldefs = orig
+
+    text = cap.text
+    # The first module runs before the second one is collected
+    first, second = sorted(['mod1', 'mod2'], key=lambda name: text.index(
+        'collecting {}.py'.format(name)))
+    assert (text.index('running ' + first) <
+            text.index('collecting {}.py'.format(second)) <
+            text.index('running ' + second))
+    assert run_summary['n_total'] == 4
+    assert run_summary['n_passed'] == 4
+    assert len(run_summary['warned']) == 2
+    assert 'running test(s) as they are collected' in text
+    assert '4 passed, 2 warnings' in text
+
+
+def test_timeout():
+    """
+    pytest testing/test_runner.py::test_timeout -s
+    """
+    from xdoctest import runner
+    import os
+    import pytest
+    if os.name != 'posix':
+        pytest.skip('timeouts require SIGALRM')
+
+    source = utils.codeblock(
+        '''
+        def hangs():
+            """
+                Example:
+                    >>> import time
+                    >>> # xdoctest: +TIMEOUT(0.1)
+                    >>> print('before the hang')
+                    >>> time.sleep(10)
+                    >>> print('never printed')
+            """
+
+        def hangs_without_limit():
+            """
+                Example:
+                    >>> import time
+                    >>> time.sleep(10)
+            """
+
+        def fast():
+            """
+                Example:
+                    >>> # xdoctest: +TIMEOUT(10)
+                    >>> print('fast is fine')
+            """
+        ''')
+
+    config = {'timeout': 1.0}
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        modpath = join(dpath, 'test_timeout.py')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                config=config, verbose=3)
+
+    assert run_summary['n_failed'] == 2
+    assert run_summary['n_passed'] == 1
+    assert 'Timed out after 0.1 seconds' in cap.text
+    assert 'Doctest timed out after 1 seconds' in cap.text
+    assert 'never printed' not in cap.text.replace(
+        ">>> print('never printed')", '')
+    assert 'fast is fine' in cap.text
+
+
+
+def test_memory():
+    """
+    pytest testing/test_runner.py::test_memory -s
+    """
+    from xdoctest import runner
+    import pytest
+    tracemalloc = pytest.importorskip('tracemalloc')
+    if not hasattr(tracemalloc, 'reset_peak'):
+        pytest.skip('memory accounting requires tracemalloc.reset_peak')
+
+    source = utils.codeblock(
+        '''
+        def small():
+            """
+                Example:
+                    >>> x = [0]
+            """
+
+        def large():
+            """
+                Example:
+                    >>> x = [0]
+                    >>> data = bytearray(10 ** 7)
+                    >>> del data
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        modpath = join(dpath, 'test_memory.py')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                memory=1)
+
+    assert run_summary['n_passed'] == 2
+    assert not tracemalloc.is_tracing()
+    usages = {result.node.split('::')[-1]: usage
+              for result, usage in run_summary['memory'].items()}
+    assert usages['large:0']['peak'] >= 10 ** 7
+    assert usages['small:0']['peak'] < 10 ** 6
+    assert max(part['peak'] for part in
+               usages['large:0']['parts'].values()) >= 10 ** 7
+    lines = [line for line in cap.text.splitlines()
+             if line.startswith('memory: ')]
+    assert len(lines) == 1
+    assert lines[0].endswith('large:0')
+    assert '(line ' in lines[0]
+
+
+
+def test_profile():
+    """
+    pytest testing/test_runner.py::test_profile -s
+    """
+    from xdoctest import runner
+    import pstats
+
+    source = utils.codeblock(
+        '''
+        def work():
+            """
+                Example:
+                    >>> import json
+                    >>> data = [json.dumps([i]) for i in range(100)]
+                    >>> print(len(data))
+                    100
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        cache_dir = join(dpath, '.xdoctest_cache')
+        modpath = join(dpath, 'test_profile.py')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                cache_dir=cache_dir,
+                                                profile=0)
+
+        assert run_summary['n_passed'] == 1
+        fpaths = list(run_summary['profiles'].values())
+        assert len(fpaths) == 1
+        assert fpaths[0].startswith(join(cache_dir, 'profile'))
+        funcnames = {func[2] for func in pstats.Stats(fpaths[0]).stats}
+    assert 'dumps' in funcnames
+    assert 'profile: merged 1 pstats file(s)' in cap.text
+    assert 'json' in cap.text
+    # Time spent capturing stdout is not attributed to xdoctest
+    report = cap.text.split('profile: merged')[1]
+    assert 'xdoctest' not in report.replace('.xdoctest_cache', '')
+
+
+
+def test_report_jsonl():
+    """
+    pytest testing/test_runner.py::test_report_jsonl -s
+    """
+    from xdoctest import runner
+    import json
+
+    source = utils.codeblock(
+        '''
+        def ok():
+            """
+                Example:
+                    >>> print('ok')
+                    ok
+            """
+
+        def mismatch():
+            """
+                Example:
+                    >>> print('got this')
+                    want this
+            """
+
+        def error():
+            """
+                Example:
+                    >>> x = 1
+                    >>> raise ValueError('oops')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        modpath = join(dpath, 'test_report_jsonl.py')
+        report_fpath = join(dpath, 'report.jsonl')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        for jobs in [None, 2]:
+            with utils.CaptureStdout():
+                run_summary = runner.doctest_module(
+                    modpath, 'all', argv=[''], jobs=jobs,
+                    report_jsonl=report_fpath)
+            assert run_summary['n_failed'] == 2
+
+            with open(report_fpath) as file:
+                records = {}
+                for line in file:
+                    record = json.loads(line)
+                    records[record['node'].split('::')[-1]] = record
+
+            assert sorted(records) == ['error:0', 'mismatch:0', 'ok:0']
+            assert records['ok:0']['status'] == 'passed'
+            assert records['ok:0']['duration'] >= 0
+            assert records['mismatch:0']['status'] == 'failed'
+            assert records['mismatch:0']['got'].strip() == 'got this'
+            assert records['mismatch:0']['want'].strip() == 'want this'
+            assert records['error:0']['error'] == 'ValueError: oops'
+            assert records['error:0']['failed_lineno'] == 19
+
+
+
+def test_junitxml():
+    """
+    pytest testing/test_runner.py::test_junitxml -s
+    """
+    from xdoctest import runner
+    from xml.etree import ElementTree
+
+    source = utils.codeblock(
+        '''
+        def ok():
+            """
+                Example:
+                    >>> print('ok')
+                    ok
+            """
+
+        def bad():
+            """
+                Example:
+                    >>> raise ValueError('<oops> & "friends" \\U0001F600')
+            """
+
+        def skipped():
+            """
+                Example:
+                    >>> # xdoctest: +SKIP
+                    >>> raise ValueError('never')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        modpath = join(dpath, 'test_junitxml.py')
+        xml_fpath = join(dpath, 'junit.xml')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        for jobs in [None, 2]:
+            with utils.CaptureStdout():
+                runner.doctest_module(modpath, 'all', argv=[''], jobs=jobs,
+                                      junitxml=xml_fpath)
+
+            suite = ElementTree.parse(xml_fpath).getroot().find('testsuite')
+            assert suite.get('tests') == '3'
+            assert suite.get('failures') == '1'
+            assert suite.get('skipped') == '1'
+            cases = {case.get('name'): case
+                     for case in suite.findall('testcase')}
+            assert sorted(cases) == ['bad:0', 'ok:0', 'skipped:0']
+            assert cases['skipped:0'].find('skipped') is not None
+            assert cases['ok:0'].get('classname') == 'test_junitxml'
+            assert cases['ok:0'].find('failure') is None
+            failure = cases['bad:0'].find('failure')
+            # Characters outside of the basic multilingual plane are kept
+            assert failure.get('message') == (
+                'ValueError: <oops> & "friends" \U0001F600')
+            assert 'raise ValueError' in failure.text
+            assert '\x1b' not in failure.text
+            cmdline = cases['bad:0'].find('properties/property').get('value')
+            assert cmdline.endswith('bad:0')
+
+
+
+def test_compact_results():
+    """
+    Failed doctests do not keep the objects they created alive
+
+    pytest testing/test_runner.py::test_compact_results -s
+    """
+    from xdoctest import runner
+    from xdoctest import doctest_example
+    import gc
+
+    source = utils.codeblock(
+        '''
+        import weakref
+        REFS = []
+
+        def leaks():
+            """
+                Example:
+                    >>> class Big(object):
+                    ...     pass
+                    >>> def fails(obj):
+                    ...     raise ValueError('failed with a big object')
+                    >>> big = Big()
+                    >>> REFS.append(weakref.ref(big))
+                    >>> fails(big)
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        modpath = join(dpath, 'test_compact_results.py')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''])
+
+    assert run_summary['n_failed'] == 1
+    result = run_summary['failed'][0]
+    assert isinstance(result, doctest_example.DocTestResult)
+    assert 'failed with a big object' in '\n'.join(result.repr_failure())
+    assert 'failed with a big object' in cap.text
+    gc.collect()
+    refs = sys.modules['test_compact_results'].REFS
+    assert len(refs) == 1 and refs[0]() is None
+
+
+
+def test_shuffle_and_bisect_order():
+    """
+    pytest testing/test_runner.py::test_shuffle_and_bisect_order -s
+    """
+    from xdoctest import runner
+
+    source = utils.codeblock(
+        '''
+        STATE = []
+
+        def first():
+            """
+                Example:
+                    >>> print('first')
+            """
+
+        def polluter():
+            """
+                Example:
+                    >>> STATE.append(1)
+            """
+
+        def victim():
+            """
+                Example:
+                    >>> assert not STATE
+            """
+
+        def broken():
+            """
+                Example:
+                    >>> assert False
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        modpath = join(dpath, 'test_bisect_order.py')
+
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        # The same seed gives the same order
+        orders = []
+        for _ in range(2):
+            with utils.CaptureStdout() as cap:
+                run_summary = runner.doctest_module(modpath, 'all',
+                                                    argv=[''], shuffle=1)
+            assert run_summary['shuffle_seed'] == 1
+            assert 'seed 1' in cap.text
+            orders.append([result.node for result in run_summary['times']])
+        assert orders[0] == orders[1]
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                bisect_order=True)
+        assert run_summary['n_failed'] == 2
+        deps = run_summary['order_dependencies']
+        victim = deps[modpath + '::victim:0']
+        assert victim['status'] == 'order-dependent'
+        assert victim['culprits'] == [modpath + '::polluter:0']
+        assert deps[modpath + '::broken:0']['status'] == 'independent'
+        assert 'passes alone, but fails after' in cap.text
+
+        # A doctest that cannot be run is not mistaken for a failure
+        from xdoctest import bisect_order
+        missing = bisect_order.find_order_dependency(
+            modpath + '::missing:0', [modpath + '::polluter:0'], argv=[''])
+        assert missing['status'] == 'not-found'
+
+    # The culprits are minimal, even if they are far apart
+    def fails(nodes):
+        return {3, 11, 17}.issubset(nodes)
+    culprits = bisect_order.minimize_predecessors(99, list(range(20)), fails)
+    assert culprits == [3, 11, 17]
+
+
+def test_shuffle_cli():
+    """
+    The --shuffle flag does not consume the module argument after it
+
+    pytest testing/test_runner.py::test_shuffle_cli -s
+    """
+    from xdoctest import __main__
+
+    source = utils.codeblock(
+        '''
+        def func():
+            """
+                Example:
+                    >>> print('ok')
+                    ok
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_shuffle_cli.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        with utils.CaptureStdout() as cap:
+            retcode = __main__.main(['xdoctest', '--shuffle', modpath, 'all'])
+        assert retcode == 0
+        assert 'shuffling the order of the tests with seed' in cap.text
+
+        argv = ['xdoctest', '--shuffle-seed', '3', modpath, 'all']
+        with utils.CaptureStdout() as cap:
+            retcode = __main__.main(argv)
+        assert retcode == 0
+        assert 'shuffling the order of the tests with seed 3' in cap.text
+
+
+def test_bench():
+    """
+    pytest testing/test_runner.py::test_bench -s
+    """
+    from xdoctest import runner
+    import json
+
+    source = utils.codeblock(
+        '''
+        def total(items):
+            """
+            Example:
+                >>> total([1, 2])
+                3
+
+            Benchmark:
+                >>> items = list(range(100))
+                >>> # xdoctest: +BENCHMARK
+                >>> total(items)
+                4950
+            """
+            return sum(items)
+
+
+        def square(x):
+            """
+            Example:
+                >>> square(3)  # xdoctest: +BENCHMARK
+                9
+            """
+            return x * x
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        cache_dir = join(dpath, '.xdoctest_cache')
+        modpath = join(dpath, 'test_bench.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        # Benchmark blocks are not run by the other commands
+        with utils.CaptureStdout():
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''])
+        assert run_summary['n_passed'] == 2
+
+        kw = dict(argv=[''], cache_dir=cache_dir, bench_repeat=3)
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'bench', **kw)
+        assert run_summary['n_passed'] == 2
+        records = {r['key']: r for r in run_summary['benchmarks']}
+        assert set(records) == {'test_bench::total:1', 'test_bench::square:0'}
+        stats = records['test_bench::total:1']['stats']
+        assert 0 < stats['min'] <= stats['median'] and stats['iqr'] >= 0
+        assert '=== Benchmarks ===' in cap.text
+
+        baseline_fpath = join(cache_dir, 'benchmarks.json')
+        with open(baseline_fpath) as file:
+            baseline = json.load(file)['benchmarks']
+        assert set(baseline) == set(records)
+
+        # Pretend the benchmarks used to be much faster
+        for key in baseline:
+            baseline[key]['median'] /= 100
+        with open(baseline_fpath, 'w') as file:
+            json.dump({'version': 1, 'benchmarks': baseline}, file)
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'bench', **kw)
+        assert run_summary['n_regressed'] == 2
+        assert 'REGRESSED' in cap.text
+        # Regressions are not recorded as the new baseline
+        with open(baseline_fpath) as file:
+            assert json.load(file)['benchmarks'] == baseline
+
+
+def test_skipped_without_import():
+    """
+    Doctests whose parts are all skipped by directives are reported as
+    skipped without importing their module.
+
+    pytest testing/test_runner.py::test_skipped_without_import -s
+    """
+    from xdoctest import runner
+    import os
+
+    source = utils.codeblock(
+        '''
+        def needs_missing():
+            """
+            >>> # xdoctest: +REQUIRES(module:not_a_real_module)
+            >>> import not_a_real_module
+            """
+
+        def needs_flag():
+            """
+            >>> # xdoctest: +REQUIRES(--not-a-real-flag)
+            >>> print('flag')
+            """
+
+        def skipped():
+            """
+            >>> # xdoctest: +SKIP
+            >>> print('skipped')
+            """
+
+        def partially_skipped():
+            """
+            >>> x = 1  # xdoctest: +SKIP
+            >>> print('partial')
+            """
+
+        raise RuntimeError('the module must not be imported')
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_skipped_without_import.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        for isolate in [None, 'fork']:
+            if isolate == 'fork' and not hasattr(os, 'fork'):
+                continue
+            with utils.CaptureStdout():
+                run_summary = runner.doctest_module(
+                    modpath, 'all', argv=[''], isolate=isolate)
+            assert run_summary['n_skipped'] == 3
+            # Only the partially skipped doctest imports the module
+            assert run_summary['n_failed'] == 1
+            assert run_summary['n_passed'] == 0
+
+
+def test_import_failure_cached():
+    """
+    A module that fails to import is only imported once per run, and its
+    failures are reported together.
+
+    pytest testing/test_runner.py::test_import_failure_cached -s
+    """
+    from xdoctest import runner
+
+    source = utils.codeblock(
+        '''
+        import os
+        with open(os.environ['XDOCTEST_IMPORT_LOG'], 'a') as file:
+            file.write('imported\\n')
+
+        def func1():
+            """
+            >>> func1()
+            """
+
+        def func2():
+            """
+            >>> func2()
+            """
+
+        def func3():
+            """
+            >>> func3()
+            """
+
+        raise ValueError('this module is broken')
+        ''')
+
+    import os
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_import_failure_cached.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+        log_fpath = join(temp.dpath, 'imports.log')
+        os.environ['XDOCTEST_IMPORT_LOG'] = log_fpath
+        try:
+            for _ in range(2):
+                with utils.CaptureStdout() as cap:
+                    run_summary = runner.doctest_module(
+                        modpath, 'all', argv=[''])
+                assert run_summary['n_failed'] == 3
+                assert 'this module is broken' in cap.text
+                assert 'failed for 3 doctests' in cap.text
+                assert '=== Found 1 errors ===' in cap.text
+        finally:
+            del os.environ['XDOCTEST_IMPORT_LOG']
+        with open(log_fpath) as file:
+            # Once per run
+            assert file.read() == 'imported\n' * 2
+
+
 if __name__ == '__main__':
     """
     CommandLine:
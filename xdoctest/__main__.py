@@ -92,6 +92,32 @@ def main(argv=None):
     style = ns['style']
     durations = ns['durations']
     analysis = ns['analysis']
+    jobs = ns['jobs']
+    isolate = ns['isolate']
+    last_failed = ns['last_failed']
+    failed_first = ns['failed_first']
+    cache_dir = ns['cache_dir']
+    pass_cache = ns['pass_cache']
+    clear_pass_cache = ns['clear_pass_cache']
+    changed_since = ns['changed_since']
+    collection_cache = ns['collection_cache']
+    stream = ns['stream']
+    collect_jobs = ns['collect_jobs']
+    code_cache = ns['code_cache']
+    memory = ns['memory']
+    profile = ns['profile']
+    report_jsonl = ns['report_jsonl']
+    junitxml = ns['junitxml']
+    if ns['shuffle_seed'] is not None:
+        shuffle = ns['shuffle_seed']
+    else:
+        shuffle = True if ns['shuffle'] else None
+    bisect_order = ns['bisect_order']
+    bench_warmup = ns['bench_warmup']
+    bench_repeat = ns['bench_repeat']
+    bench_threshold = ns['bench_threshold']
+    bench_baseline = ns['bench_baseline']
+    bench_update = ns['bench_update']
     if ns['time']:
         durations = 0
     # ---
@@ -125,10 +151,10 @@ def main(argv=None):
         options = ''
         if exists('pytest.ini'):
             from six.moves import configparser
-            parser = configparser.ConfigParser()
-            parser.read('pytest.ini')
+            ini_parser = configparser.ConfigParser()
+            ini_parser.read('pytest.ini')
             try:
-                options = parser.get('pytest', 'xdoctest_options')
+                options = ini_parser.get('pytest', 'xdoctest_options')
             except configparser.NoOptionError:
                 pass
         ns['options'] = options
@@ -157,12 +183,42 @@ def main(argv=None):
             pass
         print('modname = {!r}'.format(modname))
 
-    run_summary = xdoctest.doctest_module(modname, argv=[command], style=style,
-                                          verbose=config['verbose'],
-                                          config=config, durations=durations,
-                                          analysis=analysis)
+    from xdoctest import import_graph
+    try:
+        run_summary = xdoctest.doctest_module(modname, argv=[command], style=style,
+                                              verbose=config['verbose'],
+                                              config=config, durations=durations,
+                                              analysis=analysis, jobs=jobs,
+                                              isolate=isolate,
+                                              last_failed=last_failed,
+                                              failed_first=failed_first,
+                                              cache_dir=cache_dir,
+                                              pass_cache=pass_cache,
+                                              clear_pass_cache=clear_pass_cache,
+                                              changed_since=changed_since,
+                                              collection_cache=collection_cache,
+                                              stream=stream,
+                                              collect_jobs=collect_jobs,
+                                              code_cache=code_cache,
+                                              memory=memory,
+                                              profile=profile,
+                                              report_jsonl=report_jsonl,
+                                              junitxml=junitxml,
+                                              shuffle=shuffle,
+                                              bisect_order=bisect_order,
+                                              bench_warmup=bench_warmup,
+                                              bench_repeat=bench_repeat,
+                                              bench_threshold=bench_threshold,
+                                              bench_baseline=bench_baseline,
+                                              bench_update=bench_update)
+    except import_graph.GitError as ex:
+        # An unusable --changed-since reference is reported as a bad argument
+        parser.error('--changed-since {}: {}'.format(
+            changed_since, str(ex).strip().splitlines()[-1]))
     n_failed = run_summary.get('n_failed', 0)
-    if n_failed > 0:
+    # Benchmarks that became slower than their baseline fail the run
+    n_regressed = run_summary.get('n_regressed', 0)
+    if n_failed > 0 or n_regressed > 0:
         return 1
     else:
         return 0
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmarks written as doctests.
+
+The ``bench`` command of the native runner (``xdoctest <pkg> bench``) runs
+the doctests in ``Benchmark:`` blocks and the doctests that use the
+``+BENCHMARK`` directive. Each of them is first run once like any other
+doctest, so its "wants" are still checked. If it passes, its timed parts are
+executed again in the same namespace: a few untimed warmup rounds, then the
+number of loops per round is calibrated (like :mod:`timeit`) and several
+rounds are timed. The minimum, median, and interquartile range (IQR) of the
+time per loop are reported.
+
+The timed parts are the parts where the ``BENCHMARK`` directive is enabled,
+or all parts of a ``Benchmark:`` block that does not use the directive. The
+earlier parts of the doctest act as untimed setup:
+
+.. code:: python
+
+    def total(items):
+        '''
+        Benchmark:
+            >>> items = list(range(1000))
+            >>> # xdoctest: +BENCHMARK
+            >>> total(items)
+            499500
+        '''
+        return sum(items)
+
+The results are stored in a json baseline file (``benchmarks.json`` in the
+cache directory by default). When a benchmark has a baseline, its median is
+compared against the baseline median and it is reported as a regression if
+it is slower by more than a threshold. Existing baselines are only replaced
+when requested (``--bench-update``), so regressions cannot slowly creep in.
+
+Example:
+    >>> from xdoctest.benchmark import *  # NOQA
+    >>> timer = BenchmarkTimer(warmup=1, repeat=5, min_time=0.001)
+    >>> code = compile('sorted(data)', '<bench>', 'eval')
+    >>> stats = timer.measure([(code, 'eval')], {'data': list(range(100))})
+    >>> print(sorted(stats.keys()))
+    ['iqr', 'median', 'min', 'number', 'repeat']
+    >>> assert 0 < stats['min'] <= stats['median']
+    >>> previous = dict(stats, median=stats['median'] / 2)
+    >>> print(is_regression(stats, previous, threshold=0.1))
+    True
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+from os.path import dirname, exists
+from timeit import default_timer
+import json
+from xdoctest import utils
+
+
+class BenchmarkTimer(object):
+    """
+    Times the parts of a doctest that has been run.
+
+    Args:
+        warmup (int, default=1): number of untimed rounds before the number
+            of loops per round is calibrated
+        repeat (int, default=7): number of timed rounds
+        min_time (float, default=0.02): the loops per round are increased
+            (1, 2, 5, 10, 20, ...) until a round takes at least this many
+            seconds
+    """
+
+    def __init__(self, warmup=1, repeat=7, min_time=0.02):
+        if repeat < 1:
+            raise ValueError('repeat must be at least 1')
+        self.warmup = warmup
+        self.repeat = repeat
+        self.min_time = min_time
+
+    def measure(self, parts, test_globals):
+        """
+        Executes the parts repeatedly and summarizes the time per loop.
+
+        Args:
+            parts (List[Tuple[CodeType, str]]): the compiled code and the
+                compile mode of each timed part, in order
+            test_globals (dict): the namespace of the doctest
+
+        Returns:
+            Dict: with the keys ``min``, ``median``, and ``iqr`` (seconds per
+                loop), ``number`` (loops per round), and ``repeat``
+
+        Example:
+            >>> code = compile('x.append(1)', '<bench>', 'exec')
+            >>> namespace = {'x': []}
+            >>> timer = BenchmarkTimer(warmup=2, repeat=3, min_time=0)
+            >>> stats = timer.measure([(code, 'exec')], namespace)
+            >>> print(stats['number'], stats['repeat'], len(namespace['x']))
+            1 3 6
+        """
+        def run_round(number):
+            # Output is counted but not kept
+            with utils.CaptureStdout(supress=True, max_bytes=0):
+                tic = default_timer()
+                for _ in range(number):
+                    for code, mode in parts:
+                        if mode == 'eval':
+                            eval(code, test_globals)
+                        else:
+                            exec(code, test_globals)
+                return default_timer() - tic
+
+        for _ in range(self.warmup):
+            run_round(1)
+        number = _calibrate(run_round, self.min_time)
+        times = [run_round(number) / number for _ in range(self.repeat)]
+        stats = summarize(times)
+        stats['number'] = number
+        stats['repeat'] = self.repeat
+        return stats
+
+
+def _calibrate(run_round, min_time):
+    """
+    Finds the number of loops that makes a round take at least ``min_time``
+    """
+    base = 1
+    while True:
+        for factor in (1, 2, 5):
+            number = base * factor
+            if run_round(number) >= min_time:
+                return number
+        base *= 10
+
+
+def summarize(times):
+    """
+    Computes the statistics reported for a benchmark.
+
+    Args:
+        times (List[float]): the time per loop of each round
+
+    Returns:
+        Dict[str, float]: the ``min``, ``median``, and interquartile range
+            (``iqr``) of the times
+
+    Example:
+        >>> stats = summarize([5.0, 1.0, 4.0, 2.0, 3.0])
+        >>> print(stats['min'], stats['median'], stats['iqr'])
+        1.0 3.0 2.0
+    """
+    times = sorted(times)
+    return {
+        'min': times[0],
+        'median': _percentile(times, 0.5),
+        'iqr': _percentile(times, 0.75) - _percentile(times, 0.25),
+    }
+
+
+def _percentile(sorted_values, q):
+    """
+    Linearly interpolated percentile of sorted values
+
+    Example:
+        >>> print(_percentile([1.0, 2.0, 3.0, 4.0], 0.5))
+        2.5
+    """
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    frac = pos - lower
+    return sorted_values[lower] * (1 - frac) + sorted_values[upper] * frac
+
+
+def is_benchmark(example):
+    """
+    Checks if a doctest is a benchmark, i.e. it is in a ``Benchmark:``
+    block or uses the ``+BENCHMARK`` directive.
+
+    Args:
+        example (xdoctest.doctest_example.DocTest): the doctest
+
+    Returns:
+        bool
+
+    Example:
+        >>> from xdoctest import core
+        >>> docstr = utils.codeblock(
+        ...     '''
+        ...     >>> x = 1
+        ...     >>> x + 1  # xdoctest: +BENCHMARK
+        ...     ''')
+        >>> example = list(core.parse_docstr_examples(docstr))[0]
+        >>> print(is_benchmark(example))
+        True
+        >>> example = list(core.parse_docstr_examples('>>> x = 1'))[0]
+        >>> print(is_benchmark(example))
+        False
+    """
+    block_type = example.block_type or ''
+    return (block_type.startswith('Benchmark') or
+            uses_benchmark_directive(example))
+
+
+def uses_benchmark_directive(example):
+    """
+    Checks if any part of a doctest enables the ``BENCHMARK`` directive
+
+    Returns:
+        bool
+    """
+    example._parse()
+    return any(directive.name == 'BENCHMARK' and directive.positive
+               for part in example._parts
+               for directive in part.directives)
+
+
+def benchmark_key(example):
+    """
+    The key of a benchmark in the baseline file. Unlike the node of the
+    doctest it does not depend on where the module is.
+
+    Returns:
+        str
+    """
+    return '{}::{}'.format(example.modname, example.unique_callname)
+
+
+def is_regression(stats, previous, threshold):
+    """
+    Checks if a benchmark became slower than its baseline.
+
+    Args:
+        stats (Dict): the new statistics
+        previous (Dict): the statistics in the baseline
+        threshold (float): the allowed relative increase of the median,
+            e.g. 0.1 allows the benchmark to become 10% slower
+
+    Returns:
+        bool
+    """
+    return stats['median'] > previous['median'] * (1 + threshold)
+
+
+def load_baseline(fpath):
+    """
+    Reads the statistics of each benchmark from a baseline file.
+
+    Args:
+        fpath (str): the baseline file
+
+    Returns:
+        Dict[str, Dict]: the statistics of each benchmark key, which is
+            empty if the file does not exist
+
+    Example:
+        >>> from os.path import join
+        >>> with utils.TempDir() as temp:
+        >>>     fpath = join(temp.dpath, 'sub', 'benchmarks.json')
+        >>>     assert load_baseline(fpath) == {}
+        >>>     save_baseline(fpath, {'mod::func:0': {'median': 1e-6}})
+        >>>     print(load_baseline(fpath))
+        {'mod::func:0': {'median': 1e-06}}
+    """
+    if not exists(fpath):
+        return {}
+    with open(fpath, 'r') as file:
+        data = json.load(file)
+    return data.get('benchmarks', {})
+
+
+def save_baseline(fpath, baseline):
+    """
+    Writes the statistics of each benchmark to a baseline file.
+
+    Args:
+        fpath (str): the baseline file, which is overwritten
+        baseline (Dict[str, Dict]): the statistics of each benchmark key
+    """
+    dpath = dirname(fpath)
+    if dpath:
+        utils.ensuredir(dpath)
+    data = {'version': 1, 'benchmarks': baseline}
+    text = json.dumps(data, indent=2, sort_keys=True)
+    with open(fpath, 'w') as file:
+        file.write(text + '\n')
+
+
+def format_seconds(seconds):
+    """
+    Formats a duration with a unit that suits its magnitude
+
+    Example:
+        >>> print(format_seconds(0.0000123456))
+        12.3 us
+        >>> print(format_seconds(2.5))
+        2.5 s
+    """
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= scale:
+            break
+    else:
+        unit, scale = 'ns', 1e-9
+    return '{:.3g} {}'.format(seconds / scale, unit)
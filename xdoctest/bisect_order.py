@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Finds doctests that only fail because of the doctests that ran before them.
+
+A doctest can depend on the order of a run if an earlier doctest mutates
+state it shares (e.g. a module attribute or a cache). Running the doctests in
+a shuffled order (``--shuffle``) exposes such dependencies, and
+``--bisect-order`` narrows them down: each failed doctest is rerun in a fresh
+subprocess, alone and after subsets of the doctests that preceded it, until
+the predecessor that makes it fail is found.
+
+Example:
+    >>> from xdoctest.bisect_order import *  # NOQA
+    >>> # Pretend "mod.py::d:0" fails whenever "mod.py::b:0" ran before it
+    >>> def fails(nodes):
+    >>>     return 'mod.py::b:0' in nodes[:-1]
+    >>> predecessors = ['mod.py::a:0', 'mod.py::b:0', 'mod.py::c:0']
+    >>> print(minimize_predecessors('mod.py::d:0', predecessors, fails))
+    ['mod.py::b:0']
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+from os.path import dirname
+import json
+import os
+import subprocess
+import sys
+
+
+def minimize_predecessors(node, predecessors, fails):
+    """
+    Finds a minimal set of the doctests that preceded a failure.
+
+    The failure must reproduce after all ``predecessors`` but not without
+    them. The predecessors are reduced with the delta debugging algorithm
+    (ddmin): they are split into chunks, and the search continues with any
+    chunk (or the complement of any chunk) that still makes the doctest
+    fail. If none does, the chunks are split further. The result is minimal
+    in the sense that removing any single doctest from it avoids the failure.
+
+    Args:
+        node (str): the doctest that failed
+        predecessors (List[str]): the doctests that ran before it, in order
+        fails (Callable[[List[str]], bool]): runs the given doctests in
+            order and returns True if the last one fails
+
+    Returns:
+        List[str]: the predecessors that make the doctest fail, in order
+
+    Example:
+        >>> # A failure that needs two predecessors
+        >>> def fails(nodes):
+        >>>     return {'a', 'f'}.issubset(nodes)
+        >>> print(minimize_predecessors('z', list('abcdefgh'), fails))
+        ['a', 'f']
+        >>> print(minimize_predecessors('z', list('abcdef'), fails))
+        ['a', 'f']
+        >>> def fails(nodes):
+        >>>     return 'f' in nodes
+        >>> print(minimize_predecessors('z', list('abcdefgh'), fails))
+        ['f']
+    """
+    # Each check may be expensive, so no order is checked twice
+    cache = {}
+
+    def _fails(nodes):
+        key = tuple(nodes)
+        if key not in cache:
+            cache[key] = fails(list(nodes) + [node])
+        return cache[key]
+
+    candidates = list(predecessors)
+    n_chunks = 2
+    while len(candidates) > 1:
+        chunks = _split(candidates, n_chunks)
+        complements = [
+            [other for j, chunk in enumerate(chunks) if j != i
+             for other in chunk]
+            for i in range(len(chunks))
+        ]
+        for chunk in chunks:
+            if _fails(chunk):
+                candidates = chunk
+                n_chunks = 2
+                break
+        else:
+            # With two chunks the complements are the chunks themselves
+            for complement in (complements if n_chunks > 2 else []):
+                if _fails(complement):
+                    candidates = complement
+                    n_chunks = max(n_chunks - 1, 2)
+                    break
+            else:
+                if n_chunks >= len(candidates):
+                    break
+                n_chunks = min(len(candidates), n_chunks * 2)
+    return candidates
+
+
+def _split(items, n_chunks):
+    """
+    Splits items into contiguous chunks of nearly equal size
+
+    Example:
+        >>> print(_split(list('abcde'), 2))
+        [['a', 'b'], ['c', 'd', 'e']]
+    """
+    bounds = [len(items) * i // n_chunks for i in range(n_chunks + 1)]
+    return [items[start:stop] for start, stop in zip(bounds, bounds[1:])]
+
+
+class NodeNotFound(KeyError):
+    """
+    Raised when a subprocess cannot find one of the doctests it should run
+    """
+
+
+def find_order_dependency(node, predecessors, style='auto', analysis='auto',
+                          config=None, argv=None):
+    """
+    Checks if a doctest only fails because of the doctests before it.
+
+    Every check runs the doctests in a new subprocess, so no state is shared
+    with the current process or between checks.
+
+    Args:
+        node (str): the doctest that failed
+        predecessors (List[str]): the doctests that ran before it, in order
+        style (str): the docstring style used to collect the doctests
+        analysis (str): the analysis used to collect the doctests
+        config (Dict | None): the config of the run
+        argv (List[str] | None): command line seen by the doctests
+
+    Returns:
+        Dict: with the keys ``node``, ``status``, and ``culprits``. The
+            status is "order-dependent" if the doctest passes alone, and the
+            culprits are the predecessors that make it fail. It is
+            "independent" if the doctest also fails alone and
+            "not-reproduced" if it does not fail in a subprocess at all. It is
+            "not-found" if a subprocess could not find one of the doctests,
+            and "error" if a subprocess did not report an outcome.
+    """
+    def fails(nodes):
+        return _fails_in_subprocess(nodes, style=style, analysis=analysis,
+                                    config=config, argv=argv)
+
+    result = {'node': node, 'status': None, 'culprits': []}
+    try:
+        if fails([node]):
+            result['status'] = 'independent'
+        elif not predecessors or not fails(list(predecessors) + [node]):
+            result['status'] = 'not-reproduced'
+        else:
+            result['culprits'] = minimize_predecessors(node, predecessors,
+                                                       fails)
+            result['status'] = 'order-dependent'
+    except NodeNotFound:
+        result['status'] = 'not-found'
+        result['culprits'] = []
+    except RuntimeError:
+        result['status'] = 'error'
+        result['culprits'] = []
+    return result
+
+
+def run_nodes(nodes, style='auto', analysis='auto', config=None):
+    """
+    Runs doctests in the given order in the current process.
+
+    Args:
+        nodes (List[str]): the node of each doctest to run
+        style (str): the docstring style used to collect the doctests
+        analysis (str): the analysis used to collect the doctests
+        config (Dict | None): the config of the run
+
+    Returns:
+        Dict: the summary of the last doctest
+
+    Raises:
+        KeyError: if a doctest cannot be found
+    """
+    from xdoctest import core
+    examples = {}
+    for node in nodes:
+        modpath = node.rpartition('::')[0]
+        if modpath not in examples:
+            examples[modpath] = {
+                example.node: example
+                for example in core.parse_doctestables(
+                    modpath, style=style, analysis=analysis)
+            }
+    summary = None
+    for node in nodes:
+        example = examples[node.rpartition('::')[0]][node]
+        example.mode = 'native'
+        if config:
+            example.config.update(config)
+        summary = example.run(verbose=0, on_error='return')
+    return summary
+
+
+def _fails_in_subprocess(nodes, style='auto', analysis='auto', config=None,
+                         argv=None):
+    """
+    Runs doctests in order in a new python process.
+
+    Returns:
+        bool: True if the last doctest failed. A doctest that crashes the
+            process also counts as failed.
+
+    Raises:
+        NodeNotFound: if a doctest cannot be found
+        RuntimeError: if the process did not report an outcome
+    """
+    payload = json.dumps({
+        'nodes': list(nodes),
+        'style': style,
+        'analysis': analysis,
+        'config': dict(config or {}),
+        'argv': list(sys.argv if argv is None else argv),
+    })
+    # The child must import this copy of xdoctest
+    env = os.environ.copy()
+    pkg_root = dirname(dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [pkg_root] + [p for p in [env.get('PYTHONPATH')] if p])
+    with open(os.devnull, 'w') as devnull:
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'xdoctest.bisect_order'], env=env,
+            stdin=subprocess.PIPE, stdout=devnull, stderr=devnull)
+        proc.communicate(payload.encode('utf8'))
+    if proc.returncode == 2:
+        raise NodeNotFound(list(nodes))
+    if proc.returncode not in {0, 1} and proc.returncode > 0:
+        raise RuntimeError(
+            'the subprocess exited with status {}'.format(proc.returncode))
+    # A negative code means the process was killed by a signal (e.g. a
+    # segfault in the doctest)
+    return proc.returncode != 0
+
+
+def _main():
+    """
+    Entry point of the subprocesses used by :func:`find_order_dependency`.
+
+    Reads the doctests to run from stdin and exits with status 1 if the last
+    one fails, 2 if a doctest cannot be found, or 3 if anything else goes
+    wrong.
+    """
+    payload = json.loads(sys.stdin.read())
+    sys.argv[:] = payload['argv']
+    try:
+        summary = run_nodes(payload['nodes'], style=payload['style'],
+                            analysis=payload['analysis'],
+                            config=payload['config'])
+    except KeyError:
+        sys.exit(2)
+    except Exception:
+        sys.exit(3)
+    sys.exit(1 if summary['failed'] else 0)
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,541 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent state that the native runner keeps between invocations.
+
+By default this lives in a ``.xdoctest_cache`` directory in the current
+working directory. Each key is stored as a json file, so the cache can be
+inspected by hand and removed at any time.
+
+The runner uses the cache to remember which doctests failed during the last
+run, which powers the ``--lf`` (last-failed) and ``--ff`` (failed-first)
+options. It can also remember which doctests passed (``--pass-cache``), so
+unchanged doctests are not executed again, which doctests each module
+contains (``--collection-cache``), so unchanged modules are not parsed again,
+and the code compiled for each doctest part (``--code-cache``), so unchanged
+parts are not compiled again.
+
+Example:
+    >>> from xdoctest.cache import *  # NOQA
+    >>> from xdoctest import utils
+    >>> with utils.TempDir() as temp:
+    >>>     cache = Cache(join(temp.dpath, '.xdoctest_cache'))
+    >>>     assert cache.get('lastfailed', {}) == {}
+    >>>     cache.set('lastfailed', {'mod.py::func:0': True})
+    >>>     cache = Cache(join(temp.dpath, '.xdoctest_cache'))
+    >>>     print(cache.get('lastfailed'))
+    {'mod.py::func:0': True}
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+from os.path import join, exists, dirname
+import hashlib
+import json
+import marshal
+import os
+import pickle
+import re
+import six
+import sys
+import warnings
+
+
+DEFAULT_CACHE_DIR = '.xdoctest_cache'
+
+# Config options that do not influence the outcome of a doctest
+_OUTCOME_INDEPENDENT_CONFIG = {'colored', 'verbose', 'on_error'}
+
+
+class Cache(object):
+    """
+    A directory of json files that persists between runs
+
+    Args:
+        dpath (str, default=None): the cache directory.
+            Defaults to ``.xdoctest_cache`` in the working directory.
+    """
+    def __init__(self, dpath=None):
+        if dpath is None:
+            dpath = DEFAULT_CACHE_DIR
+        self.dpath = dpath
+
+    def _key_fpath(self, key):
+        return join(self.dpath, 'v', key + '.json')
+
+    def get(self, key, default=None):
+        """
+        Args:
+            key (str): the name of the value, may contain ``/``
+            default (object): returned if the key does not exist or the
+                stored value cannot be read.
+
+        Returns:
+            object: the stored json-compatible value
+        """
+        fpath = self._key_fpath(key)
+        try:
+            with open(fpath, 'r') as file:
+                return json.load(file)
+        except (IOError, OSError, ValueError):
+            return default
+
+    def set(self, key, value):
+        """
+        Args:
+            key (str): the name of the value, may contain ``/``
+            value (object): a json-compatible value
+        """
+        fpath = self._key_fpath(key)
+        try:
+            self._ensure_dpath(dirname(fpath))
+            text = json.dumps(value, indent=2, sort_keys=True)
+            with open(fpath, 'w') as file:
+                file.write(text)
+        except (IOError, OSError) as ex:
+            # The cache is an optimization, never fail a run because of it
+            warnings.warn('could not write xdoctest cache {!r}: {}'.format(
+                fpath, ex))
+
+    def _ensure_dpath(self, dpath):
+        if not exists(self.dpath):
+            os.makedirs(self.dpath)
+            # Prevent the cache from being accidentally committed
+            with open(join(self.dpath, '.gitignore'), 'w') as file:
+                file.write('# Created by xdoctest automatically.\n*\n')
+        if not exists(dpath):
+            os.makedirs(dpath)
+
+
+def update_lastfailed(cache, run_summary):
+    """
+    Records which doctests failed in a run.
+
+    Doctests that ran and did not fail are removed from the record. Doctests
+    that did not run keep their previous status, so running a subset of the
+    doctests does not forget earlier failures.
+
+    Args:
+        cache (Cache): the cache to update
+        run_summary (Dict): the summary returned by the runner
+
+    Example:
+        >>> from xdoctest.cache import *  # NOQA
+        >>> from xdoctest import utils
+        >>> class Result(object):
+        >>>     def __init__(self, node):
+        >>>         self.node = node
+        >>> a, b, c = Result('a'), Result('b'), Result('c')
+        >>> with utils.TempDir() as temp:
+        >>>     cache = Cache(temp.dpath)
+        >>>     cache.set('lastfailed', {'a': True, 'c': True})
+        >>>     run_summary = {'times': {a: 0, b: 0}, 'failed': [b]}
+        >>>     update_lastfailed(cache, run_summary)
+        >>>     print(sorted(cache.get('lastfailed')))
+        ['b', 'c']
+    """
+    lastfailed = cache.get('lastfailed', {})
+    if not isinstance(lastfailed, dict):
+        lastfailed = {}
+    ran_nodes = {example.node for example in run_summary.get('times', {})}
+    failed_nodes = {example.node for example in run_summary.get('failed', [])}
+    for node in ran_nodes:
+        lastfailed.pop(node, None)
+    for node in failed_nodes:
+        lastfailed[node] = True
+    cache.set('lastfailed', lastfailed)
+
+
+def select_lastfailed(examples, cache, last_failed=False, failed_first=False):
+    """
+    Filters or reorders examples based on the doctests that failed last time.
+
+    Args:
+        examples (List[DocTest]): the collected examples
+        cache (Cache): the cache holding the previous failures
+        last_failed (bool): if True, only return previously failed examples.
+            If none of the examples failed previously, all are returned.
+        failed_first (bool): if True, previously failed examples are moved
+            to the front, otherwise the order is preserved.
+
+    Returns:
+        Tuple[List[DocTest], int]: the selected examples and the number of
+            them that failed previously.
+    """
+    lastfailed = cache.get('lastfailed', {})
+    if not isinstance(lastfailed, dict):
+        lastfailed = {}
+    prev_failed = [ex for ex in examples if ex.node in lastfailed]
+    if last_failed and prev_failed:
+        examples = prev_failed
+    elif failed_first and prev_failed:
+        others = [ex for ex in examples if ex.node not in lastfailed]
+        examples = prev_failed + others
+    return examples, len(prev_failed)
+
+
+def pass_cache_key(example, _source_memo=None):
+    """
+    Computes a hash of everything a doctest's outcome is assumed to depend on.
+
+    This is the doctest source, the source of the module that contains it,
+    the xdoctest and python versions, and the doctest configuration (which
+    includes the default runtime state). Changes to other modules that the
+    doctest uses are NOT detected, which is why the pass cache is opt-in.
+
+    Doctests that use the ``REQUIRES`` directive depend on the environment
+    they run in and are never cached.
+
+    Args:
+        example (DocTest): the doctest to compute a key for
+        _source_memo (Dict[str, bytes], default=None): maps module paths to
+            their contents to avoid reading a module once per doctest.
+
+    Returns:
+        str | None: the hash, or None if the doctest cannot be cached
+
+    Example:
+        >>> from xdoctest.cache import *  # NOQA
+        >>> from xdoctest import core
+        >>> docstr = '>>> x = 1'
+        >>> example = list(core.parse_docstr_examples(docstr))[0]
+        >>> key1 = pass_cache_key(example)
+        >>> example.config['timeout'] = 10
+        >>> key2 = pass_cache_key(example)
+        >>> assert key1 != key2
+        >>> docstr = '>>> # xdoctest: +REQUIRES(--flag)'
+        >>> example = list(core.parse_docstr_examples(docstr))[0]
+        >>> assert pass_cache_key(example) is None
+    """
+    import xdoctest
+    if re.search(r'requires\s*\(', example.docsrc, flags=re.IGNORECASE):
+        return None
+    if _source_memo is None:
+        _source_memo = {}
+    modpath = example.modpath
+    if modpath not in _source_memo:
+        try:
+            with open(modpath, 'rb') as file:
+                _source_memo[modpath] = file.read()
+        except (IOError, OSError, TypeError):
+            _source_memo[modpath] = b''
+    config = {k: v for k, v in example.config.items()
+              if k not in _OUTCOME_INDEPENDENT_CONFIG}
+    header = json.dumps({
+        'xdoctest_version': xdoctest.__version__,
+        'python_version': sys.version,
+        'node': example.node,
+        'block_type': example.block_type,
+        'config': config,
+    }, sort_keys=True, default=repr)
+    hasher = hashlib.sha1()
+    hasher.update(header.encode('utf8'))
+    hasher.update(example.docsrc.encode('utf8'))
+    hasher.update(_source_memo[modpath])
+    return hasher.hexdigest()
+
+
+def select_cached_passes(examples, cache):
+    """
+    Separates examples that already passed in their current state.
+
+    Args:
+        examples (List[DocTest]): the examples to run
+        cache (Cache): the cache holding the previous passes
+
+    Returns:
+        Tuple[List[DocTest], List[DocTest], Dict[str, str]]:
+            the examples that need to run, the examples that can be reported
+            as cached passes, and the pass-cache key of each example node.
+    """
+    keys = {}
+    to_run = []
+    cached = []
+    for example, is_cached in iter_cached_passes(examples, cache, keys):
+        if is_cached:
+            cached.append(example)
+        else:
+            to_run.append(example)
+    return to_run, cached, keys
+
+
+def iter_cached_passes(examples, cache, keys):
+    """
+    Lazily checks which examples already passed in their current state.
+
+    Args:
+        examples (Iterable[DocTest]): the examples to run
+        cache (Cache): the cache holding the previous passes
+        keys (Dict[str, str]): the pass-cache key of each example node is
+            stored here as the examples are checked.
+
+    Yields:
+        Tuple[DocTest, bool]: each example and if it is a cached pass
+    """
+    cachedpass = cache.get('cachedpass', {})
+    if not isinstance(cachedpass, dict):
+        cachedpass = {}
+    source_memo = {}
+    for example in examples:
+        key = pass_cache_key(example, source_memo)
+        keys[example.node] = key
+        is_cached = key is not None and cachedpass.get(example.node) == key
+        yield example, is_cached
+
+
+def update_cached_passes(cache, run_summary, keys):
+    """
+    Records the keys of doctests that passed in a run.
+
+    Args:
+        cache (Cache): the cache to update
+        run_summary (Dict): the summary returned by the runner
+        keys (Dict[str, str]): the pass-cache key of each example node
+    """
+    cachedpass = cache.get('cachedpass', {})
+    if not isinstance(cachedpass, dict):
+        cachedpass = {}
+    failed_nodes = {example.node for example in run_summary.get('failed', [])}
+    for example in run_summary.get('times', {}):
+        key = keys.get(example.node, None)
+        if key is not None and example.node not in failed_nodes and _passed(example):
+            cachedpass[example.node] = key
+        else:
+            cachedpass.pop(example.node, None)
+    cache.set('cachedpass', cachedpass)
+
+
+def _passed(example):
+    """
+    Checks if a DocTest or DocTestResult that has been run actually passed
+    (i.e. did not fail and was not entirely skipped).
+    """
+    passed = getattr(example, 'passed', None)
+    if passed is None:
+        passed = (example.exc_info is None and
+                  len(example._skipped_parts) < len(example._parts))
+    return passed
+
+
+class CollectionCache(object):
+    r"""
+    Stores the doctests parsed from each module between runs
+
+    Entries are keyed by the path, modification time, and size of the module
+    as well as the xdoctest version, python version, and the collection
+    parameters, so a module is only parsed again when one of these changes.
+    Each module is stored as a separate pickle file.
+
+    Args:
+        dpath (str, default=None): the cache directory.
+            Defaults to ``.xdoctest_cache`` in the working directory.
+
+    Example:
+        >>> from xdoctest.cache import *  # NOQA
+        >>> from xdoctest import core
+        >>> from xdoctest import utils
+        >>> with utils.TempDir() as temp:
+        >>>     modpath = join(temp.dpath, 'mod.py')
+        >>>     with open(modpath, 'w') as file:
+        >>>         file.write("def f():\n    '''\n    >>> print(1)\n    '''\n")
+        >>>     cache = CollectionCache(join(temp.dpath, '.xdoctest_cache'))
+        >>>     assert cache.load(modpath, style='freeform') is None
+        >>>     examples = list(core.parse_doctestables(modpath, style='freeform'))
+        >>>     cache.save(modpath, examples, style='freeform')
+        >>>     loaded = cache.load(modpath, style='freeform')
+        >>>     assert [e.node for e in loaded] == [e.node for e in examples]
+        >>>     assert cache.load(modpath, style='google') is None
+    """
+    def __init__(self, dpath=None):
+        self.cache = Cache(dpath)
+
+    @staticmethod
+    def is_cacheable(module_identifier, analysis='auto'):
+        """
+        Only statically analyzed python source files can be cached. The
+        results of dynamic analysis depend on the state of the interpreter.
+        """
+        return (isinstance(module_identifier, six.string_types) and
+                module_identifier.endswith('.py') and analysis != 'dynamic')
+
+    def _fpath(self, modpath):
+        realpath = os.path.realpath(modpath)
+        name = hashlib.sha1(realpath.encode('utf8')).hexdigest()
+        return join(self.cache.dpath, 'collection', name + '.pkl')
+
+    def _key(self, modpath, **params):
+        import xdoctest
+        stat = os.stat(modpath)
+        key = json.dumps({
+            'modpath': os.path.realpath(modpath),
+            'mtime': getattr(stat, 'st_mtime_ns', stat.st_mtime),
+            'size': stat.st_size,
+            'xdoctest_version': xdoctest.__version__,
+            'python_version': sys.version,
+            'params': params,
+        }, sort_keys=True, default=repr)
+        return key
+
+    def load(self, modpath, **params):
+        """
+        Args:
+            modpath (str): path to the module
+            **params: the collection parameters (e.g. style, analysis)
+
+        Returns:
+            List[DocTest] | None: the examples in the module or None if the
+                module is not in the cache or changed since it was stored.
+        """
+        try:
+            key = self._key(modpath, **params)
+            with open(self._fpath(modpath), 'rb') as file:
+                stored_key, examples = pickle.load(file)
+        except Exception:
+            # Missing, outdated, or corrupt entries are just cache misses
+            return None
+        if stored_key != key:
+            return None
+        return examples
+
+    def save(self, modpath, examples, **params):
+        """
+        Args:
+            modpath (str): path to the module
+            examples (List[DocTest]): the examples parsed from the module
+            **params: the collection parameters (e.g. style, analysis)
+        """
+        fpath = self._fpath(modpath)
+        try:
+            key = self._key(modpath, **params)
+            data = pickle.dumps((key, examples), protocol=2)
+            self.cache._ensure_dpath(dirname(fpath))
+            _write_atomic(fpath, data)
+        except (IOError, OSError, pickle.PicklingError) as ex:
+            warnings.warn('could not write xdoctest cache {!r}: {}'.format(
+                fpath, ex))
+
+
+def _write_atomic(fpath, data):
+    """
+    Writes bytes to a file through a temporary file that replaces it, so
+    concurrent runs never read a partially written file. The temporary file
+    is removed if anything fails.
+
+    Example:
+        >>> from xdoctest import utils
+        >>> with utils.TempDir() as temp:
+        >>>     fpath = join(temp.dpath, 'data.bin')
+        >>>     _write_atomic(fpath, b'old')
+        >>>     _write_atomic(fpath, b'new')
+        >>>     with open(fpath, 'rb') as file:
+        >>>         assert file.read() == b'new'
+        >>>     assert os.listdir(temp.dpath) == ['data.bin']
+    """
+    tmp_fpath = fpath + '.{}.tmp'.format(os.getpid())
+    try:
+        with open(tmp_fpath, 'wb') as file:
+            file.write(data)
+        if hasattr(os, 'replace'):
+            os.replace(tmp_fpath, fpath)
+        else:  # nocover
+            # Python 2 cannot rename onto an existing file on Windows
+            if sys.platform.startswith('win32') and exists(fpath):
+                os.remove(fpath)
+            os.rename(tmp_fpath, fpath)
+    except BaseException:
+        if exists(tmp_fpath):
+            try:
+                os.remove(tmp_fpath)
+            except OSError:  # nocover
+                pass
+        raise
+
+
+# Code objects compiled in this process, shared by all CodeCache instances.
+# The keys include everything that influences the code, so sharing is safe.
+_CODE_MEMO = {}
+
+
+class CodeCache(object):
+    r"""
+    Stores the code objects compiled for doctest parts
+
+    Code objects are kept in memory for the lifetime of the process and
+    marshalled to disk, similar to ``__pycache__``, so reruns of unchanged
+    doctests do not compile them again. Entries are keyed by a hash of the
+    source, compile mode, compiler flags, filename, and python version.
+
+    Failing to read or write an entry is never an error, the source is simply
+    compiled again.
+
+    Args:
+        dpath (str, default=None): the cache directory.
+            Defaults to ``.xdoctest_cache`` in the working directory.
+
+    Example:
+        >>> from xdoctest.cache import *  # NOQA
+        >>> from xdoctest import utils
+        >>> with utils.TempDir() as temp:
+        >>>     code_cache = CodeCache(join(temp.dpath, '.xdoctest_cache'))
+        >>>     code = code_cache.compile('x = 1', '<doctest>', 'exec')
+        >>>     assert code_cache.compile('x = 1', '<doctest>', 'exec') is code
+        >>>     _CODE_MEMO.clear()
+        >>>     code2 = code_cache.compile('x = 1', '<doctest>', 'exec')
+        >>>     assert code2 is not code and code2 == code
+        >>>     ns = {}
+        >>>     exec(code2, ns)
+        >>>     print(ns['x'])
+        1
+    """
+    def __init__(self, dpath=None):
+        self.cache = Cache(dpath)
+
+    def __getstate__(self):
+        # Code objects cannot be pickled, workers use their own memory
+        return {'dpath': self.cache.dpath}
+
+    def __setstate__(self, state):
+        self.cache = Cache(state['dpath'])
+
+    def _key(self, source, filename, mode, flags):
+        data = '\0'.join([sys.version, mode, str(flags), filename, source])
+        return hashlib.sha1(data.encode('utf8')).hexdigest()
+
+    def _fpath(self, key):
+        return join(self.cache.dpath, 'code', key[0:2], key + '.marshal')
+
+    def compile(self, source, filename, mode, flags=0):
+        """
+        Like the builtin :func:`compile` with ``dont_inherit=True``, but
+        reuses previously compiled code objects.
+
+        Args:
+            source (str): the source code
+            filename (str): the filename used in tracebacks
+            mode (str): can be exec, eval, or single
+            flags (int): compiler flags (e.g. for future features)
+
+        Returns:
+            types.CodeType: the compiled code
+
+        Raises:
+            SyntaxError: if the source is invalid
+        """
+        key = self._key(source, filename, mode, flags)
+        code = _CODE_MEMO.get(key, None)
+        if code is not None:
+            return code
+        fpath = self._fpath(key)
+        try:
+            with open(fpath, 'rb') as file:
+                code = marshal.loads(file.read())
+        except Exception:
+            code = None
+        if code is None:
+            code = compile(source, mode=mode, filename=filename, flags=flags,
+                           dont_inherit=True)
+            try:
+                self.cache._ensure_dpath(dirname(fpath))
+                _write_atomic(fpath, marshal.dumps(code))
+            except (IOError, OSError):
+                # Do not warn, this runs while doctest warnings are recorded
+                pass
+        _CODE_MEMO[key] = code
+        return code
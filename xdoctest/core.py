@@ -24,6 +24,7 @@ The following is a glossary of terms and jargon used in this repo.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 import sys
+import re
 import textwrap
 import warnings
 import six
@@ -52,6 +53,16 @@ DOCTEST_STYLES = [
 ]
 
 
+# Byte patterns that the source of a module must contain for a style to find
+# any doctests in it. Google-style example blocks are found by their header,
+# even if they contain no ``>>>`` lines.
+_STYLE_MARKERS = {
+    'freeform': re.compile(br'>>>'),
+    'google': re.compile(br'>>>|(?:Examples?|Doctest) *:'),
+}
+_STYLE_MARKERS['auto'] = _STYLE_MARKERS['google']
+
+
 def parse_freeform_docstr_examples(docstr, callname=None, modpath=None,
                                    lineno=1, fpath=None, asone=True):
     r"""
@@ -441,7 +452,7 @@ def _rectify_to_modpath(modpath_or_name):
 
 
 def package_calldefs(pkg_identifier, exclude=[], ignore_syntax_errors=True,
-                     analysis='auto'):
+                     analysis='auto', style=None, collect_jobs=None):
     """
     Statically generates all callable definitions in a module or package
 
@@ -460,6 +471,14 @@ def package_calldefs(pkg_identifier, exclude=[], ignore_syntax_errors=True,
             extensions, but static analysis elsewhere, if 'dynamic', then
             dynamic analysis is used to parse all calldefs.
 
+        style (str, default=None):
+            if specified, statically analyzed modules whose source cannot
+            contain doctests of this style are skipped without being parsed.
+
+        collect_jobs (int, default=None):
+            if greater than one, modules are parsed in this many worker
+            processes. Results are still generated in a deterministic order.
+
     Yields:
         Tuple[Dict[str, CallDefNode], str | Module] -
             * item[0]: the mapping of callnames-to-calldefs
@@ -477,6 +496,55 @@ def package_calldefs(pkg_identifier, exclude=[], ignore_syntax_errors=True,
     if DEBUG:
         print('Find package calldefs: pkg_identifier = {!r}'.format(pkg_identifier))
 
+    identifiers = _package_module_identifiers(pkg_identifier, exclude, style,
+                                              analysis)
+    if _use_collect_jobs(pkg_identifier, collect_jobs):
+        identifiers = list(identifiers)
+        tasks = [(modpath, analysis, None, None) for modpath in identifiers]
+        results = _imap_collect(tasks, collect_jobs)
+        for module_identifier, result in zip(identifiers, results):
+            calldefs, warnlist, error = result
+            _reemit_warnings(warnlist)
+            if error is not None:
+                _handle_syntax_error(module_identifier, error,
+                                     ignore_syntax_errors)
+            elif calldefs is not None:
+                yield calldefs, module_identifier
+        return
+
+    for module_identifier in identifiers:
+        try:
+            calldefs = parse_calldefs(module_identifier, analysis=analysis)
+            if calldefs is not None:
+                yield calldefs, module_identifier
+        except SyntaxError as ex:
+            # Handle error due to the actual code containing errors
+            _handle_syntax_error(module_identifier, ex, ignore_syntax_errors)
+
+
+def _handle_syntax_error(module_identifier, ex, ignore_syntax_errors=True):
+    """
+    Warns about (or raises) a syntax error found while parsing a module
+    """
+    msg = 'Cannot parse module={}.\nCaused by: {}'
+    msg = msg.format(module_identifier, ex)
+    if ignore_syntax_errors:
+        warnings.warn(msg)  # real code or docstr contained errors
+    else:
+        raise SyntaxError(msg)
+
+
+def _package_module_identifiers(pkg_identifier, exclude=[], style=None,
+                                analysis='auto'):
+    """
+    Generates the modules in a package that are not excluded
+
+    If ``style`` is given, python files that will be statically analyzed are
+    also skipped if a byte-level search shows they cannot contain doctests.
+
+    Yields:
+        str | Module: the path to each module, or the live module itself
+    """
     if isinstance(pkg_identifier, types.ModuleType):
         # Case where we are forced to use a live module
         identifiers = [pkg_identifier]
@@ -496,18 +564,15 @@ def package_calldefs(pkg_identifier, exclude=[], ignore_syntax_errors=True,
                     'Module {} does not exist. '
                     'Is it an old pyc file?'.format(modname))
                 continue
-        try:
-            calldefs = parse_calldefs(module_identifier, analysis=analysis)
-            if calldefs is not None:
-                yield calldefs, module_identifier
-        except SyntaxError as ex:
-            # Handle error due to the actual code containing errors
-            msg = 'Cannot parse module={}.\nCaused by: {}'
-            msg = msg.format(module_identifier, ex)
-            if ignore_syntax_errors:
-                warnings.warn(msg)  # real code or docstr contained errors
-            else:
-                raise SyntaxError(msg)
+            if (style is not None and analysis != 'dynamic' and
+                    modpath.endswith('.py')):
+                if not static_analysis.search_file_bytes(
+                        modpath, _STYLE_MARKERS[style]):
+                    if DEBUG:
+                        print('Skipping {} without doctest markers'.format(
+                            modpath))
+                    continue
+        yield module_identifier
 
 
 def parse_calldefs(module_identifier, analysis='auto'):
@@ -592,7 +657,8 @@ def parse_calldefs(module_identifier, analysis='auto'):
 
 def parse_doctestables(module_identifier, exclude=[], style='auto',
                        ignore_syntax_errors=True, parser_kw={},
-                       analysis='auto'):
+                       analysis='auto', collection_cache=None,
+                       collect_jobs=None):
     """
     Parses all doctests within top-level callables of a module and generates
     example objects.  The style influences which tests are found.
@@ -616,6 +682,16 @@ def parse_doctestables(module_identifier, exclude=[], style='auto',
             extensions, but static analysis elsewhere, if 'dynamic', then
             dynamic analysis is used to parse all calldefs.
 
+        collection_cache (xdoctest.cache.CollectionCache, default=None):
+            if specified, the examples of statically analyzed modules are
+            loaded from this cache when the module did not change, and stored
+            in it otherwise.
+
+        collect_jobs (int, default=None):
+            if greater than one, modules that are not cached are parsed in
+            this many worker processes. Examples are still generated in a
+            deterministic order.
+
     Yields:
         xdoctest.doctest_example.DocTest : parsed doctest example objects
 
@@ -653,20 +729,150 @@ def parse_doctestables(module_identifier, exclude=[], style='auto',
         raise KeyError('Unknown style={}. Valid styles are {}'.format(
             style, DOCTEST_STYLES))
 
-    # Statically parse modules and their doctestable callables in a package
-    for calldefs, modpath in package_calldefs(module_identifier, exclude,
-                                              ignore_syntax_errors,
-                                              analysis=analysis):
-        for callname, calldef in calldefs.items():
-            docstr = calldef.docstr
-            if calldef.docstr is not None:
-                lineno = calldef.doclineno
-                for example in parse_docstr_examples(docstr, callname=callname,
-                                                     modpath=modpath,
-                                                     lineno=lineno,
-                                                     style=style,
-                                                     parser_kw=parser_kw):
-                    yield example
+    parallel = _use_collect_jobs(module_identifier, collect_jobs)
+    if collection_cache is None and not parallel:
+        # Statically parse modules and their doctestable callables in a package
+        for calldefs, modpath in package_calldefs(module_identifier, exclude,
+                                                  ignore_syntax_errors,
+                                                  analysis=analysis,
+                                                  style=style):
+            for example in _calldef_doctestables(calldefs, modpath, style,
+                                                 parser_kw):
+                yield example
+        return
+
+    cache_params = dict(style=style, analysis=analysis, parser_kw=parser_kw)
+
+    def _lookup(modpath):
+        examples = None
+        cacheable = (collection_cache is not None and
+                     collection_cache.is_cacheable(modpath, analysis))
+        if cacheable:
+            examples = collection_cache.load(modpath, **cache_params)
+        return modpath, cacheable, examples
+
+    entries = (_lookup(modpath) for modpath in _package_module_identifiers(
+        module_identifier, exclude, style, analysis))
+    results = None
+    if parallel:
+        # Only the modules that are not cached are sent to the workers
+        entries = list(entries)
+        tasks = [(modpath, analysis, style, parser_kw)
+                 for modpath, cacheable, examples in entries
+                 if examples is None]
+        results = _imap_collect(tasks, collect_jobs)
+
+    try:
+        for modpath, cacheable, examples in entries:
+            if examples is None:
+                if results is None:
+                    task = (modpath, analysis, style, parser_kw)
+                    examples, warnlist, error = _collect_module(task)
+                else:
+                    examples, warnlist, error = next(results)
+                _reemit_warnings(warnlist)
+                if error is not None:
+                    _handle_syntax_error(modpath, error, ignore_syntax_errors)
+                    continue
+                # Only cache modules that parse cleanly, so their warnings
+                # are shown every time until they are fixed.
+                if cacheable and not warnlist:
+                    collection_cache.save(modpath, examples, **cache_params)
+            for example in examples:
+                yield example
+    finally:
+        if results is not None:
+            results.close()
+
+
+def _use_collect_jobs(module_identifier, collect_jobs):
+    """
+    Checks if modules should be collected in worker processes
+    """
+    # Live modules cannot be sent to another process
+    return (collect_jobs is not None and collect_jobs > 1 and
+            not isinstance(module_identifier, types.ModuleType))
+
+
+def _collect_module(task):
+    """
+    Parses a single module and records the warnings and syntax errors that
+    occur instead of issuing them, so it can run in a worker process.
+
+    Args:
+        task (Tuple[str, str, str | None, dict | None]): the path to the
+            module, the analysis mode, the doctest style, and the parser
+            keyword arguments. If the style is None, only the calldefs of
+            the module are parsed.
+
+    Returns:
+        Tuple[object, List[warnings.WarningMessage], SyntaxError | None]:
+            the calldefs or the list of examples (None if there was an
+            error), the recorded warnings, and the syntax error (if any).
+    """
+    modpath, analysis, style, parser_kw = task
+    result = None
+    error = None
+    with warnings.catch_warnings(record=True) as warnlist:
+        warnings.simplefilter('always')
+        try:
+            calldefs = parse_calldefs(modpath, analysis=analysis)
+            if style is None:
+                result = calldefs
+            else:
+                result = []
+                if calldefs is not None:
+                    result = list(_calldef_doctestables(calldefs, modpath,
+                                                        style, parser_kw))
+        except SyntaxError as ex:
+            error = ex
+    # Drop references to the source of each warning, which may not pickle
+    warnlist = [warnings.WarningMessage(w.message, w.category, w.filename,
+                                        w.lineno) for w in warnlist]
+    return result, warnlist, error
+
+
+def _imap_collect(tasks, collect_jobs):
+    """
+    Generates the result of :func:`_collect_module` for each task, in order,
+    using a pool of ``collect_jobs`` worker processes.
+    """
+    import multiprocessing
+    if len(tasks) == 0:
+        return
+    pool = multiprocessing.Pool(min(collect_jobs, len(tasks)))
+    try:
+        for result in pool.imap(_collect_module, tasks):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _calldef_doctestables(calldefs, modpath, style='auto', parser_kw={}):
+    """
+    Parses the doctests in the docstrings of the calldefs of one module
+    """
+    for callname, calldef in calldefs.items():
+        docstr = calldef.docstr
+        if calldef.docstr is not None:
+            lineno = calldef.doclineno
+            for example in parse_docstr_examples(docstr, callname=callname,
+                                                 modpath=modpath,
+                                                 lineno=lineno,
+                                                 style=style,
+                                                 parser_kw=parser_kw):
+                yield example
+
+
+def _reemit_warnings(warnlist):
+    """
+    Issues warnings that were recorded by ``warnings.catch_warnings``
+    """
+    for warn in warnlist:
+        warnings.warn_explicit(warn.message, warn.category, warn.filename,
+                               warn.lineno)
 
 
 if __name__ == '__main__':
@@ -39,6 +39,8 @@ The basic directives and their defaults are as follows:
 
     * ``SKIP``: False
 
+    * ``BENCHMARK``: False
+
 Use ``-`` to disable a directive that is enabled by default, e.g.
 ``# xdoctest: -ELLIPSIS``, or use ``+`` to enable a directive that is disabled by
 default, e.g. ``# xdoctest +SKIP``.
@@ -53,9 +55,8 @@ value in the runtime state, the advanced ``REQUIRES`` directive either adds or
 removes a value from a ``set`` of unmet requirements. Doctests will only run if
 there are no unmet requirements.
 
-Currently the only advanced directive is ``REQUIRES(.)``. Multiple arguments
-may be specified, by separating them with commas. The currently available
-arguments allow you to condition on:
+The ``REQUIRES(.)`` directive accepts multiple arguments, separated by
+commas. The currently available arguments allow you to condition on:
 
 
     * Speical operating system / python implementation / python version tags, via: ``WIN32``, ``LINUX``, ``DARWIN``, ``POSIX``, ``NT``, ``JAVA``, ``CPYTHON``, ``IRONPYTHON``, ``JYTHON``, ``PYPY``, ``PY2``, ``PY3``. (e.g. ``# xdoctest +REQUIRES(WIN32)``)
@@ -66,6 +67,16 @@ arguments allow you to condition on:
 
     * Environment variables, via: ``env:<varname>==<val>``, (e.g. ``# xdoctest +REQUIRES(env:MYENVIRON==1)``)
 
+The ``TIMEOUT(.)`` directive takes a single number of seconds. Each
+subsequent part of the doctest fails if it runs for longer than this
+(e.g. ``# xdoctest: +TIMEOUT(2.5)``). Use ``-TIMEOUT`` to remove the limit.
+Timeouts are enforced with ``SIGALRM``, so they only apply in the main thread
+of a POSIX process.
+
+The ``BENCHMARK`` directive marks the parts that are timed by the ``bench``
+command of the native runner (e.g. ``# xdoctest: +BENCHMARK``). It has no
+effect when doctests are only tested. See :mod:`xdoctest.benchmark`.
+
 
 CommandLine:
     python -m xdoctest.directive __doc__
@@ -172,6 +183,12 @@ DEFAULT_RUNTIME_STATE = {
     # Doctests will be skipped while REQUIRES is non-empty and SKIP is False.
     'REQUIRES': set(),
 
+    # Maximum number of seconds each part is allowed to run, or None
+    'TIMEOUT': None,
+
+    # Parts are timed by the "bench" command while this is True
+    'BENCHMARK': False,
+
     # Original directives we are currently not supporting:
     # DONT_ACCEPT_TRUE_FOR_1
     # REPORT_ONLY_FIRST_FAILURE
@@ -213,6 +230,7 @@ class RuntimeState(utils.NiceRepr):
         >>> # xdoc: +IGNORE_WHITESPACE
         >>> print(str(RuntimeState()))
         <RuntimeState({
+            BENCHMARK: False,
             DONT_ACCEPT_BLANKLINE: False,
             ELLIPSIS: True,
             IGNORE_EXCEPTION_DETAIL: False,
@@ -224,7 +242,8 @@ class RuntimeState(utils.NiceRepr):
             REPORT_NDIFF: False,
             REPORT_UDIFF: True,
             REQUIRES: set(...),
-            SKIP: False
+            SKIP: False,
+            TIMEOUT: None
         })>
     """
     def __init__(self, default_state=None):
@@ -326,7 +345,7 @@ class Directive(utils.NiceRepr):
         self.positive = positive
 
     @classmethod
-    def extract(cls, text):
+    def extract(cls, text, comments=None):
         """
         Parses directives from a line or repl line
 
@@ -334,6 +353,10 @@ class Directive(utils.NiceRepr):
             text (str): must correspond to exactly one PS1 line and its PS2
                 followups.
 
+            comments (List[str], default=None): the comments in ``text`` if
+                they are already known (e.g. from an earlier tokenization).
+                Otherwise ``text`` is tokenized to find them.
+
         Yeilds:
             Directive: directive: the parsed directives
 
@@ -402,12 +425,21 @@ class Directive(utils.NiceRepr):
             True
             >>> any(Directive.extract(' # badprefix: not-a-directive'))
             False
+
+        Example:
+            >>> from xdoctest.directive import Directive
+            >>> # Comments that are already known are not tokenized again
+            >>> text = 'x = 1  # xdoctest: +SKIP'
+            >>> comments = ['# xdoctest: +SKIP']
+            >>> print(', '.join(list(map(str, Directive.extract(text, comments)))))
+            <Directive(+SKIP)>
         """
         # Flag extracted directives as inline iff the text is only comments
         inline = not all(line.strip().startswith('#')
                          for line in text.splitlines())
-        #
-        for comment in static.extract_comments(text):
+        if comments is None:
+            comments = static.extract_comments(text)
+        for comment in comments:
             # remove the first comment character and see if the comment matches
             # the directive pattern
             m = DIRECTIVE_RE.match(comment[1:].strip())
@@ -477,6 +509,10 @@ class Directive(utils.NiceRepr):
             Effect(action='set.add', key='REQUIRES', value='-s')
             >>> Directive('ELLIPSIS', args=['-s']).effects(argv=[])[0]
             Effect(action='assign', key='ELLIPSIS', value=True)
+            >>> Directive('TIMEOUT', args=['2.5']).effects()[0]
+            Effect(action='assign', key='TIMEOUT', value=2.5)
+            >>> Directive('TIMEOUT', positive=False).effects()[0]
+            Effect(action='assign', key='TIMEOUT', value=None)
 
         Doctest:
             >>> # requirement directive with module
@@ -532,6 +568,18 @@ class Directive(utils.NiceRepr):
                     else:
                         action = 'set.remove'
                 effects.append(Effect(action, key, value))
+        elif self.name == 'TIMEOUT':
+            # Special handling of TIMEOUT, which takes a number of seconds
+            action = 'assign'
+            if self.positive:
+                if len(self.args) != 1:
+                    raise TypeError(
+                        'TIMEOUT directive expected exactly 1 argument, '
+                        'got {}'.format(self.args))
+                value = float(self.args[0])
+            else:
+                value = None
+            effects.append(Effect(action, key, value))
         elif key.startswith('REPORT_'):
             # Special handling of report style
             if self.positive:
@@ -382,6 +382,7 @@ def split_google_docblocks(docstr):
         ['Returns', 'Return'],
         ['Example', 'Examples'],
         ['Doctest'],
+        ['Benchmark', 'Benchmarks'],
         ['Note', 'Notes'],
         ['Yields', 'Yield'],
         ['Attributes'],
@@ -9,6 +9,7 @@ import traceback
 import six
 import warnings
 import math
+import time
 import sys
 import re
 from xdoctest import utils
@@ -19,6 +20,26 @@ from xdoctest import parser
 from xdoctest import checker
 from xdoctest import exceptions
 
+# Module attributes that the interpreter reads from a doctest's globals
+# without going through ``__getitem__`` (e.g. for relative imports, warnings,
+# and naming new functions).
+_MODULE_DUNDERS = (
+    '__builtins__', '__name__', '__package__', '__spec__', '__loader__',
+    '__file__', '__cached__', '__path__', '__doc__',
+)
+
+# Only CPython 3 looks up the globals of functions with ``__getitem__`` when
+# they are not an exact dict.
+_HAS_LAYERED_GLOBALS = six.PY3 and static.PLAT_IMPL == 'CPython'
+
+# Class bodies read globals directly, so they need a real copy of the module
+_CLASS_PATTERN = re.compile(r'\bclass\b')
+
+# Maps the path of each module that failed to import to the formatted error,
+# so the other doctests of a broken module fail without importing it again.
+# The native runner clears this at the start of each run.
+_IMPORT_FAILURE_CACHE = {}
+
 # I believe the original reason for this hack was fixed in 3.9rc (The CI will
 # tell us otherwise if this is incorrect)
 # from distutils.version import LooseVersion
@@ -51,6 +72,9 @@ class DoctestConfig(dict):
             'on_error': 'raise',
             'partnos': False,
             'verbose': 1,
+            'timeout': None,
+            'capture': 'sys',
+            'max_capture_bytes': None,
         })
 
     def _populate_from_cli(self, ns):
@@ -68,6 +92,9 @@ class DoctestConfig(dict):
             'reportchoice': ns['reportchoice'],
             'global_exec': ns['global_exec'],
             'verbose': ns['verbose'],
+            'timeout': ns['timeout'],
+            'capture': ns['capture'],
+            'max_capture_bytes': ns['max_capture_bytes'],
         }
         return _examp_conf
 
@@ -104,6 +131,20 @@ class DoctestConfig(dict):
                                  help='Default directive flags for doctests')),
             (['--global-exec'], dict(type=str, default=None, dest='global_exec',
                                      help='Custom Python code to execute before every test')),
+            (['--timeout'], dict(type=float, default=None, dest='timeout',
+                                 help=('Fail a doctest if it runs for longer '
+                                       'than this many seconds'))),
+            (['--capture'], dict(type=str_lower, default=self['capture'],
+                                 dest='capture', choices=('sys', 'fd'),
+                                 help=('How doctest output is captured. "fd" '
+                                       'also captures output of C extensions '
+                                       'and subprocesses, and stderr'))),
+            (['--max-capture-bytes'], dict(
+                type=int, default=None, dest='max_capture_bytes',
+                help=('Only keep the first and last half of this many '
+                      '(utf8 encoded) bytes of the output of each doctest '
+                      'part. Wants are still checked against the full '
+                      'output'))),
             (['--verbose'], dict(
                 type=int, default=defaults.get('verbose', 3), dest='verbose',
                 help=(
@@ -245,15 +286,31 @@ class DocTest(object):
 
         self.logged_evals = OrderedDict()
         self.logged_stdout = OrderedDict()
+        self.logged_stderr = OrderedDict()
         self._unmatched_stdout = []
         self._skipped_parts = []
 
         self._runstate = None
+        # Cached result of resolve_skips
+        self._all_parts_skipped = None
 
         # Maintain global variables that this test will have access to
         self.global_namespace = {}
         # Hint at what is running this doctest
         self.mode = mode
+        # An optional xdoctest.cache.CodeCache that compiles the parts
+        self.code_cache = None
+        # Memory allocated while running, if tracemalloc is tracing
+        self.memory_usage = None
+        # If specified, the parts are profiled and the stats are written to a
+        # pstats file in this directory, whose path is stored in profile_fpath
+        self.profile_dpath = None
+        self.profile_fpath = None
+        # If specified (an xdoctest.benchmark.BenchmarkTimer), the timed
+        # parts are measured after a successful run and the statistics are
+        # stored in benchmark_stats
+        self.benchmark = None
+        self.benchmark_stats = None
 
     def __nice__(self):
         parts = []
@@ -273,7 +330,7 @@ class DocTest(object):
         devnice = self.__nice__()
         return '<%s(%s)>' % (classname, devnice)
 
-    def is_disabled(self, pytest=False):
+    def is_disabled(self, pytest=False, bench=False):
         """
         Checks for comment directives on the first line of the doctest
 
@@ -287,7 +344,12 @@ class DocTest(object):
         And if running in pytest, you can also use
 
         * ``>>> import pytest; pytest.skip()``
+
+        Doctests in a ``Benchmark`` block are also disabled, unless ``bench``
+        is True, because they are only run by the ``bench`` command.
         """
+        if not bench and (self.block_type or '').startswith('Benchmark'):
+            return True
         disable_patterns = [
             r'>>>\s*#\s*DISABLE',
             r'>>>\s*#\s*UNSTABLE',
@@ -305,6 +367,61 @@ class DocTest(object):
         m = re.match(pattern, self.docsrc, flags=re.IGNORECASE)
         return m is not None
 
+    def resolve_skips(self):
+        """
+        Checks if the ``SKIP`` and ``REQUIRES`` directives skip every part of
+        the doctest, in which case it is reported as skipped without importing
+        its module.
+
+        The directives are replayed in the same way as when the doctest runs.
+        Their effects only depend on the command line, the environment
+        variables, the platform, and which modules are installed, so they can
+        be decided statically. The result is resolved once (e.g. when the
+        native runner collects the doctest) and reused by :func:`run`.
+        Nothing is resolved statically when ``global_exec`` is configured,
+        because it can change the command line before the directives are
+        evaluated.
+
+        Returns:
+            bool: True if all parts are skipped
+
+        Example:
+            >>> from xdoctest import utils
+            >>> docsrc = utils.codeblock(
+            ...     '''
+            ...     >>> # xdoctest: +REQUIRES(module:not_a_real_module)
+            ...     >>> import not_a_real_module
+            ...     ''')
+            >>> print(DocTest(docsrc=docsrc).resolve_skips())
+            True
+            >>> docsrc = utils.codeblock(
+            ...     '''
+            ...     >>> x = 1  # xdoctest: +SKIP
+            ...     >>> print('this part runs')
+            ...     ''')
+            >>> print(DocTest(docsrc=docsrc).resolve_skips())
+            False
+        """
+        if self._all_parts_skipped is None:
+            all_skipped = False
+            if not self.config.getvalue('global_exec'):
+                try:
+                    self._parse()
+                    default_state = self.config['default_runtime_state']
+                    runstate = directive.RuntimeState(default_state)
+                    all_skipped = len(self._parts) > 0
+                    for part in self._parts:
+                        runstate.update(part.directives)
+                        if not (runstate['SKIP'] or
+                                len(runstate['REQUIRES']) > 0):
+                            all_skipped = False
+                            break
+                except Exception:
+                    # Errors are reported when the doctest runs
+                    all_skipped = False
+            self._all_parts_skipped = all_skipped
+        return self._all_parts_skipped
+
     @property
     def unique_callname(self):
         """
@@ -460,23 +577,35 @@ class DocTest(object):
         """
         if self.module is None:
             if not self.modname.startswith('<'):
+                failure = _IMPORT_FAILURE_CACHE.get(self.modpath)
+                if failure is not None:
+                    msg = (
+                        'XDoctest did not import the module containing the '
+                        'doctest again, because an earlier doctest failed '
+                        'to import it:\n' + failure)
+                    raise exceptions.CachedImportError(msg, self.modpath)
                 # self.module = utils.import_module_from_path(self.modpath, index=0)
                 try:
-                    self.module = utils.import_module_from_path(self.modpath, index=-1)
-                except RuntimeError as ex:
-                    msg_parts = [
-                        ('XDoctest failed to pre-import the module '
-                         'containing the doctest.')
-                    ]
-                    msg_parts.append(str(ex))
-                    new_exc = RuntimeError('\n'.join(msg_parts))
-                    # new_exc = ex
-                    # Remove traceback before this line
-                    new_exc.__traceback__ = None
-                    # Backwards syntax compatible raise exc from None
-                    # https://www.python.org/dev/peps/pep-3134/#explicit-exception-chaining
-                    new_exc.__cause__ = None
-                    raise new_exc
+                    try:
+                        self.module = utils.import_module_from_path(self.modpath, index=-1)
+                    except RuntimeError as ex:
+                        msg_parts = [
+                            ('XDoctest failed to pre-import the module '
+                             'containing the doctest.')
+                        ]
+                        msg_parts.append(str(ex))
+                        new_exc = RuntimeError('\n'.join(msg_parts))
+                        # new_exc = ex
+                        # Remove traceback before this line
+                        new_exc.__traceback__ = None
+                        # Backwards syntax compatible raise exc from None
+                        # https://www.python.org/dev/peps/pep-3134/#explicit-exception-chaining
+                        new_exc.__cause__ = None
+                        raise new_exc
+                except Exception:
+                    _IMPORT_FAILURE_CACHE[self.modpath] = ''.join(
+                        traceback.format_exception(*sys.exc_info()))
+                    raise
 
     @staticmethod
     def _extract_future_flags(namespace):
@@ -492,17 +621,68 @@ class DocTest(object):
         return compileflags
 
     def _test_globals(self):
-        test_globals = self.global_namespace
+        """
+        Creates the globals a doctest runs with.
+
+        Names from the module take precedence over the ones already in
+        :attr:`global_namespace`. Where possible the module's ``__dict__`` is
+        layered underneath the doctest's own names instead of being copied
+        (see :class:`_LayeredNamespace`). Either way the doctest cannot
+        modify the module's namespace.
+        """
         if self.module is None:
+            test_globals = self.global_namespace
             compileflags = 0
         else:
-            test_globals.update(self.module.__dict__)
-            compileflags = self._extract_future_flags(test_globals)
+            module_globals = self.module.__dict__
+            overlay = {key: value
+                       for key, value in self.global_namespace.items()
+                       if key not in module_globals}
+            if self._can_layer_globals():
+                for key in _MODULE_DUNDERS:
+                    if key in module_globals:
+                        overlay[key] = module_globals[key]
+                test_globals = _LayeredNamespace(module_globals, overlay)
+            else:
+                test_globals = module_globals.copy()
+                test_globals.update(overlay)
+            compileflags = self._extract_future_flags(module_globals)
         # force print function and division futures
         compileflags |= __future__.print_function.compiler_flag
         compileflags |= __future__.division.compiler_flag
         return test_globals, compileflags
 
+    def _can_layer_globals(self):
+        """
+        Checks if the module's namespace can be layered underneath the
+        globals of this doctest instead of being copied.
+        """
+        if not _HAS_LAYERED_GLOBALS:
+            return False
+        sources = [part.source for part in self._parts]
+        global_exec = self.config.getvalue('global_exec')
+        if global_exec:
+            sources.append(global_exec)
+        return not any(_CLASS_PATTERN.search(source) for source in sources)
+
+    def _part_time_limit(self, runstate, deadline):
+        """
+        Returns the time limit for the next part, which is the smaller of the
+        TIMEOUT directive and the time remaining until the doctest deadline.
+
+        Returns:
+            _TimeLimit
+        """
+        seconds = runstate['TIMEOUT']
+        message = None
+        if deadline is not None:
+            remaining = max(deadline - time.time(), 1e-3)
+            if seconds is None or remaining < seconds:
+                seconds = remaining
+                message = 'Doctest timed out after {:g} seconds'.format(
+                    self.config['timeout'])
+        return _TimeLimit(seconds, message)
+
     def anything_ran(self):
         # If everything was skipped, then there will be no stdout
         return len(self.logged_stdout) > 0
@@ -528,11 +708,17 @@ class DocTest(object):
 
         # Prepare for actual test run
         self.logged_evals.clear()
-        self.logged_stdout.clear()
+        self.logged_stdout = _LazyTextLog()
+        self.logged_stderr = _LazyTextLog()
         self._unmatched_stdout = []
 
         self._skipped_parts = []
         self.exc_info = None
+        self.failed_part = None
+        self.warn_list = None
+        self.memory_usage = None
+        self.profile_fpath = None
+        self.benchmark_stats = None
         self._suppressed_stdout = verbose <= 1
 
         # Initialize a new runtime state
@@ -541,6 +727,16 @@ class DocTest(object):
         # setup reporting choice
         runstate.set_report_style(self.config['reportchoice'].lower())
 
+        if self.resolve_skips():
+            # Nothing would run, so the module is not imported
+            self._skipped_parts = list(self._parts)
+            self.global_namespace.clear()
+            if self.mode == 'pytest':
+                import pytest
+                pytest.skip()
+            summary = self._post_run(verbose)
+            return summary
+
         try:
             self._import_module()
         except Exception:
@@ -572,8 +768,53 @@ class DocTest(object):
         needs_capture = True
 
         # Use the same capture object for all parts in the test
-        cap = utils.CaptureStdout(supress=self._suppressed_stdout,
-                                  enabled=needs_capture)
+        capture_fds = self.config.getvalue('capture') == 'fd' and six.PY3
+        max_capture_bytes = self.config.getvalue('max_capture_bytes')
+        if capture_fds:
+            # The output of each part is only decoded when it is needed
+            cap = utils.CaptureFD(supress=self._suppressed_stdout,
+                                  enabled=needs_capture,
+                                  max_bytes=max_capture_bytes)
+            logged_text = cap.part_loader
+        else:
+            cap = utils.CaptureStdout(supress=self._suppressed_stdout,
+                                      enabled=needs_capture,
+                                      max_bytes=max_capture_bytes)
+
+            def logged_text(stream='stdout'):
+                # The logged parts are truncated to max_capture_bytes
+                return cap.parts[-1] if cap.parts else cap.text
+
+        # The output of a part without a want may be checked by a later want
+        has_later_want = []
+        seen_want = False
+        for part in reversed(self._parts):
+            has_later_want.append(seen_want)
+            seen_want = seen_want or bool(part.want)
+        has_later_want.reverse()
+
+        # Measure memory when tracemalloc is tracing (e.g. ``--memory``)
+        memory = _MemoryUsage()
+
+        # Profile the parts (and nothing else) if requested (``--profile``)
+        profiler = _Profiler(self.profile_dpath)
+
+        # Collect the code of the parts to time (``bench``). A Benchmark
+        # block that does not use the BENCHMARK directive is timed entirely.
+        timed_parts = None
+        if self.benchmark is not None:
+            from xdoctest import benchmark as xdoc_benchmark
+            timed_parts = []
+            time_all_parts = not xdoc_benchmark.uses_benchmark_directive(self)
+
+        # The configured timeout limits the entire doctest, whereas the
+        # TIMEOUT directive limits each individual part.
+        example_timeout = self.config.getvalue('timeout')
+        if example_timeout:
+            deadline = time.time() + example_timeout
+        else:
+            deadline = None
+
         with warnings.catch_warnings(record=True) as self.warn_list:
             for partx, part in enumerate(self._parts):
 
@@ -610,11 +851,16 @@ class DocTest(object):
                     #   Typically single is used instead of eval
                     self._partfilename = '<doctest:' + self.node + '>'
                     source_text = part.compilable_source()
-                    code = compile(
-                        source_text, mode=part.compile_mode,
-                        filename=self._partfilename,
-                        flags=compileflags, dont_inherit=True
-                    )
+                    if self.code_cache is None:
+                        code = compile(
+                            source_text, mode=part.compile_mode,
+                            filename=self._partfilename,
+                            flags=compileflags, dont_inherit=True
+                        )
+                    else:
+                        code = self.code_cache.compile(
+                            source_text, self._partfilename,
+                            part.compile_mode, compileflags)
                 except KeyboardInterrupt:  # nocover
                     raise
                 except Exception:
@@ -624,21 +870,35 @@ class DocTest(object):
                     # self.failed_tb_lineno = tb.tb_lineno
                     # if on_error == 'raise':
                     #     raise
+                if timed_parts is not None and (time_all_parts or
+                                                runstate['BENCHMARK']):
+                    timed_parts.append((code, part.compile_mode))
                 try:
                     # Execute the doctest code
                     try:
                         # NOTE: For code passed to eval or exec, there is no
                         # difference between locals and globals. Only pass in
                         # one dict, otherwise there is weird behavior
+                        # Output that is checked must be kept in full
+                        if part.want:
+                            keep_full = not runstate['IGNORE_WANT']
+                        else:
+                            keep_full = has_later_want[partx]
+                        if not capture_fds:
+                            cap.keep_full = keep_full
                         with cap:
                             # We can execute each part using exec or eval.  If
                             # a doctest part has `compile_mode=eval` we
                             # exepect it to return an object with a repr that
                             # can compared to a "want" statement.
                             # print('part.compile_mode = {!r}'.format(part.compile_mode))
+                            timer = self._part_time_limit(runstate, deadline)
+                            measure = memory.part(partx, self.lineno +
+                                                  part.line_offset)
                             if part.compile_mode == 'eval':
                                 # print('test_globals = {}'.format(sorted(test_globals.keys())))
-                                got_eval = eval(code, test_globals)
+                                with timer, measure, profiler:
+                                    got_eval = eval(code, test_globals)
                                 # if EVAL_MIGHT_RETURN_COROUTINE:
                                 #     import types
                                 #     if isinstance(got_eval, types.CoroutineType):
@@ -650,12 +910,13 @@ class DocTest(object):
                                 #         import asyncio
                                 #         got_eval =  asyncio.run(got_eval)
                             else:
-                                exec(code, test_globals)
+                                with timer, measure, profiler:
+                                    exec(code, test_globals)
 
                         # Record any standard output and "got_eval" produced by
                         # this doctest_part.
                         self.logged_evals[partx] = got_eval
-                        self.logged_stdout[partx] = cap.text
+                        self.logged_stdout[partx] = logged_text()
                     except Exception:
                         if part.want:
                             # A failure may be expected if the traceback
@@ -677,14 +938,28 @@ class DocTest(object):
                         if part.want:
                             got_stdout = cap.text
                             if not runstate['IGNORE_WANT']:
-                                part.check(got_stdout, got_eval, runstate,
-                                           unmatched=self._unmatched_stdout)
+                                unmatched = [
+                                    text() if callable(text) else text
+                                    for text in self._unmatched_stdout]
+                                try:
+                                    part.check(got_stdout, got_eval, runstate,
+                                               unmatched=unmatched)
+                                except checker.GotWantException as ex:
+                                    # Only report the head and tail of the
+                                    # output that was checked
+                                    ex.got = utils.truncate_output(
+                                        ex.got, max_capture_bytes)
+                                    raise
                             # Clear unmatched output when a check passes
                             self._unmatched_stdout = []
                         else:
                             # If a part doesnt have a want allow its output to
-                            # be matched by the next part.
-                            self._unmatched_stdout.append(cap.text)
+                            # be matched by the next part. The output is kept
+                            # in full until a want checks it.
+                            if keep_full:
+                                self._unmatched_stdout.append(cap.text)
+                            else:
+                                self._unmatched_stdout.append(logged_text())
 
                 # Handle anything that could go wrong
                 except KeyboardInterrupt:  # nocover
@@ -706,6 +981,18 @@ class DocTest(object):
                     if on_error == 'raise':
                         raise ex.orig_ex
                     break
+                except exceptions.DoctestTimeout:
+                    # When the part ran for too long
+                    ex_type, ex_value, tb = sys.exc_info()
+                    self.failed_tb_lineno = 1
+                    for sub_tb in _traverse_traceback(tb):
+                        if sub_tb.tb_frame.f_code.co_filename == self._partfilename:
+                            self.failed_tb_lineno = sub_tb.tb_lineno
+                            break
+                    self.exc_info = (ex_type, ex_value, tb)
+                    if on_error == 'raise':
+                        raise
+                    break
                 except Exception as _ex_dbg:
                     ex_type, ex_value, tb = sys.exc_info()
 
@@ -756,10 +1043,20 @@ class DocTest(object):
                         assert cap.text is not None
                     # Ensure that we logged the output even in failure cases
                     self.logged_evals[partx] = got_eval
-                    self.logged_stdout[partx] = cap.text
+                    self.logged_stdout[partx] = logged_text()
+                    if capture_fds and cap.enabled:
+                        self.logged_stderr[partx] = logged_text('stderr')
 
         if self.exc_info is None:
             self.failed_part = None
+            if timed_parts:
+                try:
+                    self.benchmark_stats = self.benchmark.measure(
+                        timed_parts, test_globals)
+                except Exception as ex:
+                    # The parts may not be repeatable
+                    self.benchmark_stats = {'error': '{}: {}'.format(
+                        type(ex).__name__, ex)}
 
         if len(self._skipped_parts) == len(self._parts):
             # we skipped everything
@@ -767,10 +1064,19 @@ class DocTest(object):
                 import pytest
                 pytest.skip()
 
+        # Measured before the namespace is cleared, so the net allocation
+        # includes everything the doctest still references
+        self.memory_usage = memory.usage()
+        self.profile_fpath = profiler.dump(self.node)
+        if capture_fds:
+            # Keep the output in memory and release the temporary files
+            cap.detach()
+
         summary = self._post_run(verbose)
 
         # Clear the global namespace so doctests don't leak memory
         self.global_namespace.clear()
+        test_globals.clear()
 
         return summary
 
@@ -821,6 +1127,24 @@ class DocTest(object):
                 print(self.format_src())
                 print(self._color(self._block_prefix + ' STDOUT/STDERR', 'white'))
 
+    def _release_run_state(self):
+        """
+        Releases what a finished run keeps alive: the traceback of a failure
+        (whose frames reference the objects the doctest created), recorded
+        warnings, and the logged outputs. Call this once the outcome has been
+        recorded (e.g. in a :class:`DocTestResult`).
+        """
+        if self.exc_info is not None:
+            tb = self.exc_info[2]
+            if tb is not None and hasattr(traceback, 'clear_frames'):
+                traceback.clear_frames(tb)
+        self.exc_info = None
+        self.warn_list = None
+        self.logged_evals = OrderedDict()
+        self.logged_stdout = OrderedDict()
+        self.logged_stderr = OrderedDict()
+        self._unmatched_stdout = []
+
     def failed_line_offset(self):
         """
         Determine which line in the doctest failed.
@@ -1007,6 +1331,7 @@ class DocTest(object):
                 # temp[tindex] += [utils.indent(' >>> # skipped', indent_text)]
                 continue
             part_out = r1_strip_nl(self.logged_stdout.get(partx, ''))
+            part_err = r1_strip_nl(self.logged_stderr.get(partx, ''))
             if part is self.failed_part:
                 tindex += 1
             # Append the part source code
@@ -1014,6 +1339,9 @@ class DocTest(object):
             # Append the part stdout (if it exists)
             if part_out:
                 temp[tindex] += [utils.indent(part_out, indent_text)]
+            # Append the part stderr (only captured with ``capture='fd'``)
+            if part_err:
+                temp[tindex] += [utils.indent(part_err, indent_text)]
             if part is self.failed_part:
                 tindex += 1
             # part_eval = self.logged_evals[partx]
@@ -1183,6 +1511,511 @@ class DocTest(object):
         return summary
 
 
+class DocTestResult(utils.NiceRepr):
+    """
+    A picklable record of the outcome of running a :class:`DocTest`.
+
+    When a doctest is executed in a different process than the one that
+    reports on it (e.g. when the native runner uses ``--jobs``), the
+    :class:`DocTest` itself cannot be sent back because it holds on to
+    tracebacks, frames, and the test namespace. This record keeps only the
+    plain data that the runner needs to build its summary report.
+
+    Attributes:
+        node (str): the unique node id of the doctest
+        cmdline (str): a cli-instruction that reruns the doctest
+        modname (str | None): the name of the module the doctest belongs to
+        passed (bool): True if the doctest passed
+        failed (bool): True if the doctest failed
+        skipped (bool): True if every part of the doctest was skipped
+        failure_lines (List[str]): the text of :func:`DocTest.repr_failure`
+        warn_texts (List[str]): formatted warnings raised while running
+        memory_usage (Dict | None): see :attr:`DocTest.memory_usage`
+        profile_fpath (str | None): see :attr:`DocTest.profile_fpath`
+        failed_lineno (int | None): the line in the source file that failed
+        got (str | None): the output of the part whose "want" did not match
+        want (str | None): the expected output of that part
+        error (str | None): the exception that failed the doctest (if it
+            did not fail because of a got/want mismatch)
+        import_error (str | None): the formatted error raised when the
+            module of the doctest was imported, if that failed
+
+    Example:
+        >>> from xdoctest import core
+        >>> docstr = utils.codeblock(
+        ...     '''
+        ...     >>> x = 1
+        ...     >>> assert x == 2
+        ...     ''')
+        >>> example = list(core.parse_docstr_examples(docstr))[0]
+        >>> example.mode = 'native'
+        >>> summary = example.run(verbose=0, on_error='return')
+        >>> result = DocTestResult.from_doctest(example, summary)
+        >>> assert result.failed and not result.passed
+        >>> assert result.cmdline == example.cmdline
+        >>> assert any('assert x == 2' in line for line in result.repr_failure())
+        >>> assert result.failed_lineno == 2
+        >>> assert result.error == 'AssertionError'
+        >>> import pickle
+        >>> assert pickle.loads(pickle.dumps(result)).node == result.node
+    """
+
+    def __init__(self, node, cmdline, passed=False, failed=False,
+                 skipped=False, failure_lines=None, warn_texts=None,
+                 memory_usage=None, profile_fpath=None, failed_lineno=None,
+                 got=None, want=None, error=None, modname=None,
+                 import_error=None):
+        self.node = node
+        self.cmdline = cmdline
+        self.modname = modname
+        self.passed = passed
+        self.failed = failed
+        self.skipped = skipped
+        self.failure_lines = failure_lines or []
+        self.warn_texts = warn_texts or []
+        self.memory_usage = memory_usage
+        self.profile_fpath = profile_fpath
+        self.failed_lineno = failed_lineno
+        self.got = got
+        self.want = want
+        self.error = error
+        self.import_error = import_error
+
+    def __nice__(self):
+        if self.failed:
+            status = 'failed'
+        elif self.skipped:
+            status = 'skipped'
+        else:
+            status = 'passed'
+        return '{}, {}'.format(self.node, status)
+
+    @classmethod
+    def from_doctest(cls, example, summary):
+        """
+        Args:
+            example (DocTest): a doctest that has been run
+            summary (Dict): the summary returned by :func:`DocTest.run`
+
+        Returns:
+            DocTestResult
+        """
+        failure_lines = []
+        failed_lineno = got = want = error = import_error = None
+        if summary['failed']:
+            failure_lines = example.repr_failure()
+            failed_lineno = example.failed_lineno()
+            if example.failed_part == '<IMPORT>':
+                import_error = _IMPORT_FAILURE_CACHE.get(example.modpath)
+            if example.exc_info is not None:
+                ex_type, ex_value, tb = example.exc_info
+                if isinstance(ex_value, checker.GotWantException):
+                    got, want = ex_value.got, ex_value.want
+                else:
+                    error = ''.join(traceback.format_exception_only(
+                        ex_type, ex_value)).strip()
+        self = cls(
+            node=example.node,
+            cmdline=example.cmdline,
+            modname=example.modname,
+            passed=summary['passed'],
+            failed=summary['failed'],
+            skipped=summary['skipped'],
+            failure_lines=failure_lines,
+            warn_texts=_format_warnlist(example.warn_list),
+            memory_usage=example.memory_usage,
+            profile_fpath=example.profile_fpath,
+            failed_lineno=failed_lineno,
+            got=got,
+            want=want,
+            error=error,
+            import_error=import_error,
+        )
+        return self
+
+    @property
+    def summary(self):
+        return {
+            'passed': self.passed,
+            'skipped': self.skipped,
+            'failed': self.failed,
+        }
+
+    def repr_failure(self, with_tb=True):
+        """
+        Returns:
+            List[str]: the failure text captured when the doctest was run
+        """
+        return list(self.failure_lines)
+
+
+def _format_warnlist(warn_list):
+    """
+    Formats recorded warnings into strings
+
+    Args:
+        warn_list (List[warnings.WarningMessage] | None):
+
+    Returns:
+        List[str]
+    """
+    if not warn_list:
+        return []
+    return [warnings.formatwarning(warn.message, warn.category,
+                                   warn.filename, warn.lineno)
+            for warn in warn_list]
+
+
+class _TimeLimit(object):
+    """
+    Context manager that raises :class:`xdoctest.exceptions.DoctestTimeout`
+    if its body runs for too long.
+
+    The limit is enforced with ``SIGALRM``, which is only available in the
+    main thread on POSIX systems. Otherwise a warning is issued and the body
+    runs without a limit.
+
+    Args:
+        seconds (float | None): maximum duration of the body
+        message (str | None): text of the raised exception
+
+    Example:
+        >>> # xdoctest: +REQUIRES(POSIX)
+        >>> import time
+        >>> from xdoctest import exceptions
+        >>> try:
+        >>>     with _TimeLimit(0.05):
+        >>>         time.sleep(1)
+        >>> except exceptions.DoctestTimeout as ex:
+        >>>     print(ex)
+        Timed out after 0.05 seconds
+        >>> with _TimeLimit(None):
+        >>>     time.sleep(0.01)
+    """
+    def __init__(self, seconds=None, message=None):
+        self.seconds = seconds
+        if message is None and seconds is not None:
+            message = 'Timed out after {:g} seconds'.format(seconds)
+        self.message = message
+        self._enabled = False
+
+    def __enter__(self):
+        import signal
+        import threading
+        if self.seconds is None:
+            return self
+        if not hasattr(signal, 'setitimer'):
+            warnings.warn('Doctest timeouts require SIGALRM, which is not '
+                          'available on this platform')
+            return self
+        if hasattr(threading, 'main_thread'):
+            in_main_thread = threading.current_thread() is threading.main_thread()
+        else:  # nocover
+            # Python 2 can only tell the main thread by its name
+            in_main_thread = threading.current_thread().name == 'MainThread'
+        if not in_main_thread:
+            warnings.warn('Doctest timeouts can only be enforced in the main '
+                          'thread')
+            return self
+
+        def _on_timeout(signum, frame):
+            raise exceptions.DoctestTimeout(self.message)
+
+        self._enabled = True
+        self._tic = time.time()
+        self._prev_handler = signal.signal(signal.SIGALRM, _on_timeout)
+        self._prev_timer = signal.setitimer(signal.ITIMER_REAL, self.seconds)
+        return self
+
+    def __exit__(self, ex_type, ex_value, tb):
+        import signal
+        if self._enabled:
+            self._enabled = False
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._prev_handler)
+            # Restore any timer that was running before we started
+            prev_delay, prev_interval = self._prev_timer
+            if prev_delay > 0:
+                elapsed = time.time() - self._tic
+                signal.setitimer(signal.ITIMER_REAL,
+                                 max(prev_delay - elapsed, 1e-3),
+                                 prev_interval)
+        return False
+
+
+class _MemoryUsage(object):
+    """
+    Measures the memory allocated by the parts of a doctest with
+    :mod:`tracemalloc`. Nothing is measured unless tracemalloc is tracing
+    and can reset its peak (Python 3.9+).
+
+    Each part is measured relative to the memory that was allocated when it
+    started, and the doctest as a whole relative to the memory allocated when
+    this object was created. The peak of the doctest also includes what is
+    allocated between and after its parts (until :func:`usage` is called), so
+    it covers the same time as its net allocation.
+
+    Example:
+        >>> # xdoctest: +REQUIRES(PY3)
+        >>> import tracemalloc
+        >>> if not hasattr(tracemalloc, 'reset_peak'):
+        >>>     from xdoctest import ExitTestException
+        >>>     raise ExitTestException('requires python 3.9')
+        >>> tracemalloc.start()
+        >>> memory = _MemoryUsage()
+        >>> with memory.part(0, lineno=1):
+        >>>     data = bytearray(10 ** 6)
+        >>> with memory.part(1, lineno=2):
+        >>>     tmp = bytearray(4 * 10 ** 6)
+        >>>     del tmp
+        >>> usage = memory.usage()
+        >>> tracemalloc.stop()
+        >>> assert usage['parts'][0]['net'] >= 10 ** 6
+        >>> assert usage['parts'][1]['peak'] > 3 * 10 ** 6
+        >>> assert usage['parts'][1]['net'] < 10 ** 6
+        >>> assert usage['peak'] > 4 * 10 ** 6
+        >>> assert usage['peak'] >= usage['net']
+        >>> assert _MemoryUsage().usage() is None
+    """
+    def __init__(self):
+        try:
+            import tracemalloc
+        except ImportError:  # nocover
+            tracemalloc = None
+        if (tracemalloc is None or not tracemalloc.is_tracing() or
+                not hasattr(tracemalloc, 'reset_peak')):
+            tracemalloc = None
+        self._tracemalloc = tracemalloc
+        self.parts = OrderedDict()
+        self.peak = 0
+        if tracemalloc is not None:
+            self.start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+    def part(self, partx, lineno=None):
+        """
+        Prepares to measure a part. Use the returned object as a context
+        manager around the code of the part.
+        """
+        self._partx = partx
+        self._lineno = lineno
+        return self
+
+    def __enter__(self):
+        if self._tracemalloc is not None:
+            # Include the peak since the previous part before it is reset
+            self._part_start = self._update_peak()
+            self._tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, ex_type, ex_value, tb):
+        if self._tracemalloc is not None:
+            current, peak = self._tracemalloc.get_traced_memory()
+            self.parts[self._partx] = {
+                'lineno': self._lineno,
+                'peak': peak - self._part_start,
+                'net': current - self._part_start,
+            }
+            self.peak = max(self.peak, peak - self.start)
+        return False
+
+    def _update_peak(self):
+        """
+        Includes the peak since the last reset in the peak of the doctest
+
+        Returns:
+            int: the memory that is currently allocated
+        """
+        current, peak = self._tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak - self.start)
+        return current
+
+    def usage(self):
+        """
+        Returns:
+            Dict | None: the ``peak`` and ``net`` bytes allocated by the
+                doctest, and the same for each of its ``parts`` (along with
+                their ``lineno``). None if memory was not measured.
+        """
+        if self._tracemalloc is None:
+            return None
+        current = self._update_peak()
+        return {
+            'peak': self.peak,
+            'net': current - self.start,
+            'parts': self.parts,
+        }
+
+
+class _Profiler(object):
+    """
+    Profiles the parts of a doctest with :mod:`cProfile` and writes the
+    stats to a pstats file. Nothing is profiled unless ``dpath`` is given.
+
+    Args:
+        dpath (str | None): directory where the pstats file is written
+
+    Example:
+        >>> import pstats
+        >>> with utils.TempDir() as temp:
+        >>>     profiler = _Profiler(temp.dpath)
+        >>>     with profiler:
+        >>>         sorted(range(1000))
+        >>>     fpath = profiler.dump('mod::func:0')
+        >>>     stats = pstats.Stats(fpath)
+        >>> assert fpath.endswith('mod_func_0.pstats')
+        >>> assert any('sorted' in name for _, _, name in stats.stats)
+        >>> assert _Profiler(None).dump('mod::func:0') is None
+    """
+    def __init__(self, dpath=None):
+        self.dpath = dpath
+        self._profile = None
+        if dpath is not None:
+            import cProfile
+            self._profile = cProfile.Profile()
+        self._enabled = False
+
+    def __enter__(self):
+        if self._profile is not None:
+            self._profile.enable()
+            self._enabled = True
+        return self
+
+    def __exit__(self, ex_type, ex_value, tb):
+        if self._profile is not None:
+            self._profile.disable()
+        return False
+
+    def dump(self, name):
+        """
+        Writes the stats if anything was profiled.
+
+        Args:
+            name (str): identifies the doctest (e.g. its node)
+
+        Returns:
+            str | None: path to the pstats file
+        """
+        if not self._enabled:
+            return None
+        from os.path import join
+        utils.ensuredir(self.dpath)
+        fname = re.sub(r'[^\w.-]+', '_', name) + '.pstats'
+        fpath = join(self.dpath, fname)
+        self._profile.dump_stats(fpath)
+        return fpath
+
+
+class _LazyTextLog(OrderedDict):
+    """
+    Maps each part to its captured text, which may be stored as a function
+    that decodes the text when it is first accessed.
+
+    Example:
+        >>> log = _LazyTextLog()
+        >>> log[0] = 'eager'
+        >>> log[1] = lambda: 'lazy'
+        >>> print(log[1], log.get(0), log.get(2, 'missing'))
+        lazy eager missing
+        >>> print(list(log.values()))
+        ['eager', 'lazy']
+    """
+    def __getitem__(self, key):
+        value = OrderedDict.__getitem__(self, key)
+        if callable(value):
+            value = value()
+            OrderedDict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+
+class _LayeredNamespace(dict):
+    r"""
+    Globals for a doctest that look up missing names in a base namespace
+    (usually a module's ``__dict__``) instead of copying it.
+
+    Names the doctest assigns or deletes only change this dict, so the base
+    is never modified. The interpreter finds base names via
+    :meth:`__missing__`, except for lookups it makes directly on the
+    underlying dict (e.g. in class bodies), which only see this dict.
+
+    Args:
+        base (dict): the namespace underneath
+        overlay (dict): initial names, which take precedence over the base
+
+    Example:
+        >>> base = {'x': 1, 'y': 2}
+        >>> ns = _LayeredNamespace(base, {'z': 3})
+        >>> exec('x = x + 10\ndel y\ndef f():\n    return x + z', ns)
+        >>> print(ns['f']())
+        14
+        >>> print(sorted(key for key in ns if not key.startswith('__')))
+        ['f', 'x', 'z']
+        >>> assert 'y' not in ns and 'y' not in ns.keys()
+        >>> print(base)
+        {'x': 1, 'y': 2}
+    """
+    def __init__(self, base, overlay=None):
+        super(_LayeredNamespace, self).__init__(overlay or {})
+        self.base = base
+        self.deleted = set()
+
+    def __missing__(self, key):
+        if key in self.deleted:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or (
+            key in self.base and key not in self.deleted)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if dict.__contains__(self, key):
+            dict.__delitem__(self, key)
+        if key in self.base:
+            self.deleted.add(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def _merged(self):
+        merged = {key: value for key, value in self.base.items()
+                  if key not in self.deleted}
+        merged.update(dict.items(self))
+        return merged
+
+    def copy(self):
+        return self._merged()
+
+    def keys(self):
+        return self._merged().keys()
+
+    def values(self):
+        return self._merged().values()
+
+    def items(self):
+        return self._merged().items()
+
+    def __iter__(self):
+        return iter(self._merged())
+
+    def __len__(self):
+        return len(self._merged())
+
+    def __repr__(self):
+        return repr(self._merged())
+
+
 def _traverse_traceback(tb):
     # Lives down here to avoid issue calling exec in a function that contains a
     # nested function with free variable.  Not sure how necesary this is
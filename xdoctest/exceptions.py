@@ -27,6 +27,26 @@ class ExitTestException(Exception):
     pass
 
 
+class DoctestTimeout(BaseException):
+    """
+    Raised inside a running doctest when it exceeds its time limit.
+
+    This derives from BaseException so it is not swallowed by an
+    ``except Exception`` clause in the code being tested.
+    """
+    pass
+
+
+class CachedImportError(RuntimeError):
+    """
+    Raised instead of importing a module again after an earlier doctest
+    failed to import it. The message includes the original error.
+    """
+    def __init__(self, msg, modpath=None):
+        super(CachedImportError, self).__init__(msg)
+        self.modpath = modpath
+
+
 class IncompleteParseError(SyntaxError):
     """
     Used when something goes wrong in the xdoctest parser
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Selects the doctests that could be affected by a change in version control.
+
+A module is affected if it changed since a git reference, or if it
+(transitively) imports a module that changed. Imports are found statically
+with :func:`xdoctest.static_analysis.parse_static_imports`, so nothing is
+imported to build the graph.
+
+This powers the ``--changed-since REF`` option of the native runner.
+
+Example:
+    >>> from xdoctest.import_graph import *  # NOQA
+    >>> graph = {
+    >>>     'pkg.a': set(),
+    >>>     'pkg.b': {'pkg', 'pkg.a'},
+    >>>     'pkg.c': {'pkg', 'pkg.b'},
+    >>>     'pkg.d': {'os'},
+    >>> }
+    >>> print(sorted(affected_modnames(graph, {'pkg.a'})))
+    ['pkg.a', 'pkg.b', 'pkg.c']
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+from os.path import join, isdir, dirname, normpath, realpath
+import subprocess
+import warnings
+from xdoctest import static_analysis as static
+from xdoctest.utils import util_import
+
+
+def git_changed_files(ref, cwd=None):
+    """
+    Lists files that differ from a git reference.
+
+    This includes committed and uncommitted changes to tracked files, as
+    well as untracked files that are not ignored.
+
+    Args:
+        ref (str): any git reference (e.g. ``main``, ``HEAD~3``, a sha)
+        cwd (str): a directory inside the git repository
+
+    Returns:
+        List[str]: absolute paths of the changed files
+
+    Raises:
+        GitError: if git is unavailable or the reference is invalid
+    """
+    toplevel = _git(['rev-parse', '--show-toplevel'], cwd=cwd).strip()
+    changed = _git(['diff', '--name-only', ref, '--'], cwd=cwd).splitlines()
+    untracked = _git(['ls-files', '--others', '--exclude-standard',
+                      '--full-name'], cwd=toplevel).splitlines()
+    fpaths = [normpath(join(toplevel, p)) for p in changed + untracked if p]
+    return fpaths
+
+
+class GitError(RuntimeError):
+    """
+    Raised when git is unavailable or a git command fails (e.g. because of
+    an invalid reference)
+    """
+
+
+def _git(args, cwd=None):
+    try:
+        proc = subprocess.Popen(['git'] + args, cwd=cwd,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+    except OSError as ex:
+        raise GitError('Unable to run git: {}'.format(ex))
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        raise GitError('git {} failed: {}'.format(
+            ' '.join(args), err.decode('utf8', 'replace').strip()))
+    return out.decode('utf8', 'replace')
+
+
+def build_import_graph(modpaths):
+    """
+    Statically determines the modules imported by each module.
+
+    Args:
+        modpaths (List[str]): paths to python source files
+
+    Returns:
+        Dict[str, Set[str]]: maps the name of each module to the names of
+            the modules it imports.
+    """
+    graph = {}
+    for modpath in modpaths:
+        modname = util_import.modpath_to_modname(modpath, check=False)
+        try:
+            imported = static.parse_static_imports(fpath=modpath)
+        except (SyntaxError, UnicodeDecodeError, IOError, OSError) as ex:
+            # Be conservative: we can't tell what this module depends on
+            warnings.warn('Unable to parse imports of {}: {!r}'.format(
+                modpath, ex))
+            imported = None
+        graph[modname] = imported
+    return graph
+
+
+def affected_modnames(graph, changed):
+    """
+    Finds the modules that changed or transitively import a changed module.
+
+    Args:
+        graph (Dict[str, Set[str] | None]): maps each module name to the
+            names it imports. A value of None means the imports are unknown,
+            in which case the module is always considered affected.
+        changed (Set[str]): names of the modules that changed
+
+    Returns:
+        Set[str]: names of the affected modules
+    """
+    importers = {}
+    affected = set(changed)
+    for modname, imported in graph.items():
+        if imported is None:
+            affected.add(modname)
+            continue
+        for name in imported:
+            importers.setdefault(name, set()).add(modname)
+
+    stack = list(affected)
+    while stack:
+        name = stack.pop()
+        for importer in importers.get(name, ()):
+            if importer not in affected:
+                affected.add(importer)
+                stack.append(importer)
+    return affected
+
+
+def changed_modnames(pkgpath, ref):
+    """
+    Finds the modules in a package that are affected by changes since ``ref``.
+
+    Args:
+        pkgpath (str): path to the package or module being tested. Its
+            modules form the import graph.
+        ref (str): a git reference
+
+    Returns:
+        Set[str]: names of the affected modules
+    """
+    cwd = pkgpath if isdir(pkgpath) else dirname(realpath(pkgpath))
+    changed_fpaths = git_changed_files(ref, cwd=cwd)
+    changed = {
+        util_import.modpath_to_modname(fpath, check=False)
+        for fpath in changed_fpaths if fpath.endswith('.py')
+    }
+    modpaths = [
+        modpath for modpath in static.package_modpaths(pkgpath, with_pkg=True)
+        if modpath.endswith('.py')
+    ]
+    graph = build_import_graph(modpaths)
+    affected = affected_modnames(graph, changed)
+    return affected
+
+
+def select_changed_examples(examples, pkgpath, ref):
+    """
+    Filters examples to those in modules affected by changes since ``ref``.
+
+    Args:
+        examples (List[DocTest]): the collected examples
+        pkgpath (str): path to the package or module being tested. Its
+            modules form the import graph.
+        ref (str): a git reference
+
+    Returns:
+        Tuple[List[DocTest], Set[str]]:
+            the selected examples and the names of the affected modules
+    """
+    affected = changed_modnames(pkgpath, ref)
+    selected = [example for example in examples
+                if example.modname in affected]
+    return selected, affected
@@ -37,6 +37,8 @@ there is room for improvement here.
 from __future__ import print_function, division, absolute_import, unicode_literals
 import six
 import ast
+import bisect
+import collections
 import sys
 import re
 import tokenize
@@ -160,10 +162,13 @@ class DoctestParser(object):
         labeled_lines = None
         grouped_lines = None
         all_parts = None
+        # The tokens of each statement are found while labeling the lines and
+        # reused by later stages.
+        statements = {}
         try:
-            labeled_lines = self._label_docsrc_lines(string)
+            labeled_lines = self._label_docsrc_lines(string, statements)
             grouped_lines = self._group_labeled_lines(labeled_lines)
-            all_parts = list(self._package_groups(grouped_lines))
+            all_parts = list(self._package_groups(grouped_lines, statements))
         except Exception as orig_ex:
 
             if labeled_lines is None:
@@ -203,7 +208,7 @@ class DoctestParser(object):
             print('\n===== FINISHED PARSE ====')
         return all_parts
 
-    def _package_groups(self, grouped_lines):
+    def _package_groups(self, grouped_lines, statements=None):
         if DEBUG > 1:
             import ubelt as ub
             print('<PACKAGE LABEL GROUPS>')
@@ -212,7 +217,8 @@ class DoctestParser(object):
         for chunk in grouped_lines:
             if isinstance(chunk, tuple):
                 slines, wlines = chunk
-                for example in self._package_chunk(slines, wlines, lineno):
+                for example in self._package_chunk(slines, wlines, lineno,
+                                                   statements):
                     yield example
                 lineno += len(slines) + len(wlines)
             else:
@@ -222,12 +228,21 @@ class DoctestParser(object):
         if DEBUG > 1:
             print('</PACKAGE LABEL GROUPS>')
 
-    def _package_chunk(self, raw_source_lines, raw_want_lines, lineno=0):
+    def _package_chunk(self, raw_source_lines, raw_want_lines, lineno=0,
+                       statements=None):
         """
         if `self.simulate_repl` is True, then each statement is broken into its
         own part.  Otherwise, statements are grouped by the closest `want`
         statement.
 
+        Args:
+            raw_source_lines (List[str]): the source lines with prefixes
+            raw_want_lines (List[str]): the want lines
+            lineno (int): the line offset of this chunk in the docstring
+            statements (Dict, default=None): the statements found by
+                :func:`DoctestParser._label_docsrc_lines`. Their tokens are
+                reused if they match this chunk.
+
         TODO:
             - [ ] EXCEPT IN CASES OF EXPLICIT CONTINUATION
 
@@ -255,11 +270,14 @@ class DoctestParser(object):
         # - [ ] Fix pytorch indentation issue here
 
         exec_source_lines = [p[4:] for p in source_lines]
+        stmt_tokens = _StatementTokens.from_labeled(exec_source_lines, lineno,
+                                                    statements)
 
         if DEBUG > 1:
             print(' * locate ps1 lines')
         # Find the line number of each standalone statement
-        ps1_linenos, mode_hint = self._locate_ps1_linenos(source_lines)
+        ps1_linenos, mode_hint = self._locate_ps1_linenos(source_lines,
+                                                          stmt_tokens)
         if DEBUG > 1:
             print('mode_hint = {!r}'.format(mode_hint))
             print(' * located ps1 lines')
@@ -276,7 +294,8 @@ class DoctestParser(object):
         ps1_to_directive = {}
         for s1, s2 in zip(ps1_linenos, ps1_linenos[1:] + [None]):
             lines = exec_source_lines[s1:s2]
-            directives = list(directive.Directive.extract('\n'.join(lines)))
+            directives = list(directive.Directive.extract(
+                '\n'.join(lines), stmt_tokens.comments(s1, s2)))
             if directives:
                 ps1_to_directive[s1] = directives
                 break_linenos.append(s1)
@@ -288,6 +307,10 @@ class DoctestParser(object):
             exec_lines = exec_source_lines[s1:s2]
             orig_lines = source_lines[s1:s2]
             directives = ps1_to_directive.get(s1, None)
+            if directives is None:
+                # Extract these now, so the part does not tokenize its source
+                directives = list(directive.Directive.extract(
+                    '\n'.join(exec_lines), stmt_tokens.comments(s1, s2)))
             example = doctest_part.DoctestPart(exec_lines,
                                                want_lines=want_lines,
                                                orig_lines=orig_lines,
@@ -433,7 +456,7 @@ class DoctestParser(object):
             print('</GROUP LABEL LINES>')
         return grouped_lines
 
-    def _locate_ps1_linenos(self, source_lines):
+    def _locate_ps1_linenos(self, source_lines, stmt_tokens=None):
         """
         Determines which lines in the source begin a "logical block" of code.
 
@@ -441,6 +464,9 @@ class DoctestParser(object):
             source_lines (List[str]): lines belonging only to the doctest src
                 these will be unindented, prefixed, and without any want.
 
+            stmt_tokens (_StatementTokens, default=None): the tokens of the
+                source lines, if they are already known.
+
         Returns:
             Tuple[List[int], bool]:
                 linenos is the first value a list of indices indicating which
@@ -488,38 +514,17 @@ class DoctestParser(object):
         """
         # Strip indentation (and PS1 / PS2 from source)
         exec_source_lines = [p[4:] for p in source_lines]
+        if stmt_tokens is None:
+            stmt_tokens = _StatementTokens.from_lines(exec_source_lines)
 
         def _hack_comment_statements(lines):
             # Hack to make comments appear like executable statements
             # note, this hack never leaves this function because we only are
             # returning line numbers.
             # FIXME: there is probably a better way to do this.
-            def balanced_intervals(lines):
-                """
-                Finds intervals of balanced nesting syntax
-
-                Args:
-                    lines (List[str]): lines of source code
-                """
-                intervals = []
-                a = len(lines) - 1
-                b = len(lines)
-                while b > 0:
-                    # move the head pointer up until we become balanced
-                    while not static.is_balanced_statement(lines[a:b], only_tokens=True) and a >= 0:
-                        a -= 1
-                    if a < 0:
-                        raise exceptions.IncompleteParseError(
-                            'ill-formed doctest: cannot find balanced ps1 lines.')
-                    # we found a balanced interval
-                    intervals.append((a, b))
-                    b = a
-                    a = a - 1
-
-                intervals = intervals[::-1]
-                return intervals
-            intervals = balanced_intervals(lines)
-            interval_starts = {t[0] for t in intervals}
+            # If the lines could not be tokenized there are no intervals,
+            # and ast.parse will report the real error.
+            interval_starts = {t[0] for t in stmt_tokens.intervals}
             for i, line in enumerate(lines):
                 if i in interval_starts and line.startswith('#'):
                     # Replace any comment that is not within an interval with a
@@ -591,21 +596,10 @@ class DoctestParser(object):
         if mode_hint == 'eval':
             # Also check the tokens in the source lines to look for semicolons
             # to fix #108
-            # Only iterate through non-empty lines otherwise tokenize will stop short
-            # TODO: we probably could just save the tokens if we got them earlier?
-            iterable = (line for line in exec_source_lines if line)
-            def _readline():
-                return next(iterable)
             # We cannot eval a statement with a semicolon in it
             # Single should work.
-            if PY2:
-                if any(t[0] == tokenize.OP and t[1] == ';'
-                       for t in tokenize.generate_tokens(_readline)):
-                    mode_hint = 'single'
-            else:
-                if any(t.type == tokenize.OP and t.string == ';'
-                       for t in tokenize.generate_tokens(_readline)):
-                    mode_hint = 'single'
+            if stmt_tokens.has_op(';'):
+                mode_hint = 'single'
 
         return ps1_linenos, mode_hint
 
@@ -636,9 +630,9 @@ class DoctestParser(object):
             is a idempotent (i.e. a no-op) when line numbers are correct, so
             nothing should break when this bug is fixed.
 
-            Starting from the end look at consecutive pairs of indices to
-            inspect the statement it corresponds to.  (the first statement goes
-            from ps1_linenos[-1] to the end of the line list.
+            The lines are partitioned into balanced intervals in a single
+            pass, and each line number is moved to the start of the interval
+            that contains it.
 
         Example:
             >>> ps1_linenos = [0, 2, 3]
@@ -646,22 +640,15 @@ class DoctestParser(object):
             >>> DoctestParser._workaround_16806(ps1_linenos, exec_source_lines)
             [0, 1, 3]
         """
-        new_ps1_lines = []
-        b = len(exec_source_lines)
-        for a in ps1_linenos[::-1]:
-            # the position of `b` is correct, but `a` may be wrong
-            # is_balanced_statement will be False iff `a` is wrong.
-            while not static.is_balanced_statement(exec_source_lines[a:b], only_tokens=True):
-                # shift `a` down until it becomes correct
-                a -= 1
-            # push the new correct value back into the list
-            new_ps1_lines.append(a)
-            # set the end position of the next string to be `a` , note, because
-            # this `a` is correct, the next `b` is must also be correct.
-            b = a
-        return new_ps1_lines[::-1]
-
-    def _label_docsrc_lines(self, string):
+        # Statements can only begin where a balanced interval begins, so
+        # shift each `a` down to the nearest such line.
+        starts = [a for a, b in static.balanced_intervals(exec_source_lines)]
+        new_ps1_lines = [
+            starts[bisect.bisect_right(starts, a) - 1] for a in ps1_linenos
+        ]
+        return new_ps1_lines
+
+    def _label_docsrc_lines(self, string, statements=None):
         """
         Give each line in the docstring a label so we can distinguish
         what parts are text, what parts are code, and what parts are "want"
@@ -670,6 +657,11 @@ class DoctestParser(object):
         Args:
             string (str): doctest source
 
+            statements (Dict[int, Tuple[List[str], List[Tuple]]], default=None):
+                if specified, the source lines (without prefixes) and tokens
+                of each statement are stored here, keyed by the index of its
+                first line.
+
         Returns:
             List[Tuple[str, str]]: labeled_lines - the above source broken
                 up by lines, each with a label indicating its type for later
@@ -798,7 +790,10 @@ class DoctestParser(object):
                 try:
                     if DEBUG:  # nocover
                         print('completing source')
-                    for part, norm_line in _complete_source(line, state_indent, line_iter):
+                    stmt_start = line_idx
+                    stmt_lines = []
+                    tokens = None if statements is None else []
+                    for part, norm_line in _complete_source(line, state_indent, line_iter, tokens):
                         if DEBUG > 4:  # nocover
                             print('Append Completion Line:')
                             print('part = {!r}'.format(part))
@@ -807,6 +802,9 @@ class DoctestParser(object):
                         if _hasprefix(norm_line, ('...',)):
                             curr_state = DCNT
                         labeled_lines.append((curr_state, part))
+                        stmt_lines.append(norm_line[4:])
+                    if statements is not None:
+                        statements[stmt_start] = (stmt_lines, tokens)
 
                 except exceptions.IncompleteParseError:
                     raise
@@ -840,6 +838,104 @@ class DoctestParser(object):
         return labeled_lines
 
 
+class _StatementTokens(object):
+    """
+    The tokens of consecutive balanced statements in a block of doctest
+    source, so the parser only needs to tokenize each line once.
+
+    Attributes:
+        intervals (List[Tuple[int, int]]): the start and stop line of each
+            statement. Empty if the lines could not be tokenized.
+        tokens (List[Tuple]): ``(type, string, start, end)`` tuples, where the
+            row of each position is an index into the lines.
+
+    Example:
+        >>> from xdoctest.parser import _StatementTokens
+        >>> lines = ['x = (1, # a', '     2)', '# b', 'y = 1; z = 2']
+        >>> self = _StatementTokens.from_lines(lines)
+        >>> self.intervals
+        [(0, 2), (2, 3), (3, 4)]
+        >>> self.comments(0, 2), self.comments(2, None)
+        (['# a'], ['# b'])
+        >>> self.has_op(';')
+        True
+    """
+    def __init__(self, intervals, tokens):
+        self.intervals = intervals
+        self.tokens = tokens
+        comment_tokens = [t for t in tokens if t[0] == tokenize.COMMENT]
+        self._comment_rows = [t[2][0] for t in comment_tokens]
+        self._comments = [t[1] for t in comment_tokens]
+
+    @classmethod
+    def from_lines(cls, lines):
+        """
+        Tokenizes the lines
+
+        Args:
+            lines (List[str]): source lines without prefixes
+        """
+        tokens = []
+        try:
+            intervals = static.balanced_intervals(lines, tokens)
+        except (tokenize.TokenError, IndentationError):
+            intervals, tokens = [], []
+        return cls(intervals, tokens)
+
+    @classmethod
+    def from_labeled(cls, lines, offset, statements):
+        """
+        Reuses the statements found while labeling the docstring lines if
+        they exactly cover the lines, otherwise the lines are tokenized.
+
+        Args:
+            lines (List[str]): source lines without prefixes
+            offset (int): the index of the first line in the docstring
+            statements (Dict | None): see
+                :func:`DoctestParser._label_docsrc_lines`
+        """
+        if statements:
+            intervals = []
+            tokens = []
+            start = 0
+            while start < len(lines):
+                record = statements.get(offset + start, None)
+                if record is None:
+                    break
+                stmt_lines, stmt_tokens = record
+                stop = start + len(stmt_lines)
+                if stmt_lines != lines[start:stop]:
+                    break
+                intervals.append((start, stop))
+                tokens.extend(
+                    (t[0], t[1], (t[2][0] + start, t[2][1]),
+                     (t[3][0] + start, t[3][1]))
+                    for t in stmt_tokens)
+                start = stop
+            else:
+                return cls(intervals, tokens)
+        return cls.from_lines(lines)
+
+    def comments(self, start=0, stop=None):
+        """
+        Returns:
+            List[str]: the comments that begin on lines ``start:stop``
+        """
+        a = bisect.bisect_left(self._comment_rows, start)
+        if stop is None:
+            b = len(self._comment_rows)
+        else:
+            b = bisect.bisect_left(self._comment_rows, stop)
+        return self._comments[a:b]
+
+    def has_op(self, op):
+        """
+        Returns:
+            bool: if any token is the operator ``op``
+        """
+        return any(t[0] == tokenize.OP and t[1] == op for t in self.tokens)
+
+
 def _min_indentation(s):
     "Return the minimum indentation of any non-blank line in `s`"
     indents = [len(indent) for indent in INDENT_RE.findall(s)]
@@ -849,12 +945,15 @@ def _min_indentation(s):
         return 0
 
 
-def _complete_source(line, state_indent, line_iter):
+def _complete_source(line, state_indent, line_iter, tokens=None):
     """
     helper
     remove lines from the iterator if they are needed to complete source
 
-    This uses :func:`static.is_balanced_statement` to do the heavy lifting
+    If ``tokens`` is specified, the tokens of the completed source are
+    appended to it (see :func:`static.take_balanced_statement`).
+
+    This uses :func:`static.take_balanced_statement` to do the heavy lifting
 
     Example:
         >>> from xdoctest.parser import *  # NOQA
@@ -875,13 +974,14 @@ def _complete_source(line, state_indent, line_iter):
     yield line, norm_line
 
     source_parts = [suffix]
+    completed = collections.deque()
 
     # These hacks actually modify the input doctest slighly
     HACK_TRIPLE_QUOTE_FIX = True
 
-    try:
-        while not static.is_balanced_statement(source_parts, only_tokens=True):
-            line_idx, next_line = next(line_iter)
+    def _iter_suffixes():
+        yield source_parts[0]
+        for line_idx, next_line in line_iter:
             norm_line = next_line[state_indent:]
             prefix = norm_line[:4]
             suffix = norm_line[4:]
@@ -910,8 +1010,19 @@ def _complete_source(line, state_indent, line_iter):
                         'Bad indentation in doctest on line {}: {!r}'.format(
                             line_idx, next_line))
             source_parts.append(suffix)
-            yield next_line, norm_line
-    except StopIteration:
+            completed.append((next_line, norm_line))
+            yield suffix
+
+    try:
+        # Lines are only taken from the iterator until the source is balanced
+        for _ in static.take_balanced_statement(_iter_suffixes(), tokens):
+            while completed:
+                yield completed.popleft()
+    except (tokenize.TokenError, IndentationError) as ex:
+        message = ex.args[0]
+        if not (message.startswith('EOF in multi-line') or
+                message.startswith('unindent does not match')):
+            raise
         if DEBUG:
             import ubelt as ub
             print('<FAIL DID NOT COMPLETE SOURCE>')
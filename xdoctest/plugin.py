@@ -16,6 +16,7 @@ https://github.com/pytest-dev/pytest
 
 """
 from __future__ import absolute_import, division, print_function
+import os
 import pytest
 from _pytest._code import code
 from _pytest import fixtures
@@ -104,6 +105,20 @@ def pytest_addoption(parser):
                     choices=['static', 'dynamic', 'auto'],
                     dest='xdoctest_analysis')
 
+    group.addoption('--xdoctest-collection-cache', '--xdoc-collection-cache',
+                    action='store_true', default=False,
+                    help=('Reuse the doctests collected from modules that '
+                          'did not change since the last run. These are '
+                          'stored in .xdoctest_cache in the rootdir'),
+                    dest='xdoctest_collection_cache')
+
+    group.addoption('--xdoctest-code-cache', '--xdoc-code-cache',
+                    action='store_true', default=False,
+                    help=('Reuse the code compiled for doctest parts that '
+                          'did not change since the last run. It is stored '
+                          'in .xdoctest_cache in the rootdir'),
+                    dest='xdoctest_code_cache')
+
     from xdoctest import doctest_example
     doctest_example.DoctestConfig()._update_argparse_cli(
         group.addoption, prefix=['xdoctest', 'xdoc'],
@@ -209,6 +224,18 @@ class _XDoctestBase(pytest.Module):
         from xdoctest import doctest_example
         self._examp_conf = doctest_example.DoctestConfig()._populate_from_cli(ns)
 
+        self._code_cache = None
+        if self.config.getvalue('xdoctest_code_cache'):
+            from xdoctest import cache as xdoc_cache
+            self._code_cache = xdoc_cache.CodeCache(self._cache_dpath())
+
+    def _cache_dpath(self):
+        from xdoctest import cache as xdoc_cache
+        rootdir = getattr(self.config, 'rootpath', None)
+        if rootdir is None:
+            rootdir = self.config.rootdir
+        return os.path.join(str(rootdir), xdoc_cache.DEFAULT_CACHE_DIR)
+
 
 class XDoctestTextfile(_XDoctestBase):
     obj = None
@@ -231,6 +258,7 @@ class XDoctestTextfile(_XDoctestBase):
         for example in _example_iter:
             example.global_namespace.update(global_namespace)
             example.config.update(self._examp_conf)
+            example.code_cache = self._code_cache
             if hasattr(XDoctestItem, 'from_parent'):
                 yield XDoctestItem.from_parent(
                     self, name=name, example=example)
@@ -248,9 +276,15 @@ class XDoctestModule(_XDoctestBase):
         analysis = self.config.getvalue('xdoctest_analysis')
         self._prepare_internal_config()
 
+        collection_cache = None
+        if self.config.getvalue('xdoctest_collection_cache'):
+            from xdoctest import cache as xdoc_cache
+            collection_cache = xdoc_cache.CollectionCache(self._cache_dpath())
+
         try:
-            examples = list(core.parse_doctestables(modpath, style=style,
-                                                    analysis=analysis))
+            examples = list(core.parse_doctestables(
+                modpath, style=style, analysis=analysis,
+                collection_cache=collection_cache))
         except SyntaxError:
             if self.config.getvalue('xdoctest_ignore_syntax_errors'):
                 pytest.skip('unable to import module %r' % self.fspath)
@@ -259,6 +293,7 @@ class XDoctestModule(_XDoctestBase):
 
         for example in examples:
             example.config.update(self._examp_conf)
+            example.code_cache = self._code_cache
             name = example.unique_callname
             if hasattr(XDoctestItem, 'from_parent'):
                 yield XDoctestItem.from_parent(
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Machine readable reports of the doctests run by the native runner.
+
+Reporters write each doctest to a file as soon as it finishes, so a long run
+can be followed live and ingested by other tools without parsing the terminal
+output. Only the record being written is held in memory.
+
+* :class:`JSONLinesReporter` (``--report-jsonl PATH``) writes one json record
+  per doctest.
+
+* :class:`JUnitXMLReporter` (``--junitxml PATH``) writes a JUnit XML report
+  that CI systems understand.
+
+Example:
+    >>> from xdoctest.reporters import *  # NOQA
+    >>> from xdoctest import core
+    >>> from xdoctest import utils
+    >>> import json
+    >>> docstr = utils.codeblock(
+    ...     '''
+    ...     >>> print('hello')
+    ...     goodbye
+    ...     ''')
+    >>> example = list(core.parse_docstr_examples(docstr))[0]
+    >>> example.mode = 'native'
+    >>> summary = example.run(verbose=0, on_error='return')
+    >>> with utils.TempDir() as temp:
+    >>>     fpath = join(temp.dpath, 'report.jsonl')
+    >>>     with JSONLinesReporter(fpath) as reporter:
+    >>>         reporter.report(example, summary, n_seconds=0.5)
+    >>>     with open(fpath) as file:
+    >>>         records = [json.loads(line) for line in file]
+    >>> print(records[0]['node'], records[0]['status'])
+    <modpath?>::<callname?>:0 failed
+    >>> assert records[0]['got'].strip() == 'hello'
+    >>> assert records[0]['want'].strip() == 'goodbye'
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+from os.path import join  # NOQA
+from xml.sax.saxutils import escape, quoteattr
+import io
+import json
+import re
+import six
+import sys
+import time
+from xdoctest import doctest_example
+from xdoctest import utils
+
+
+class _FileReporter(object):
+    """
+    Base class of reporters that write doctests to a file as they finish.
+
+    The file is opened (and overwritten) by :func:`open` or when the first
+    doctest is reported, and completed by :func:`close`. Subclasses implement
+    :func:`_write_result`, and may write a header and a footer.
+
+    Args:
+        fpath (str): the file to write
+    """
+
+    def __init__(self, fpath):
+        self.fpath = fpath
+        self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, ex_type, ex_value, tb):
+        self.close()
+        return False
+
+    def open(self):
+        if self._file is None:
+            self._file = io.open(self.fpath, 'wb')
+            self._write_header()
+
+    def close(self):
+        if self._file is not None:
+            self._write_footer()
+            self._file.close()
+            self._file = None
+
+    def report(self, example, summary, n_seconds):
+        """
+        Writes a finished doctest and flushes it to disk.
+
+        Args:
+            example (DocTest | DocTestResult): a doctest that has been run
+            summary (Dict): the summary returned by :func:`DocTest.run`
+            n_seconds (float): how long the doctest took
+        """
+        self.open()
+        if not isinstance(example, doctest_example.DocTestResult):
+            example = doctest_example.DocTestResult.from_doctest(example,
+                                                                 summary)
+        if summary['failed']:
+            status = 'failed'
+        elif summary['skipped']:
+            status = 'skipped'
+        else:
+            status = 'passed'
+        self._write_result(example, status, n_seconds)
+        self._file.flush()
+
+    def _write(self, text):
+        self._file.write(text.encode('utf8'))
+
+    def _write_header(self):
+        pass
+
+    def _write_footer(self):
+        pass
+
+    def _write_result(self, result, status, n_seconds):
+        raise NotImplementedError
+
+
+class JSONLinesReporter(_FileReporter):
+    """
+    Writes a json record for each finished doctest to a file, one per line.
+
+    Each record has the keys ``node``, ``cmdline``, ``status`` (passed,
+    failed, or skipped), ``duration`` (in seconds), ``failed_lineno``,
+    ``got``, ``want``, ``error``, and ``warnings``. The got, want, and error
+    texts are truncated to ``max_chars``.
+
+    Args:
+        fpath (str): the file to write. It is overwritten.
+        max_chars (int, default=1000): maximum length of each text field
+
+    Example:
+        >>> from xdoctest import utils
+        >>> result = doctest_example.DocTestResult(
+        >>>     'mod.py::func:0', 'xdoctest mod.py func:0', failed=True,
+        >>>     failed_lineno=3, error='ValueError: ' + 'x' * 100)
+        >>> with utils.TempDir() as temp:
+        >>>     fpath = join(temp.dpath, 'report.jsonl')
+        >>>     with JSONLinesReporter(fpath, max_chars=20) as reporter:
+        >>>         reporter.report(result, result.summary, n_seconds=0.25)
+        >>>     with open(fpath) as file:
+        >>>         record = json.loads(file.readline())
+        >>> print(record['node'], record['status'], record['duration'])
+        mod.py::func:0 failed 0.25
+        >>> print(record['failed_lineno'], record['error'])
+        3 ValueError: xxxxx...
+    """
+
+    def __init__(self, fpath, max_chars=1000):
+        super(JSONLinesReporter, self).__init__(fpath)
+        self.max_chars = max_chars
+
+    def _write_result(self, result, status, n_seconds):
+        record = {
+            'node': result.node,
+            'cmdline': result.cmdline,
+            'status': status,
+            'duration': n_seconds,
+            'failed_lineno': result.failed_lineno,
+            'got': self._truncate(result.got),
+            'want': self._truncate(result.want),
+            'error': self._truncate(result.error),
+            'warnings': [self._truncate(text) for text in result.warn_texts],
+        }
+        line = json.dumps(record, sort_keys=True)
+        self._write(six.text_type(line) + '\n')
+
+    def _truncate(self, text):
+        if text is not None and len(text) > self.max_chars:
+            text = text[:max(self.max_chars - 3, 0)] + '...'
+        return text
+
+
+# Characters that are not allowed in XML 1.0 documents
+if sys.maxunicode > 0xFFFF:
+    _INVALID_XML_CHARS = re.compile(
+        '[^\u0009\u000A\u000D\u0020-\uD7FF\uE000-\uFFFD'
+        '\U00010000-\U0010FFFF]')
+else:  # nocover
+    # Narrow builds store astral characters as surrogate pairs, so only
+    # lone surrogates are invalid
+    _INVALID_XML_CHARS = re.compile(
+        '[\uD800-\uDBFF](?![\uDC00-\uDFFF])|'
+        '(?<![\uD800-\uDBFF])[\uDC00-\uDFFF]|'
+        '[^\u0009\u000A\u000D\u0020-\uFFFD]')
+
+
+class JUnitXMLReporter(_FileReporter):
+    r"""
+    Writes a JUnit XML report with a ``testcase`` for each finished doctest.
+
+    The module name of a doctest is its ``classname`` and its callname is its
+    ``name``. Failed doctests contain their :func:`DocTest.repr_failure`
+    text and all testcases have a ``cmdline`` property that reruns them.
+
+    The counts of the ``testsuite`` are only known at the end, so space for
+    them is reserved in its start tag, which is rewritten by :func:`close`.
+
+    Args:
+        fpath (str): the file to write. It is overwritten.
+        suite_name (str, default='xdoctest'): the name of the testsuite
+
+    Example:
+        >>> from xdoctest import utils
+        >>> from xml.etree import ElementTree
+        >>> passed = doctest_example.DocTestResult(
+        >>>     'mod.py::ok:0', 'xdoctest mod.py ok:0', passed=True,
+        >>>     modname='mod')
+        >>> failed = doctest_example.DocTestResult(
+        >>>     'mod.py::bad:0', 'xdoctest mod.py bad:0', failed=True,
+        >>>     modname='mod', error='ValueError: <oops>',
+        >>>     failure_lines=['\x1b[31mValueError\x1b[0m: <oops>'])
+        >>> with utils.TempDir() as temp:
+        >>>     fpath = join(temp.dpath, 'junit.xml')
+        >>>     with JUnitXMLReporter(fpath) as reporter:
+        >>>         reporter.report(passed, passed.summary, n_seconds=0.5)
+        >>>         reporter.report(failed, failed.summary, n_seconds=0.25)
+        >>>     root = ElementTree.parse(fpath).getroot()
+        >>> suite = root.find('testsuite')
+        >>> print(suite.get('tests'), suite.get('failures'))
+        2 1
+        >>> cases = suite.findall('testcase')
+        >>> print(cases[1].get('classname'), cases[1].get('name'))
+        mod bad:0
+        >>> print(cases[1].find('failure').get('message'))
+        ValueError: <oops>
+        >>> print(cases[1].find('failure').text)
+        ValueError: <oops>
+        >>> print(cases[0].find('properties/property').get('value'))
+        xdoctest mod.py ok:0
+    """
+    def __init__(self, fpath, suite_name='xdoctest'):
+        super(JUnitXMLReporter, self).__init__(fpath)
+        self.suite_name = suite_name
+        self.counts = {'tests': 0, 'failures': 0, 'skipped': 0}
+
+    def _suite_start_tag(self, n_seconds):
+        tag = (
+            '<testsuite name={} tests="{tests}" failures="{failures}" '
+            'errors="0" skipped="{skipped}" time="{time:.3f}"'.format(
+                quoteattr(self.suite_name), time=n_seconds, **self.counts))
+        # Whitespace before the closing bracket is allowed in XML
+        return tag + ' ' * (self._header_width - len(tag)) + '>\n'
+
+    def _write_header(self):
+        self._start_time = time.time()
+        self._write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n')
+        self._header_pos = self._file.tell()
+        # Leave enough room for the final counts of any realistic run
+        self._header_width = 0
+        self._header_width = len(self._suite_start_tag(0)) + 64
+        self._write(self._suite_start_tag(0))
+
+    def _write_footer(self):
+        self._write('</testsuite>\n</testsuites>\n')
+        n_seconds = time.time() - self._start_time
+        self._file.seek(self._header_pos)
+        self._write(self._suite_start_tag(n_seconds))
+
+    def _write_result(self, result, status, n_seconds):
+        self.counts['tests'] += 1
+        modpath, _, name = result.node.rpartition('::')
+        classname = result.modname or modpath
+        lines = ['  <testcase classname={} name={} time="{:.6f}">'.format(
+            _xmlattr(classname), _xmlattr(name), n_seconds)]
+        lines.append('    <properties>')
+        lines.append('      <property name="cmdline" value={} />'.format(
+            _xmlattr(result.cmdline)))
+        lines.append('    </properties>')
+        if status == 'failed':
+            self.counts['failures'] += 1
+            if result.error is not None:
+                message = result.error
+            elif result.got is not None:
+                message = 'got/want mismatch'
+            else:
+                message = 'doctest failed'
+            body = '\n'.join(result.repr_failure())
+            lines.append('    <failure message={}>{}</failure>'.format(
+                _xmlattr(message), _xmltext(body)))
+        elif status == 'skipped':
+            self.counts['skipped'] += 1
+            lines.append('    <skipped />')
+        if result.warn_texts:
+            lines.append('    <system-err>{}</system-err>'.format(
+                _xmltext(''.join(result.warn_texts))))
+        lines.append('  </testcase>\n')
+        self._write('\n'.join(lines))
+
+
+class ReporterGroup(object):
+    """
+    Forwards each finished doctest to several reporters.
+
+    Args:
+        reporters (List[_FileReporter]): the reporters to forward to
+    """
+
+    def __init__(self, reporters):
+        self.reporters = reporters
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, ex_type, ex_value, tb):
+        self.close()
+        return False
+
+    def open(self):
+        for reporter in self.reporters:
+            reporter.open()
+
+    def close(self):
+        for reporter in self.reporters:
+            reporter.close()
+
+    def report(self, example, summary, n_seconds):
+        if len(self.reporters) > 1 and not isinstance(
+                example, doctest_example.DocTestResult):
+            # Only format the failure once
+            example = doctest_example.DocTestResult.from_doctest(example,
+                                                                 summary)
+        for reporter in self.reporters:
+            reporter.report(example, summary, n_seconds)
+
+
+def _xmltext(text):
+    r"""
+    Escapes text for XML, and removes ANSI codes and invalid characters
+
+    Example:
+        >>> print(_xmltext('a < b \x1b[31m\x00ok\x1b[0m'))
+        a &lt; b ok
+        >>> assert _xmltext('ok \U0001F600 done') == 'ok \U0001F600 done'
+    """
+    return escape(_INVALID_XML_CHARS.sub('', utils.strip_ansi(text)))
+
+
+def _xmlattr(text):
+    return quoteattr(_INVALID_XML_CHARS.sub('', utils.strip_ansi(text)))
@@ -54,10 +54,14 @@ from xdoctest import core
 from xdoctest import doctest_example
 from xdoctest import utils
 from functools import partial
+import itertools
 import time
 import types
 import warnings
 import sys
+import six
+import os
+from os.path import abspath, dirname, join
 
 
 def log(msg, verbose):
@@ -102,7 +106,15 @@ def doctest_callable(func):
 
 def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
                    style='auto', verbose=None, config=None, durations=None,
-                   analysis='auto'):
+                   analysis='auto', jobs=None, isolate=None,
+                   last_failed=False, failed_first=False, cache_dir=None,
+                   pass_cache=False, clear_pass_cache=False,
+                   changed_since=None, collection_cache=False,
+                   stream=False, collect_jobs=None, code_cache=False,
+                   memory=None, profile=None, report_jsonl=None,
+                   junitxml=None, shuffle=None, bisect_order=False,
+                   bench_warmup=1, bench_repeat=7, bench_threshold=0.1,
+                   bench_baseline=None, bench_update=False):
     """
     Executes requestsed google-style doctests in a package or module.
     Main entry point into the testing framework.
@@ -121,6 +133,8 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
                 'all' - find and run all tests in a module
                 'list' - list the tests in a module
                 'dump' - dumps tests to stdout
+                'bench' - time the benchmark doctests (see
+                    :mod:`xdoctest.benchmark`)
 
         argv (List[str], default=None):
             if specified, command line flags that might influence beharior.
@@ -145,6 +159,109 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
         analysis (str): determines if doctests are found using static or
             dynamic analysis.
 
+        jobs (int, default=None): if specified and greater than one, the
+            doctests are executed by this many worker processes. Doctests are
+            grouped by module, so each module is only imported by the worker
+            that tests it.
+
+        isolate (str, default=None): if ``'fork'``, each doctest is run in a
+            child process forked from the process that imported its module.
+            This isolates doctests from each other without paying the import
+            cost again, and a crashing doctest is reported as a failure
+            instead of stopping the run. Only available on POSIX systems.
+
+        last_failed (bool, default=False): if True, only rerun the doctests
+            that failed the last time they were run. If none of them failed,
+            everything is run.
+
+        failed_first (bool, default=False): if True, run the doctests that
+            failed the last time before all others.
+
+        cache_dir (str, default=None): directory where state is persisted
+            between runs (e.g. which doctests failed). If None, nothing is
+            persisted unless ``last_failed`` or ``failed_first`` is
+            specified, in which case ``.xdoctest_cache`` is used.
+
+        pass_cache (bool, default=False): if True, doctests that passed
+            before are reported as "cached-pass" without running them again,
+            as long as their source, the source of their module, the xdoctest
+            version, and the config are unchanged. Changes in other modules
+            are not detected. Doctests with ``REQUIRES`` are never cached.
+
+        clear_pass_cache (bool, default=False): if True, forget all
+            previously recorded passes before running.
+
+        changed_since (str, default=None): a git reference. If specified,
+            only doctests in modules that changed since this reference, or
+            that (transitively) import a changed module, are run.
+
+        collection_cache (bool, default=False): if True, the doctests found
+            in each module are stored in ``cache_dir`` and reused on the next
+            run as long as the module file is unchanged, which skips static
+            analysis and docstring parsing for those modules.
+
+        stream (bool, default=False): if True, each doctest runs as soon as
+            its module is collected instead of after the entire package has
+            been collected. This is ignored by the ``list`` and ``dump``
+            commands and when ``last_failed``, ``failed_first``, or ``jobs``
+            is used, because those need every doctest up front.
+
+        collect_jobs (int, default=None): if specified and greater than one,
+            modules are parsed by this many worker processes. The doctests
+            are still collected in a deterministic order.
+
+        code_cache (bool, default=False): if True, the code compiled for
+            each part of a doctest is stored in ``cache_dir`` and reused
+            while the part, its filename, and the compiler flags are
+            unchanged.
+
+        memory (int, default=None): if specified, memory allocations are
+            traced with :mod:`tracemalloc` while the doctests run, and the N
+            doctests with the largest peak allocation are reported (all of
+            them if N=0). Requires Python 3.9 or newer.
+
+        profile (int, default=None): if specified, the code of each doctest
+            is profiled with :mod:`cProfile` and its stats are written to a
+            pstats file in the ``profile`` subdirectory of ``cache_dir``.
+            The merged stats of the N functions with the largest cumulative
+            time are reported (all of them if N=0). Functions defined by
+            xdoctest itself are left out of the report.
+
+        report_jsonl (str, default=None): if specified, a json record of each
+            doctest is written to this file as soon as the doctest finishes.
+            See :class:`xdoctest.reporters.JSONLinesReporter`.
+
+        junitxml (str, default=None): if specified, a JUnit XML report is
+            written to this file. Each doctest is added as soon as it
+            finishes. See :class:`xdoctest.reporters.JUnitXMLReporter`.
+
+        shuffle (int | bool, default=None): if specified, the doctests run
+            in a random order, which is shuffled with this seed. If True, a
+            random seed is chosen. The seed is reported, so the order can be
+            reproduced.
+
+        bisect_order (bool, default=False): if True, each failed doctest is
+            rerun in subprocesses to check if it only fails because of the
+            doctests that ran before it, and if so, which of them.
+            See :mod:`xdoctest.bisect_order`.
+
+        bench_warmup (int, default=1): number of untimed rounds of each
+            benchmark (``bench`` command only)
+
+        bench_repeat (int, default=7): number of timed rounds of each
+            benchmark
+
+        bench_threshold (float, default=0.1): a benchmark whose median is
+            more than this fraction slower than its baseline is reported as
+            a regression, which fails the run
+
+        bench_baseline (str, default=None): the json file that stores the
+            baseline of each benchmark. Defaults to ``benchmarks.json`` in
+            ``cache_dir``. Benchmarks without a baseline are added to it.
+
+        bench_update (bool, default=False): if True, the baselines of all
+            benchmarks that ran are replaced with the new results
+
     Returns:
         Dict: run_summary
 
@@ -181,6 +298,29 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
     _log('config = {!r}'.format(config))
     _log('verbose = {!r}'.format(verbose))
     _log('style = {!r}'.format(style))
+    _log('jobs = {!r}'.format(jobs))
+    _log('isolate = {!r}'.format(isolate))
+    _log('last_failed = {!r}'.format(last_failed))
+    _log('failed_first = {!r}'.format(failed_first))
+    _log('cache_dir = {!r}'.format(cache_dir))
+    _log('pass_cache = {!r}'.format(pass_cache))
+    _log('clear_pass_cache = {!r}'.format(clear_pass_cache))
+    _log('changed_since = {!r}'.format(changed_since))
+    _log('collection_cache = {!r}'.format(collection_cache))
+    _log('stream = {!r}'.format(stream))
+    _log('collect_jobs = {!r}'.format(collect_jobs))
+    _log('code_cache = {!r}'.format(code_cache))
+    _log('memory = {!r}'.format(memory))
+    _log('profile = {!r}'.format(profile))
+    _log('report_jsonl = {!r}'.format(report_jsonl))
+    _log('junitxml = {!r}'.format(junitxml))
+    _log('shuffle = {!r}'.format(shuffle))
+    _log('bisect_order = {!r}'.format(bisect_order))
+    _log('bench_warmup = {!r}'.format(bench_warmup))
+    _log('bench_repeat = {!r}'.format(bench_repeat))
+    _log('bench_threshold = {!r}'.format(bench_threshold))
+    _log('bench_baseline = {!r}'.format(bench_baseline))
+    _log('bench_update = {!r}'.format(bench_update))
     _log('------+ /DEBUG +------')
 
     modinfo = {
@@ -216,6 +356,20 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
     if config is None:
         config = doctest_example.DoctestConfig()
 
+    if isolate not in {None, 'none', 'fork'}:
+        raise KeyError(isolate)
+    if isolate == 'none':
+        isolate = None
+    if memory is not None and not _can_trace_memory():
+        warnings.warn('memory requires tracemalloc.reset_peak (Python 3.9+), '
+                      'memory usage will not be reported', RuntimeWarning)
+        memory = None
+
+    if isolate == 'fork' and not hasattr(os, 'fork'):
+        warnings.warn('isolate="fork" is not supported on this platform, '
+                      'doctests will not be isolated', RuntimeWarning)
+        isolate = None
+
     command, style, verbose = _parse_commandline(command, style, verbose, argv)
 
     _log = partial(log, verbose=verbose)
@@ -231,6 +385,9 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
     _log('Start doctest_module({!r})'.format(parsable_identifier))
     _log('Listing tests')
 
+    # Each run tries to import a module that previously failed once more
+    doctest_example._IMPORT_FAILURE_CACHE.clear()
+
     if command is None:
         # Display help if command is not specified
         _log('Not testname given. Use `all` to run everything or'
@@ -240,19 +397,44 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
     # TODO: command should not be allowed to be the requested doctest name in
     # case it conflicts with an existing command. This probably requires an API
     # change to this function.
-    gather_all = (command == 'all' or command == 'dump')
+    gather_all = command in {'all', 'dump', 'bench'}
+    # Commands that do not test the doctests as usual
+    special = command in {'dump', 'bench'}
+
+    if stream and (command in {'list', 'dump', 'bench'} or last_failed or
+                   failed_first or (jobs is not None and jobs > 1) or
+                   shuffle is not None or bisect_order):
+        _log('streaming is not supported with this command or options, '
+             'collecting all tests first')
+        stream = False
 
     tic = time.time()
 
+    coll_cache = None
+    if collection_cache:
+        from xdoctest import cache as xdoc_cache
+        coll_cache = xdoc_cache.CollectionCache(cache_dir)
+
+    compiled_cache = None
+    if code_cache:
+        from xdoctest import cache as xdoc_cache
+        compiled_cache = xdoc_cache.CodeCache(cache_dir)
+
+    profile_dpath = None
+    if profile is not None:
+        from xdoctest import cache as xdoc_cache
+        profile_dpath = join(cache_dir or xdoc_cache.DEFAULT_CACHE_DIR,
+                             'profile')
+
     # Parse all valid examples
-    with warnings.catch_warnings(record=True) as parse_warnlist:
-        examples = list(core.parse_doctestables(
-            parsable_identifier, exclude=exclude, style=style,
-            analysis=analysis))
-        # Set each example mode to native to signal that we are using the
-        # native xdoctest runner instead of the pytest runner
-        for example in examples:
-            example.mode = 'native'
+    parse_warnlist = []
+    examples = _iter_native_examples(core.parse_doctestables(
+        parsable_identifier, exclude=exclude, style=style,
+        analysis=analysis, collection_cache=coll_cache,
+        collect_jobs=collect_jobs), parse_warnlist, compiled_cache,
+        profile_dpath)
+    if not stream:
+        examples = list(examples)
 
     if command == 'list':
         if len(examples) == 0:
@@ -261,16 +443,38 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
             _log('    ' + '\n    '.join([example.cmdline  # + ' @ ' + str(example.lineno)
                                           for example in examples]))
         run_summary = {'action': 'list'}
+    elif stream:
+        reporter = _open_reporter(report_jsonl, junitxml)
+        try:
+            with _MemoryTracing(memory is not None):
+                run_summary = _run_streaming(
+                    examples, command, parsable_identifier, modinfo, verbose,
+                    config, isolate=isolate, cache_dir=cache_dir,
+                    pass_cache=pass_cache, clear_pass_cache=clear_pass_cache,
+                    changed_since=changed_since, reporter=reporter, _log=_log)
+        finally:
+            if reporter is not None:
+                reporter.close()
+        toc = time.time()
+        n_seconds = toc - tic
+        if verbose >= 0 and run_summary:
+            _print_summary_report(run_summary, parse_warnlist, n_seconds,
+                                  None, durations, config=config, _log=_log,
+                                  memory=memory, profile=profile)
     else:
         _log('gathering tests')
         enabled_examples = []
         for example in examples:
             if gather_all or command in example.valid_testnames:
-                if gather_all and example.is_disabled():
+                if gather_all and example.is_disabled(bench=command == 'bench'):
                     continue
+                if command == 'bench':
+                    from xdoctest import benchmark
+                    if not benchmark.is_benchmark(example):
+                        continue
                 enabled_examples.append(example)
 
-        if len(enabled_examples) == 0:
+        if len(enabled_examples) == 0 and command != 'bench':
             # Check for zero-arg funcs
             for example in _gather_zero_arg_examples(parsable_identifier):
                 if command in example.valid_testnames:
@@ -283,6 +487,63 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
             for example in enabled_examples:
                 example.config.update(config)
 
+        # Resolve the directives that skip entire doctests at collection, so
+        # the modules of these doctests are never imported
+        for example in enabled_examples:
+            example.resolve_skips()
+
+        if changed_since is not None and command != 'dump':
+            from xdoctest import import_graph
+            if modinfo['modpath'] is None:
+                raise ValueError('changed_since requires a module path')
+            n_before = len(enabled_examples)
+            enabled_examples, affected = import_graph.select_changed_examples(
+                enabled_examples, modinfo['modpath'], changed_since)
+            _log('changed-since {}: {} affected module(s), selected {} / {} '
+                 'doctest(s)'.format(changed_since, len(affected),
+                                     len(enabled_examples), n_before))
+
+        cache = None
+        if (cache_dir is not None or last_failed or failed_first or
+                pass_cache or clear_pass_cache):
+            from xdoctest import cache as xdoc_cache
+            cache = xdoc_cache.Cache(cache_dir)
+
+        if clear_pass_cache:
+            cache.set('cachedpass', {})
+
+        shuffle_seed = None
+        if not special and shuffle is not None and shuffle is not False:
+            # Shuffle before the previous failures are moved to the front
+            import random
+            if shuffle is True:
+                shuffle_seed = random.randint(0, 2 ** 32 - 1)
+            else:
+                shuffle_seed = shuffle
+            _log('shuffling the order of the tests with seed {}'.format(
+                shuffle_seed))
+            random.Random(shuffle_seed).shuffle(enabled_examples)
+
+        if not special and (last_failed or failed_first):
+            enabled_examples, n_prev_failed = xdoc_cache.select_lastfailed(
+                enabled_examples, cache, last_failed=last_failed,
+                failed_first=failed_first)
+            if n_prev_failed:
+                _log('run-last-failure: rerun previous {} failure(s)'.format(
+                    n_prev_failed) + (' first' if not last_failed else ''))
+            else:
+                _log('run-last-failure: no previously failed tests, '
+                     'running all')
+
+        cached_examples = []
+        if not special and pass_cache:
+            enabled_examples, cached_examples, pass_keys = \
+                xdoc_cache.select_cached_passes(enabled_examples, cache)
+            if verbose >= 1:
+                for example in cached_examples:
+                    _log('* {}: {}'.format(
+                        example._color('CACHED-PASS', 'green'), example.node))
+
         if command == 'dump':
             # format the doctests as normal unit tests
             _log('dumping tests to stdout')
@@ -290,17 +551,50 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
             _log(module_text)
 
             run_summary = {'action': 'dump'}
+        elif command == 'bench':
+            if jobs is not None and jobs > 1:
+                _log('benchmarks always run serially, ignoring jobs')
+            if bench_baseline is None:
+                from xdoctest import cache as xdoc_cache
+                bench_baseline = join(cache_dir or xdoc_cache.DEFAULT_CACHE_DIR,
+                                      'benchmarks.json')
+            run_summary = _run_benchmarks(
+                enabled_examples, verbose, config, warmup=bench_warmup,
+                repeat=bench_repeat, threshold=bench_threshold,
+                baseline_fpath=bench_baseline, update=bench_update,
+                _log=_log)
+            toc = time.time()
+            n_seconds = toc - tic
+            if verbose >= 0:
+                _print_benchmark_report(run_summary, config=config, _log=_log)
+                _print_summary_report(run_summary, parse_warnlist, n_seconds,
+                                      enabled_examples, durations,
+                                      config=config, _log=_log)
         else:
             # Run the gathered doctest examples
-
-            RANDOMIZE_ORDER = False
-            if RANDOMIZE_ORDER:
-                # randomize the order in which tests are run
-                import random
-                random.shuffle(enabled_examples)
-
-            run_summary = _run_examples(enabled_examples, verbose, config,
-                                        _log=_log)
+            reporter = _open_reporter(report_jsonl, junitxml)
+            try:
+                if jobs is not None and jobs > 1:
+                    run_summary = _run_examples_parallel(
+                        enabled_examples, verbose, config, jobs=jobs,
+                        isolate=isolate, trace_memory=memory is not None,
+                        reporter=reporter, _log=_log)
+                else:
+                    with _MemoryTracing(memory is not None):
+                        run_summary = _run_examples(
+                            enabled_examples, verbose, config,
+                            isolate=isolate, reporter=reporter, _log=_log)
+            finally:
+                if reporter is not None:
+                    reporter.close()
+
+            if cache is not None:
+                xdoc_cache.update_lastfailed(cache, run_summary)
+                if pass_cache:
+                    xdoc_cache.update_cached_passes(cache, run_summary,
+                                                    pass_keys)
+            run_summary['n_cached'] = len(cached_examples)
+            run_summary['shuffle_seed'] = shuffle_seed
 
             toc = time.time()
             n_seconds = toc - tic
@@ -309,11 +603,130 @@ def doctest_module(module_identifier=None, command=None, argv=None, exclude=[],
             if verbose >= 0 and run_summary:
                 _print_summary_report(run_summary, parse_warnlist, n_seconds,
                                       enabled_examples, durations,
-                                      config=config, _log=_log)
+                                      config=config, _log=_log,
+                                      memory=memory, profile=profile)
+
+            if bisect_order and run_summary.get('failed'):
+                run_summary['order_dependencies'] = _bisect_failures(
+                    run_summary, enabled_examples, style, analysis, config,
+                    _log=_log)
 
     return run_summary
 
 
+def _iter_native_examples(examples, parse_warnlist, code_cache=None,
+                          profile_dpath=None):
+    """
+    Marks each parsed example as run by the native runner, which compiles
+    its parts with ``code_cache`` and writes its profile to
+    ``profile_dpath`` (if specified).
+
+    Warnings raised while the examples are parsed are recorded in
+    ``parse_warnlist``, but warnings raised by the consumer of this generator
+    (e.g. while running an example) are not.
+    """
+    examples = iter(examples)
+    while True:
+        with warnings.catch_warnings(record=True) as warnlist:
+            example = next(examples, None)
+        parse_warnlist.extend(warnlist)
+        if example is None:
+            break
+        # Set each example mode to native to signal that we are using the
+        # native xdoctest runner instead of the pytest runner
+        example.mode = 'native'
+        example.code_cache = code_cache
+        example.profile_dpath = profile_dpath
+        yield example
+
+
+def _run_streaming(examples, command, parsable_identifier, modinfo, verbose,
+                   config, isolate=None, cache_dir=None, pass_cache=False,
+                   clear_pass_cache=False, changed_since=None, reporter=None,
+                   _log=None):
+    """
+    Internal helper for the streaming mode of :func:`doctest_module`.
+
+    The same filters are applied to the examples as in the default mode, but
+    one at a time, so each example runs as soon as it has been collected.
+    """
+    gather_all = (command == 'all')
+
+    affected = None
+    if changed_since is not None:
+        from xdoctest import import_graph
+        if modinfo['modpath'] is None:
+            raise ValueError('changed_since requires a module path')
+        affected = import_graph.changed_modnames(modinfo['modpath'],
+                                                 changed_since)
+        _log('changed-since {}: {} affected module(s)'.format(
+            changed_since, len(affected)))
+
+    cache = None
+    if cache_dir is not None or pass_cache or clear_pass_cache:
+        from xdoctest import cache as xdoc_cache
+        cache = xdoc_cache.Cache(cache_dir)
+    if clear_pass_cache:
+        cache.set('cachedpass', {})
+
+    def _selected():
+        for example in examples:
+            if not (gather_all or command in example.valid_testnames):
+                continue
+            if gather_all and example.is_disabled():
+                continue
+            if config:
+                example.config.update(config)
+            if affected is not None and example.modname not in affected:
+                continue
+            example.resolve_skips()
+            yield example
+
+    enabled_examples = _selected()
+
+    pass_keys = {}
+    cached_examples = []
+    if pass_cache:
+        def _not_cached(pairs):
+            for example, is_cached in pairs:
+                if is_cached:
+                    cached_examples.append(example)
+                    if verbose >= 1:
+                        _log('* {}: {}'.format(
+                            example._color('CACHED-PASS', 'green'),
+                            example.node))
+                else:
+                    yield example
+        enabled_examples = _not_cached(xdoc_cache.iter_cached_passes(
+            enabled_examples, cache, pass_keys))
+
+    # Zero-arg functions are only considered if nothing else was selected
+    first = next(enabled_examples, None)
+    if first is None and not cached_examples:
+        zero_arg_examples = []
+        for example in _gather_zero_arg_examples(parsable_identifier):
+            if command in example.valid_testnames:
+                zero_arg_examples.append(example)
+            elif command in ['zero-all', 'zero', 'zero_all', 'zero-args']:
+                zero_arg_examples.append(example)
+        if config:
+            for example in zero_arg_examples:
+                example.config.update(config)
+        enabled_examples = zero_arg_examples
+    elif first is not None:
+        enabled_examples = itertools.chain([first], enabled_examples)
+
+    run_summary = _run_examples(enabled_examples, verbose, config,
+                                isolate=isolate, reporter=reporter, _log=_log)
+
+    if cache is not None:
+        xdoc_cache.update_lastfailed(cache, run_summary)
+        if pass_cache:
+            xdoc_cache.update_cached_passes(cache, run_summary, pass_keys)
+    run_summary['n_cached'] = len(cached_examples)
+    return run_summary
+
+
 def _convert_to_test_module(enabled_examples):
     """
     Converts all doctests to unit tests that can exist in a standalone module
@@ -341,7 +754,8 @@ def _convert_to_test_module(enabled_examples):
 
 
 def _print_summary_report(run_summary, parse_warnlist, n_seconds,
-                          enabled_examples, durations, config=None, _log=None):
+                          enabled_examples, durations, config=None, _log=None,
+                          memory=None, profile=None):
     """
     Summary report formatting and printing
     """
@@ -374,40 +788,57 @@ def _print_summary_report(run_summary, parse_warnlist, n_seconds,
             cprint('--- Runtime Warning: {} / {} ---'.format(warn_idx, len(warned)),
                    'yellow')
             _log('example = {!r}'.format(example))
-            for warn in example.warn_list:
-                _log(utils.indent(
-                    warnings.formatwarning(warn.message, warn.category,
-                                           warn.filename, warn.lineno)))
+            if isinstance(example, doctest_example.DocTestResult):
+                warn_texts = example.warn_texts
+            else:
+                warn_texts = doctest_example._format_warnlist(example.warn_list)
+            for warn_text in warn_texts:
+                _log(utils.indent(warn_text))
+
+    # Doctests that failed to import the same module are reported once
+    failure_groups = _group_import_failures(failed)
 
-    if failed and len(enabled_examples) > 1:
+    if failed and run_summary.get('n_total', 0) > 1:
         # If there is more than one test being run, _log out all the
         # errors that occured so they are consolidated in a single place.
-        cprint('\n=== Found {} errors ==='.format(len(failed)), 'red')
-        for fail_idx, example in enumerate(failed, start=1):
-            cprint('--- Error: {} / {} ---'.format(fail_idx, len(failed)), 'red')
+        n_groups = len(failure_groups)
+        cprint('\n=== Found {} errors ==='.format(n_groups), 'red')
+        for fail_idx, (example, n_group) in enumerate(failure_groups, start=1):
+            cprint('--- Error: {} / {} ---'.format(fail_idx, n_groups), 'red')
+            if n_group > 1:
+                _log('<IMPORT> of {} failed for {} doctests'.format(
+                    example.modname, n_group))
             _log(utils.indent('\n'.join(example.repr_failure())))
 
     # Print command lines to re-run failed tests
     if failed:
         cprint('\n=== Failed tests ===', 'red')
-        for example in failed:
-            _log(example.cmdline)
+        for example, n_group in failure_groups:
+            if n_group > 1:
+                _log('{}  # <IMPORT> failed for {} doctests'.format(
+                    example.cmdline, n_group))
+            else:
+                _log(example.cmdline)
 
     # final summary
     n_passed = run_summary.get('n_passed', 0)
     n_failed = run_summary.get('n_failed', 0)
     n_skipped = run_summary.get('n_skipped', 0)
+    n_cached = run_summary.get('n_cached', 0)
+    n_regressed = run_summary.get('n_regressed', 0)
     n_warnings = len(warned) + len(parse_warnlist)
-    pairs = zip([n_failed, n_passed, n_skipped, n_warnings],
-                ['failed', 'passed', 'skipped', 'warnings'])
+    pairs = zip([n_failed, n_regressed, n_passed, n_cached, n_skipped,
+                 n_warnings],
+                ['failed', 'regressed', 'passed', 'cached-pass', 'skipped',
+                 'warnings'])
     parts = ['{n} {t}'.format(n=n, t=t) for n, t in pairs  if n > 0]
     _fmtstr = '=== ' + ', '.join(parts) + ' in {n_seconds:.2f} seconds ==='
     # _fmtstr = '=== ' + ' '.join(parts) + ' in {n_seconds:.2f} seconds ==='
     summary_line = _fmtstr.format(n_seconds=n_seconds)
     # color text based on worst type of error
-    if n_failed > 0:
+    if n_failed > 0 or n_regressed > 0:
         cprint(summary_line, 'red')
-    elif n_warnings > 0 or (n_passed == 0 and n_skipped > 0):
+    elif n_warnings > 0 or (n_passed + n_cached == 0 and n_skipped > 0):
         cprint(summary_line, 'yellow')
     else:
         cprint(summary_line, 'green')
@@ -420,6 +851,355 @@ def _print_summary_report(run_summary, parse_warnlist, n_seconds,
         for example, n_secs in test_time_tups:
             _log('time: {:0.8f}, test: {}'.format(n_secs, example.cmdline))
 
+    if memory is not None:
+        usages = run_summary.get('memory', {})
+        test_mem_tups = sorted(usages.items(), key=lambda x: x[1]['peak'])
+        if memory > 0:
+            test_mem_tups = test_mem_tups[-memory:]
+        for example, usage in test_mem_tups:
+            where = ''
+            if usage['parts']:
+                worst = max(usage['parts'].values(), key=lambda p: p['peak'])
+                where = ' (line {})'.format(worst['lineno'])
+            _log('memory: peak {}{}, net {}, test: {}'.format(
+                _format_nbytes(usage['peak']), where,
+                _format_nbytes(usage['net']), example.cmdline))
+
+    if profile is not None:
+        fpaths = list(run_summary.get('profiles', {}).values())
+        if fpaths:
+            _log('profile: merged {} pstats file(s) from {}'.format(
+                len(fpaths), dirname(fpaths[0])))
+            _log(_format_profile(fpaths, profile))
+
+
+def _group_import_failures(failed):
+    """
+    Groups the failed doctests that could not import their module, so each
+    broken module is only reported once. Other failures are not grouped.
+
+    Args:
+        failed (List[DocTest | DocTestResult]): the failed doctests
+
+    Returns:
+        List[Tuple[DocTest | DocTestResult, int]]: the first doctest of each
+            group and the number of doctests in the group
+
+    Example:
+        >>> from xdoctest.doctest_example import DocTestResult
+        >>> failed = [
+        >>>     DocTestResult('mod::a:0', 'a', failed=True, modname='mod',
+        >>>                   import_error='ValueError'),
+        >>>     DocTestResult('mod::b:0', 'b', failed=True, modname='mod'),
+        >>>     DocTestResult('mod::c:0', 'c', failed=True, modname='mod',
+        >>>                   import_error='ValueError'),
+        >>> ]
+        >>> for example, n_group in _group_import_failures(failed):
+        >>>     print(example.cmdline, n_group)
+        a 2
+        b 1
+    """
+    groups = []
+    group_index = {}
+    for example in failed:
+        import_error = getattr(example, 'import_error', None)
+        if import_error is None:
+            groups.append([example, 1])
+        elif example.modname in group_index:
+            groups[group_index[example.modname]][1] += 1
+        else:
+            group_index[example.modname] = len(groups)
+            groups.append([example, 1])
+    return [tuple(group) for group in groups]
+
+
+def _format_nbytes(nbytes):
+    """
+    Formats a number of bytes for humans
+
+    Example:
+        >>> print(_format_nbytes(512))
+        512 B
+        >>> print(_format_nbytes(-3 * 2 ** 30))
+        -3.00 GiB
+    """
+    value = float(nbytes)
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if abs(value) < 1024 or unit == 'GiB':
+            break
+        value /= 1024
+    if unit == 'B':
+        return '{} B'.format(nbytes)
+    return '{:.2f} {}'.format(value, unit)
+
+
+def _format_profile(fpaths, top=0):
+    """
+    Merges pstats files and formats the functions with the largest
+    cumulative time. Functions defined by xdoctest are left out, so the time
+    is attributed to the code under test.
+
+    Args:
+        fpaths (List[str]): pstats files written by the doctests
+        top (int): number of functions to show, or 0 for all of them
+
+    Returns:
+        str
+
+    Example:
+        >>> import cProfile
+        >>> with utils.TempDir() as temp:
+        >>>     fpath = join(temp.dpath, 'test.pstats')
+        >>>     profiler = cProfile.Profile()
+        >>>     profiler.enable()
+        >>>     _ = sorted(range(1000))
+        >>>     _ = utils.codeblock('  xdoctest internals')
+        >>>     profiler.disable()
+        >>>     profiler.dump_stats(fpath)
+        >>>     text = _format_profile([fpath])
+        >>> assert 'sorted' in text
+        >>> assert 'codeblock' not in text
+    """
+    import pstats
+    stats = pstats.Stats(*fpaths, stream=six.StringIO())
+    xdoctest_dpath = dirname(abspath(__file__))
+    for func in list(stats.stats.keys()):
+        filename, _, funcname = func
+        is_internal = (
+            abspath(filename).startswith(xdoctest_dpath + os.sep) or
+            funcname == "<method 'disable' of '_lsprof.Profiler' objects>"
+        )
+        if is_internal:
+            del stats.stats[func]
+    stats.files = []  # the file headers are redundant
+    stats.sort_stats('cumulative')
+    if top > 0:
+        stats.print_stats(top)
+    else:
+        stats.print_stats()
+    return stats.stream.getvalue().strip('\n')
+
+
+def _bisect_failures(run_summary, enabled_examples, style, analysis, config,
+                     _log=None):
+    """
+    Checks if each failed doctest only fails because of the doctests that
+    ran before it, and reports the predecessors that make it fail.
+
+    Returns:
+        Dict[str, Dict]: the result of
+            :func:`xdoctest.bisect_order.find_order_dependency` for each
+            failed node
+    """
+    from xdoctest import bisect_order
+    failed = run_summary['failed']
+    _log('\n=== Bisecting the order of {} failed test(s) ==='.format(
+        len(failed)))
+    if run_summary.get('shuffle_seed') is not None:
+        _log('shuffle seed: {}'.format(run_summary['shuffle_seed']))
+    order = [example.node for example in enabled_examples]
+    dependencies = {}
+    for result in failed:
+        if result.node not in order:
+            continue
+        predecessors = order[:order.index(result.node)]
+        dependency = bisect_order.find_order_dependency(
+            result.node, predecessors, style=style, analysis=analysis,
+            config=config)
+        dependencies[result.node] = dependency
+        if dependency['status'] == 'order-dependent':
+            _log('{}: passes alone, but fails after {}'.format(
+                result.node, ', '.join(dependency['culprits'])))
+        elif dependency['status'] == 'independent':
+            _log('{}: also fails alone'.format(result.node))
+        elif dependency['status'] == 'not-found':
+            _log('{}: the doctests could not be found in a subprocess'.format(
+                result.node))
+        elif dependency['status'] == 'error':
+            _log('{}: a subprocess did not report the outcome'.format(
+                result.node))
+        else:
+            _log('{}: the failure did not reproduce in a subprocess'.format(
+                result.node))
+    return dependencies
+
+
+def _run_benchmarks(enabled_examples, verbose, config=None, warmup=1,
+                    repeat=7, threshold=0.1, baseline_fpath=None,
+                    update=False, _log=None):
+    """
+    Internal helper for the ``bench`` command. Runs each benchmark doctest,
+    times it, and compares it to its baseline.
+
+    Benchmarks without a baseline (or all of them if ``update`` is True) are
+    written to the baseline file.
+
+    Returns:
+        Dict: a run summary, which also has a ``benchmarks`` list with a
+            record of each timed doctest and the number of regressions.
+    """
+    from xdoctest import benchmark
+    timer = benchmark.BenchmarkTimer(warmup=warmup, repeat=repeat)
+    baseline = benchmark.load_baseline(baseline_fpath)
+    _log('benchmarking %d test(s)' % len(enabled_examples))
+    records = []
+    failed = []
+    warned = []
+    times = {}
+    n_passed = n_skipped = n_regressed = n_errors = 0
+    baseline_changed = False
+    for example in enabled_examples:
+        example.benchmark = timer
+        key = benchmark.benchmark_key(example)
+        tic = time.time()
+        summary = example.run(verbose=verbose, on_error='return')
+        toc = time.time()
+        stats = example.benchmark_stats
+        result = _compact_result(example, summary)
+        times[result] = toc - tic
+        if result.warn_texts:
+            warned.append(result)
+        if summary['failed']:
+            failed.append(result)
+            continue
+        if stats is None:
+            # Everything that would have been timed was skipped
+            n_skipped += 1
+            continue
+        record = {
+            'key': key,
+            'cmdline': result.cmdline,
+            'stats': stats,
+            'baseline': baseline.get(key),
+            'regressed': False,
+        }
+        records.append(record)
+        if 'error' in stats:
+            # The timed parts could not be run repeatedly
+            n_errors += 1
+            continue
+        if record['baseline'] is not None:
+            record['regressed'] = benchmark.is_regression(
+                stats, record['baseline'], threshold)
+        if record['regressed']:
+            n_regressed += 1
+        else:
+            n_passed += 1
+        if record['baseline'] is None or update:
+            baseline[key] = stats
+            baseline_changed = True
+    if baseline_changed:
+        benchmark.save_baseline(baseline_fpath, baseline)
+    run_summary = {
+        'action': 'bench',
+        'benchmarks': records,
+        'baseline_fpath': baseline_fpath,
+        'failed': failed,
+        'warned': warned,
+        'times': times,
+        'n_failed': len(failed) + n_errors,
+        'n_passed': n_passed,
+        'n_skipped': n_skipped,
+        'n_regressed': n_regressed,
+        'n_total': len(enabled_examples),
+    }
+    return run_summary
+
+
+def _print_benchmark_report(run_summary, config=None, _log=None):
+    """
+    Prints the statistics of each benchmark and its change with respect to
+    its baseline.
+    """
+    from xdoctest import benchmark
+    records = run_summary.get('benchmarks', [])
+    if not records:
+        return
+    colored = config is not None and config.get('colored', True)
+    _log('\n=== Benchmarks ===')
+    _log('{:>10} {:>10} {:>10} {:>10}  {}'.format(
+        'min', 'median', 'iqr', 'baseline', 'test'))
+    for record in records:
+        stats = record['stats']
+        if 'error' in stats:
+            line = '{:>43}  {}\n    error: {}'.format(
+                'ERROR', record['cmdline'], stats['error'])
+            _log(utils.color_text(line, 'red') if colored else line)
+            continue
+        if record['baseline'] is None:
+            change = 'new'
+        else:
+            ratio = stats['median'] / record['baseline']['median']
+            change = '{:+.1%}'.format(ratio - 1)
+        line = '{:>10} {:>10} {:>10} {:>10}  {}'.format(
+            benchmark.format_seconds(stats['min']),
+            benchmark.format_seconds(stats['median']),
+            benchmark.format_seconds(stats['iqr']),
+            change, record['cmdline'])
+        if record['regressed']:
+            line += '  (REGRESSED)'
+            if colored:
+                line = utils.color_text(line, 'red')
+        _log(line)
+    _log('baseline: {}'.format(run_summary['baseline_fpath']))
+
+
+def _open_reporter(report_jsonl=None, junitxml=None):
+    """
+    Opens the reporter that records each doctest as it finishes (if any)
+
+    Returns:
+        xdoctest.reporters.ReporterGroup | None
+    """
+    if report_jsonl is None and junitxml is None:
+        return None
+    from xdoctest import reporters
+    group = []
+    if report_jsonl is not None:
+        group.append(reporters.JSONLinesReporter(report_jsonl))
+    if junitxml is not None:
+        group.append(reporters.JUnitXMLReporter(junitxml))
+    reporter = reporters.ReporterGroup(group)
+    reporter.open()
+    return reporter
+
+
+def _can_trace_memory():
+    """
+    Checks if tracemalloc can measure the peak memory of each doctest part
+    """
+    try:
+        import tracemalloc
+    except ImportError:  # nocover
+        return False
+    return hasattr(tracemalloc, 'reset_peak')
+
+
+class _MemoryTracing(object):
+    """
+    Context manager that traces memory allocations with :mod:`tracemalloc`
+    (if enabled), which makes each doctest record its memory usage.
+    Tracing is only stopped on exit if it was started here.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._started = False
+
+    def __enter__(self):
+        if self.enabled:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+        return self
+
+    def __exit__(self, ex_type, ex_value, tb):
+        if self._started:
+            import tracemalloc
+            tracemalloc.stop()
+            self._started = False
+        return False
+
 
 def _gather_zero_arg_examples(modpath):
     """
@@ -442,36 +1222,69 @@ def _gather_zero_arg_examples(modpath):
                     yield example
 
 
-def _run_examples(enabled_examples, verbose, config=None, _log=None):
+def _run_examples(enabled_examples, verbose, config=None, isolate=None,
+                  reporter=None, _log=None):
     """
     Internal helper, loops over each example, runs it, returns a summary
+
+    The examples may be an iterator, in which case each example runs as soon
+    as it is produced and the total is counted as they run. If a ``reporter``
+    is given, each example is reported as soon as it finishes.
     """
-    n_total = len(enabled_examples)
-    _log('running %d test(s)' % n_total)
+    if hasattr(enabled_examples, '__len__'):
+        n_total = len(enabled_examples)
+        _log('running %d test(s)' % n_total)
+    else:
+        n_total = None
+        _log('running test(s) as they are collected')
+    n_run = 0
     summaries = []
     failed = []
     warned = []
     times = {}
+    memory_usage = {}
+    profiles = {}
     # It is important to raise immediatly within the test to display errors
     # returned from multiprocessing. Especially in zero-arg mode
 
-    on_error = 'return' if n_total > 1 else 'raise'
+    on_error = 'return' if n_total is None or n_total > 1 else 'raise'
     on_error = 'return'
 
     for example in enabled_examples:
+        n_run += 1
         try:
             try:
                 tic = time.time()
-                summary = example.run(verbose=verbose, on_error=on_error)
+                if isolate == 'fork' and not example.resolve_skips():
+                    # Only a record of the result comes back from the child
+                    example = _run_example_forked(example, verbose)
+                    summary = example.summary
+                else:
+                    summary = example.run(verbose=verbose, on_error=on_error)
+                    if on_error != 'raise':
+                        # Only keep a compact record of the outcome, so the
+                        # objects the doctest created can be freed
+                        example = _compact_result(example, summary)
+                        summary = example.summary
                 toc = time.time()
                 n_seconds = toc - tic
                 times[example] = n_seconds
+                if example.memory_usage is not None:
+                    memory_usage[example] = example.memory_usage
+                if example.profile_fpath is not None:
+                    profiles[example] = example.profile_fpath
+                if reporter is not None:
+                    reporter.report(example, summary, n_seconds)
             except Exception:
                 _log('\n'.join(example.repr_failure(with_tb=False)))
                 raise
 
             summaries.append(summary)
-            if example.warn_list:
+            if isinstance(example, doctest_example.DocTestResult):
+                has_warnings = bool(example.warn_texts)
+            else:
+                has_warnings = bool(example.warn_list)
+            if has_warnings:
                 warned.append(example)
             if summary['skipped']:
                 pass
@@ -504,6 +1317,280 @@ def _run_examples(enabled_examples, verbose, config=None, _log=None):
         #     if verbose == 0:
         #         sys.stdout.write('F')
         #         sys.stdout.flush()
+    if n_total is None:
+        n_total = n_run
+    run_summary = _finalize_run_summary(summaries, failed, warned, times,
+                                        n_total, verbose, config=config,
+                                        _log=_log, memory_usage=memory_usage,
+                                        profiles=profiles)
+    return run_summary
+
+
+def _run_examples_parallel(enabled_examples, verbose, config=None, jobs=2,
+                           isolate=None, trace_memory=False, reporter=None,
+                           _log=None):
+    """
+    Internal helper, like :func:`_run_examples`, but distributes the examples
+    over a pool of worker processes.
+
+    Examples are grouped by ``modpath`` and each group is run by a single
+    worker, so a module is only imported in the worker that tests it. Workers
+    send back :class:`xdoctest.doctest_example.DocTestResult` records and
+    their captured stdout, which are merged into a summary with the same
+    structure as the one returned by :func:`_run_examples`.
+    """
+    import multiprocessing
+    from collections import OrderedDict
+
+    if any(example.module is not None for example in enabled_examples):
+        # Live modules (e.g. from an IPython session) cannot be sent to
+        # another process
+        _log('cannot run tests from a live module in parallel, '
+             'falling back to serial execution')
+        with _MemoryTracing(trace_memory):
+            return _run_examples(enabled_examples, verbose, config,
+                                 isolate=isolate, reporter=reporter,
+                                 _log=_log)
+
+    groups = OrderedDict()
+    for example in enabled_examples:
+        groups.setdefault(example.modpath, []).append(example)
+    tasks = [(groupx, examples, verbose, isolate, trace_memory)
+             for groupx, examples in enumerate(groups.values())]
+
+    n_total = len(enabled_examples)
+    n_workers = min(jobs, len(tasks))
+    _log('running %d test(s) from %d module(s) using %d worker(s)' % (
+        n_total, len(tasks), n_workers))
+
+    group_records = {}
+    if n_workers > 0:
+        pool = multiprocessing.Pool(n_workers, initializer=_init_worker,
+                                    initargs=(sys.argv,))
+        try:
+            try:
+                for groupx, records in pool.imap_unordered(_run_example_group,
+                                                           tasks):
+                    group_records[groupx] = records
+                    # Forward the output of each finished module as it arrives
+                    for result, n_seconds, text in records:
+                        if text:
+                            sys.stdout.write(text)
+                        if reporter is not None:
+                            reporter.report(result, result.summary, n_seconds)
+                    sys.stdout.flush()
+                pool.close()
+            except KeyboardInterrupt:
+                _log('Caught CTRL+c: Stopping tests')
+                pool.terminate()
+        finally:
+            pool.join()
+
+    # Merge results in the order the tests were collected
+    summaries = []
+    failed = []
+    warned = []
+    times = {}
+    memory_usage = {}
+    profiles = {}
+    for groupx in sorted(group_records.keys()):
+        for result, n_seconds, text in group_records[groupx]:
+            times[result] = n_seconds
+            if result.memory_usage is not None:
+                memory_usage[result] = result.memory_usage
+            if result.profile_fpath is not None:
+                profiles[result] = result.profile_fpath
+            summaries.append(result.summary)
+            if result.warn_texts:
+                warned.append(result)
+            if result.failed:
+                failed.append(result)
+
+    run_summary = _finalize_run_summary(summaries, failed, warned, times,
+                                        n_total, verbose, config=config,
+                                        _log=_log, memory_usage=memory_usage,
+                                        profiles=profiles)
+    return run_summary
+
+
+def _init_worker(argv):
+    """
+    Initializes a worker process used by :func:`_run_examples_parallel`.
+
+    Workers may be spawned instead of forked, so we restore the command line
+    of the parent process, which directives like ``REQUIRES(--flag)`` inspect.
+    """
+    sys.argv[:] = argv
+
+
+def _run_example_group(task):
+    """
+    Worker function used by :func:`_run_examples_parallel`. Runs all examples
+    from a single module and returns a picklable record of each outcome.
+
+    Returns:
+        Tuple[int, List[Tuple[DocTestResult, float, str]]]:
+            the group index and a (result, seconds, stdout) tuple for each
+            example in the group.
+    """
+    groupx, examples, verbose, isolate, trace_memory = task
+    if trace_memory:
+        # Tracing is left on, the worker may run more groups
+        _MemoryTracing().__enter__()
+    records = []
+    for example in examples:
+        max_bytes = example.config.getvalue('max_capture_bytes')
+        with utils.CaptureStdout(supress=True, max_bytes=max_bytes) as cap:
+            tic = time.time()
+            if isolate == 'fork' and not example.resolve_skips():
+                result = _run_example_forked(example, verbose)
+            else:
+                summary = example.run(verbose=verbose, on_error='return')
+                result = _compact_result(example, summary)
+            toc = time.time()
+            n_seconds = toc - tic
+        records.append((result, n_seconds, cap.text))
+    return groupx, records
+
+
+def _compact_result(example, summary):
+    """
+    Records the outcome of an example that has been run and releases the
+    tracebacks, frames, and outputs that the example holds on to.
+
+    Returns:
+        DocTestResult
+
+    Example:
+        >>> import gc
+        >>> import weakref
+        >>> from xdoctest import core
+        >>> docstr = utils.codeblock(
+        ...     '''
+        ...     >>> class Big(object):
+        ...     ...     pass
+        ...     >>> def fails(obj):
+        ...     ...     raise ValueError
+        ...     >>> big = Big()
+        ...     >>> BIG_REFS.append(weakref.ref(big))
+        ...     >>> fails(big)
+        ...     ''')
+        >>> example = list(core.parse_docstr_examples(docstr))[0]
+        >>> example.mode = 'native'
+        >>> refs = example.global_namespace['BIG_REFS'] = []
+        >>> example.global_namespace['weakref'] = weakref
+        >>> summary = example.run(verbose=0, on_error='return')
+        >>> result = _compact_result(example, summary)
+        >>> del summary
+        >>> _ = gc.collect()
+        >>> assert result.failed and result.error == 'ValueError'
+        >>> assert example.exc_info is None
+        >>> assert refs[0]() is None
+    """
+    result = doctest_example.DocTestResult.from_doctest(example, summary)
+    example._release_run_state()
+    return result
+
+
+def _run_example_forked(example, verbose):
+    """
+    Runs an example in a child process forked from the current one.
+
+    The module containing the example is imported before forking, so every
+    child shares it copy-on-write and only the first example of a module pays
+    the import cost. The child sends back its captured stdout and a
+    :class:`xdoctest.doctest_example.DocTestResult`. If the child dies
+    without reporting (e.g. a segfault in an extension module) the example is
+    reported as failed.
+
+    Returns:
+        DocTestResult
+    """
+    import pickle
+    import traceback
+    try:
+        example._import_module()
+    except Exception:
+        # The child will hit the same error and report it as a failure
+        pass
+
+    read_fd, write_fd = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:  # nocover
+        # In the child process
+        os.close(read_fd)
+        exitcode = 0
+        try:
+            text = None
+            try:
+                max_bytes = example.config.getvalue('max_capture_bytes')
+                with utils.CaptureStdout(supress=True,
+                                         max_bytes=max_bytes) as cap:
+                    summary = example.run(verbose=verbose, on_error='return')
+                    result = doctest_example.DocTestResult.from_doctest(
+                        example, summary)
+                text = cap.text
+            except BaseException:
+                result = doctest_example.DocTestResult(
+                    node=example.node, cmdline=example.cmdline, failed=True,
+                    failure_lines=traceback.format_exc().splitlines())
+            data = pickle.dumps((result, text), protocol=2)
+            with os.fdopen(write_fd, 'wb') as file:
+                file.write(data)
+        except BaseException:
+            exitcode = 1
+        finally:
+            # Never return into the caller's stack frames
+            os._exit(exitcode)
+
+    os.close(write_fd)
+    try:
+        with os.fdopen(read_fd, 'rb') as file:
+            data = file.read()
+    finally:
+        _, wait_status = os.waitpid(pid, 0)
+
+    result = None
+    if data:
+        try:
+            result, text = pickle.loads(data)
+        except Exception:
+            result = None
+    if result is None:
+        if os.WIFSIGNALED(wait_status):
+            reason = 'was killed by signal {}'.format(
+                os.WTERMSIG(wait_status))
+        else:
+            reason = 'exited with status {}'.format(
+                os.WEXITSTATUS(wait_status))
+        failure_lines = [
+            'The process running the doctest {} before it could report '
+            'a result'.format(reason),
+            '',
+            'Repro:',
+            '',
+            '    ' + example.cmdline,
+        ]
+        result = doctest_example.DocTestResult(
+            node=example.node, cmdline=example.cmdline, failed=True,
+            failure_lines=failure_lines)
+        text = None
+        if verbose >= 1:
+            failure = example._color('FAILURE', 'red')
+            text = '* {}: {}\n'.format(failure, example.node)
+    if text:
+        sys.stdout.write(text)
+    return result
+
+
+def _finalize_run_summary(summaries, failed, warned, times, n_total, verbose,
+                          config=None, _log=None, memory_usage=None,
+                          profiles=None):
+    """
+    Internal helper, reports the final counts and builds the run summary
+    """
     if verbose == 0:
         _log('')
     n_passed = sum(s['passed'] for s in summaries)
@@ -530,6 +1617,8 @@ def _run_examples(enabled_examples, verbose, config=None, _log=None):
         'n_failed': n_failed,
         'n_total': n_total,
         'times': times,
+        'memory': memory_usage or {},
+        'profiles': profiles or {},
     }
     return run_summary
 
@@ -575,7 +1664,7 @@ def _update_argparse_cli(add_argument, prefix=None):
                  default=None)
 
     add_argument(*('-c', '--command'), type=str,
-                 help='A doctest name or a command (list|all|<callname>). '
+                 help='A doctest name or a command (list|all|bench|<callname>). '
                  'Defaults to all',
                  default=None)
 
@@ -595,6 +1684,120 @@ def _update_argparse_cli(add_argument, prefix=None):
     add_argument(*('--time',), dest='time', action='store_true',
                  help=('Same as if durations=0'))
 
+    add_argument(*('--memory',), type=int,
+                 help=('Trace memory allocations and report the N doctests '
+                       'with the largest peak. N=0 reports all doctests'),
+                 default=None)
+
+    add_argument(*('--profile',), type=int,
+                 help=('Profile each doctest, write its pstats file to the '
+                       'cache dir, and report the N functions with the '
+                       'largest cumulative time. N=0 reports all functions'),
+                 default=None)
+
+    add_argument(*('--report-jsonl',), type=str, dest='report_jsonl',
+                 help=('Write a json record of each doctest to this file as '
+                       'soon as the doctest finishes'),
+                 default=None)
+
+    add_argument(*('--junitxml',), type=str, dest='junitxml',
+                 help='Write a JUnit XML report of the doctests to this file',
+                 default=None)
+
+    add_argument(*('--shuffle',), dest='shuffle', action='store_true',
+                 help=('Run the doctests in a random order. Pass the '
+                       'reported seed to --shuffle-seed to reproduce it'))
+
+    add_argument(*('--shuffle-seed',), type=int, dest='shuffle_seed',
+                 metavar='SEED',
+                 help=('Run the doctests in the random order given by this '
+                       'seed (implies --shuffle)'),
+                 default=None)
+
+    add_argument(*('--bisect-order',), dest='bisect_order',
+                 action='store_true',
+                 help=('Rerun failed doctests in subprocesses to find the '
+                       'earlier doctests they depend on'))
+
+    add_argument(*('--bench-warmup',), type=int, dest='bench_warmup',
+                 help='Number of untimed rounds of each benchmark',
+                 default=1)
+
+    add_argument(*('--bench-repeat',), type=int, dest='bench_repeat',
+                 help='Number of timed rounds of each benchmark',
+                 default=7)
+
+    add_argument(*('--bench-threshold',), type=float, dest='bench_threshold',
+                 help=('Report a benchmark as a regression if its median is '
+                       'this fraction slower than its baseline'),
+                 default=0.1)
+
+    add_argument(*('--bench-baseline',), type=str, dest='bench_baseline',
+                 help=('The json file with the baseline of each benchmark. '
+                       'Defaults to benchmarks.json in the cache dir'),
+                 default=None)
+
+    add_argument(*('--bench-update',), dest='bench_update',
+                 action='store_true',
+                 help='Replace the baselines with the new benchmark results')
+
+    add_argument(*('--jobs',), type=int,
+                 help=('Run doctests in N worker processes. Doctests from '
+                       'the same module always run in the same worker'),
+                 default=None)
+
+    add_argument(*('--isolate',), type=str,
+                 help=('How doctests are isolated from each other. "fork" '
+                       'imports each module once and runs every doctest in '
+                       'a forked child process (POSIX only)'),
+                 choices=['none', 'fork'], default='none')
+
+    add_argument(*('--lf', '--last-failed'), dest='last_failed',
+                 action='store_true',
+                 help=('Rerun only the doctests that failed the last time, '
+                       'or all doctests if none failed'))
+
+    add_argument(*('--ff', '--failed-first'), dest='failed_first',
+                 action='store_true',
+                 help=('Run the doctests that failed the last time before '
+                       'the others'))
+
+    add_argument(*('--cache-dir',), type=str,
+                 help=('Directory where xdoctest persists state between '
+                       'runs, e.g. which doctests failed'),
+                 default='.xdoctest_cache')
+
+    add_argument(*('--changed-since',), type=str, dest='changed_since',
+                 help=('Only run doctests in modules that changed since this '
+                       'git reference, or that import a changed module'),
+                 default=None)
+
+    add_argument(*('--pass-cache',), dest='pass_cache', action='store_true',
+                 help=('Do not rerun doctests that passed before if neither '
+                       'they, their module, nor the config changed. Changes '
+                       'to other modules are NOT detected'))
+
+    add_argument(*('--clear-pass-cache',), dest='clear_pass_cache',
+                 action='store_true',
+                 help='Forget which doctests passed before running')
+
+    add_argument(*('--stream',), dest='stream', action='store_true',
+                 help=('Run each doctest as soon as its module is collected '
+                       'instead of collecting everything first'))
+
+    add_argument(*('--collection-cache',), dest='collection_cache',
+                 action='store_true',
+                 help=('Reuse the doctests collected from modules that did '
+                       'not change since the last run'))
+
+    add_argument(*('--code-cache',), dest='code_cache', action='store_true',
+                 help=('Reuse the code compiled for doctest parts that did '
+                       'not change since the last run'))
+
+    add_argument(*('--collect-jobs',), type=int, dest='collect_jobs',
+                 help='Parse modules in N worker processes',
+                 default=None)
+
     add_argument_kws = [
         # (['--style'], dict(dest='style',
         #                    type=str, help='choose your style',
@@ -686,6 +686,40 @@ def parse_calldefs(source=None, fpath=None):
     return parse_static_calldefs(source=source, fpath=fpath)
 
 
+def search_file_bytes(fpath, pattern):
+    """
+    Checks if a regex matches the raw bytes of a file without decoding or
+    parsing it. The file is memory mapped when possible, so it is scanned in
+    place instead of being copied into memory.
+
+    Args:
+        fpath (str): path to the file to search
+        pattern (bytes | Pattern): a regex over bytes
+
+    Returns:
+        bool: True if the pattern matches anywhere in the file
+
+    Example:
+        >>> from xdoctest import static_analysis
+        >>> fpath = static_analysis.__file__.replace('.pyc', '.py')
+        >>> assert search_file_bytes(fpath, b'>>> ')
+        >>> assert not search_file_bytes(fpath, b'zq' * 3)
+    """
+    import mmap
+    if not hasattr(pattern, 'search'):
+        pattern = re.compile(pattern)
+    with open(fpath, 'rb') as file_:
+        try:
+            data = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            # Empty files and some special files cannot be mapped
+            return pattern.search(file_.read()) is not None
+        try:
+            return pattern.search(data) is not None
+        finally:
+            data.close()
+
+
 def _parse_static_node_value(node):
     """
     Extract a constant value from a node if possible
@@ -772,6 +806,91 @@ def parse_static_value(key, source=None, fpath=None):
     return visitor.value
 
 
+def parse_static_imports(source=None, fpath=None, modname=None, is_pkg=None):
+    """
+    Statically finds the names of all modules imported by python source
+
+    Imports anywhere in the source are considered (not only at the top
+    level). Because importing a submodule also imports its parent packages,
+    the parents of each imported module are included as well. For
+    ``from x import y`` both ``x`` and ``x.y`` are returned, because ``y``
+    may be a submodule.
+
+    Args:
+        source (str): python text
+        fpath (str): filepath to read if source is not specified
+        modname (str): the name of the module the source belongs to, which
+            is used to resolve relative imports. Inferred from fpath if not
+            given. If unknown, relative imports are ignored.
+        is_pkg (bool): True if the source is a package ``__init__`` file.
+            Inferred from fpath if not given.
+
+    Returns:
+        Set[str]: absolute names of the imported modules
+
+    Example:
+        >>> from xdoctest.static_analysis import *
+        >>> source = utils.codeblock(
+        ...     '''
+        ...     import os.path
+        ...     from collections import OrderedDict
+        ...     from . import sibling
+        ...     from ..other import func as alias
+        ...     def foo():
+        ...         import xml.etree as etree
+        ...     ''')
+        >>> names = parse_static_imports(source, modname='pkg.sub.mod')
+        >>> print(sorted(names))
+        ['collections', 'collections.OrderedDict', 'os', 'os.path', 'pkg', 'pkg.other', 'pkg.other.func', 'pkg.sub', 'pkg.sub.sibling', 'xml', 'xml.etree']
+        >>> names = parse_static_imports('from . import mod', modname='pkg', is_pkg=True)
+        >>> print(sorted(names))
+        ['pkg', 'pkg.mod']
+    """
+    if source is None:  # pragma: no branch
+        with open(fpath, 'rb') as file_:
+            source = file_.read().decode('utf-8')
+    if fpath is not None:
+        if modname is None:
+            modname = modpath_to_modname(fpath, check=False)
+        if is_pkg is None:
+            is_pkg = os.path.basename(fpath).startswith('__init__.')
+    pt = ast.parse(source)
+
+    def _with_parents(name):
+        parts = name.split('.')
+        return ['.'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+    imported = set()
+    for node in ast.walk(pt):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported.update(_with_parents(alias.name))
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                # Resolve the package a relative import is relative to
+                if not modname:
+                    continue
+                base_parts = modname.split('.')
+                n_drop = node.level - 1 if is_pkg else node.level
+                if n_drop >= len(base_parts):
+                    # The import goes beyond the top-level package
+                    continue
+                if n_drop:
+                    base_parts = base_parts[:-n_drop]
+                base = '.'.join(base_parts)
+                if node.module:
+                    base = base + '.' + node.module
+            else:
+                base = node.module
+            if not base:
+                continue
+            imported.update(_with_parents(base))
+            for alias in node.names:
+                if alias.name != '*':
+                    imported.add(base + '.' + alias.name)
+    return imported
+
+
 def package_modpaths(pkgpath, with_pkg=False, with_mod=True, followlinks=True,
                      recursive=True, with_libs=False, check=True):
     r"""
@@ -949,6 +1068,151 @@ def is_balanced_statement(lines, only_tokens=False, reraise=0):
         return True
 
 
+def take_balanced_statement(lines, tokens=None):
+    r"""
+    Consumes lines from an iterator until they form a balanced statement.
+
+    This is an incremental version of :func:`is_balanced_statement` with
+    ``only_tokens=True``. The lines are tokenized in a single pass and the
+    next line is only requested while the lines so far are not balanced, so
+    the cost is linear in the length of the statement instead of quadratic.
+    Like :func:`is_balanced_statement`, empty lines are ignored by the
+    tokenizer.
+
+    Args:
+        lines (Iterable[str]): lines of source code without newlines.
+            Lines after the balanced statement are left in the iterator.
+
+        tokens (List[Tuple], default=None): if specified, the tokens of the
+            statement are appended to this list as ``(type, string, start,
+            end)`` tuples, where the row of each position is the index of
+            a yielded line. This lets callers reuse the tokenization.
+
+    Yields:
+        str: each line that belongs to the statement
+
+    Raises:
+        tokenize.TokenError: if the lines run out before the statement is
+            balanced.
+        IndentationError: if a dedent does not match an outer indentation
+
+    Example:
+        >>> from xdoctest.static_analysis import *  # NOQA
+        >>> lines = iter(['x = [1,', '', '     2]', '# a', "y = '''", "'''"])
+        >>> list(take_balanced_statement(lines))
+        ['x = [1,', '', '     2]']
+        >>> list(take_balanced_statement(lines))
+        ['# a']
+        >>> list(take_balanced_statement(lines))
+        ["y = '''", "'''"]
+        >>> list(take_balanced_statement(lines))
+        []
+        >>> import tokenize
+        >>> import pytest
+        >>> with pytest.raises(tokenize.TokenError):
+        >>>     list(take_balanced_statement(['foo(', "')('"]))
+    """
+    line_iter = iter(lines)
+    consumed = deque()  # lines read by the tokenizer but not yet yielded
+    state = {
+        'depth': 0,      # number of open brackets
+        'end': (0, 0),   # end position of the last token
+        'last': None,    # the last line given to the tokenizer
+        'lnum': 0,       # number of lines given to the tokenizer
+        'started': False,
+        'nread': 0,      # number of lines read from the iterator
+    }
+    rows = [None]  # maps tokenizer rows to indices of the lines read
+
+    def _is_balanced():
+        # Called when the tokenizer asks for the next line, so every token in
+        # the previous lines has been seen. Those lines are balanced unless a
+        # bracket is still open or the end of the last line was not tokenized,
+        # which happens when it starts a multi-line string or continuation.
+        if state['last'] is None:
+            return True
+        tail = (state['lnum'], len(state['last'].rstrip(' \t\f\r\n')))
+        return state['depth'] == 0 and state['end'] >= tail
+
+    def _readline():
+        while not state['started'] or not _is_balanced():
+            line = next(line_iter)  # StopIteration is treated as EOF
+            state['started'] = True
+            state['nread'] += 1
+            consumed.append(line)
+            # Only give non-empty lines to the tokenizer otherwise it will
+            # stop short
+            if line:
+                state['last'] = line
+                state['lnum'] += 1
+                rows.append(state['nread'] - 1)
+                return line
+        return ''
+
+    for token in tokenize.generate_tokens(_readline):
+        tok_type, tok_str, tok_end = token[0], token[1], token[3]
+        if tok_type == tokenize.OP:
+            if tok_str in {'(', '[', '{'}:
+                state['depth'] += 1
+            elif tok_str in {')', ']', '}'}:
+                state['depth'] -= 1
+        if tok_end > state['end']:
+            state['end'] = tok_end
+        if tokens is not None and token[2][0] < len(rows):
+            tok_start = token[2]
+            tokens.append((tok_type, tok_str,
+                           (rows[tok_start[0]], tok_start[1]),
+                           (rows[min(tok_end[0], len(rows) - 1)], tok_end[1])))
+        while consumed:
+            yield consumed.popleft()
+    while consumed:
+        yield consumed.popleft()
+
+
+def balanced_intervals(lines, tokens=None):
+    """
+    Partitions lines into consecutive balanced statements.
+
+    Each line is tokenized once (see :func:`take_balanced_statement`).
+
+    Args:
+        lines (List[str]): lines of source code without newlines
+
+        tokens (List[Tuple], default=None): if specified, the tokens of each
+            statement are appended to this list. Rows are indices into lines.
+
+    Returns:
+        List[Tuple[int, int]]: the start (inclusive) and stop (exclusive)
+            index of each statement.
+
+    Raises:
+        tokenize.TokenError: if the last statement is not balanced
+        IndentationError: if a dedent does not match an outer indentation
+
+    Example:
+        >>> from xdoctest.static_analysis import *  # NOQA
+        >>> lines = ['x = 1', '# a comment', 'y = (', '   2)', "'''", "'''"]
+        >>> balanced_intervals(lines)
+        [(0, 1), (1, 2), (2, 4), (4, 6)]
+    """
+    intervals = []
+    line_iter = iter(lines)
+    start = 0
+    while start < len(lines):
+        stop = start
+        stmt_tokens = None if tokens is None else []
+        for _ in take_balanced_statement(line_iter, stmt_tokens):
+            stop += 1
+        if tokens is not None:
+            tokens.extend(
+                (t[0], t[1], (t[2][0] + start, t[2][1]),
+                 (t[3][0] + start, t[3][1]))
+                for t in stmt_tokens)
+        intervals.append((start, stop))
+        start = stop
+    return intervals
+
+
 def extract_comments(source):
     """
     Returns the text in each comment in a block of python code.
@@ -26,14 +26,17 @@ from xdoctest.utils.util_path import (TempDir, ensuredir,)
 from xdoctest.utils.util_str import (add_line_numbers, codeblock, color_text,
                                      ensure_unicode, highlight_code, indent,
                                      strip_ansi,)
-from xdoctest.utils.util_stream import (CaptureStdout, CaptureStream,
-                                        TeeStringIO,)
+from xdoctest.utils.util_stream import (BoundedTeeIO, CaptureFD,
+                                        CaptureStdout, CaptureStream,
+                                        TeeStringIO, truncate_output,)
 
-__all__ = ['CaptureStdout', 'CaptureStream', 'NiceRepr', 'PythonPathContext',
+__all__ = ['BoundedTeeIO', 'CaptureFD', 'CaptureStdout', 'CaptureStream',
+           'NiceRepr', 'PythonPathContext',
            'TeeStringIO', 'TempDir', 'TempDoctest', 'add_line_numbers',
            'codeblock', 'color_text', 'ensure_unicode', 'ensuredir',
            'highlight_code', 'import_module_from_name',
            'import_module_from_path', 'indent', 'is_modname_importable',
            'modname_to_modpath', 'modpath_to_modname', 'normalize_modpath',
-           'split_modpath', 'strip_ansi', 'util_import', 'util_misc',
+           'split_modpath', 'strip_ansi', 'truncate_output', 'util_import',
+           'util_misc',
            'util_mixins', 'util_path', 'util_str', 'util_stream']
@@ -8,8 +8,17 @@ prevents it from actually reaching stdout.
 The :class:`TeeStringIO` does the same thing but for arbitrary streams. It is
 how the former is implemented.
 
+The :class:`CaptureFD` captures at the file descriptor level instead, so it
+also captures output written by C extensions and subprocesses.
+
+Both can be given a ``max_bytes`` limit, in which case only the head and the
+tail of the output of each part are kept (see :class:`BoundedTeeIO`).
+
 """
 from __future__ import print_function, division, absolute_import, unicode_literals
+from functools import partial
+import collections
+import os
 import sys
 import six
 import io
@@ -99,6 +108,144 @@ class TeeStringIO(io.StringIO):
         super(TeeStringIO, self).flush()
 
 
+class BoundedTeeIO(TeeStringIO):
+    r"""
+    A :class:`TeeStringIO` that only keeps the head and the tail of the text
+    written to it, so its memory use is bounded no matter how much is written.
+
+    Like :class:`CaptureFD`, the size of the text is measured in utf8 encoded
+    bytes. A character that is cut in half by the truncation is replaced.
+
+    Args:
+        max_bytes (int): the number of bytes to keep. The first half is taken
+            from the start of the text and the second from its end.
+        redirect (io.IOBase): The other stream to write to.
+
+    Example:
+        >>> self = BoundedTeeIO(max_bytes=10)
+        >>> for i in range(100):
+        ...     self.write('{}\n'.format(i))
+        >>> print(self.getvalue().strip())
+        0
+        1
+        2
+        <... 280 bytes truncated ...>
+        8
+        99
+        >>> self.clear()
+        >>> self.write('short')
+        >>> print(self.getvalue())
+        short
+        >>> self = BoundedTeeIO(max_bytes=8)
+        >>> self.write('\u00e9' * 6)
+        >>> print(self.getvalue())
+        éé
+        <... 4 bytes truncated ...>
+        éé
+    """
+    def __init__(self, max_bytes, redirect=None):
+        super(BoundedTeeIO, self).__init__(redirect)
+        self.max_bytes = max_bytes
+        self.clear()
+
+    def clear(self):
+        """ Forget everything that has been written """
+        self.n_written = 0
+        self._head = []
+        self._n_head = 0
+        self._tail = collections.deque()
+        self._n_tail = 0
+
+    def write(self, msg):
+        """
+        Write to the redirected stream and keep the head and tail of the text
+        """
+        if self.redirect is not None:
+            self.redirect.write(msg)
+        if six.PY2:
+            from xdoctest.utils.util_str import ensure_unicode
+            msg = ensure_unicode(msg)
+        data = msg.encode('utf8')
+        self.n_written += len(data)
+        max_head = self.max_bytes // 2
+        if self._n_head < max_head:
+            chunk = data[:max_head - self._n_head]
+            self._head.append(chunk)
+            self._n_head += len(chunk)
+            data = data[len(chunk):]
+        max_tail = self.max_bytes - max_head
+        if data and max_tail:
+            data = data[-max_tail:]
+            self._tail.append(data)
+            self._n_tail += len(data)
+            # Drop chunks that are entirely outside of the tail
+            while self._n_tail - len(self._tail[0]) >= max_tail:
+                self._n_tail -= len(self._tail.popleft())
+
+    def getvalue(self):
+        """
+        Returns:
+            str: the head and the tail of the text, separated by a marker if
+                anything between them was dropped
+        """
+        max_tail = self.max_bytes - self.max_bytes // 2
+        tail = b''.join(self._tail)
+        tail = tail[max(len(tail) - max_tail, 0):]
+        n_truncated = self.n_written - self._n_head - len(tail)
+        return (b''.join(self._head).decode('utf8', 'replace') +
+                _truncation_marker(n_truncated) +
+                tail.decode('utf8', 'replace'))
+
+
+def truncate_output(text, max_bytes):
+    """
+    Keeps the head and the tail of a captured output, like
+    :class:`BoundedTeeIO`.
+
+    Args:
+        text (str): the output
+        max_bytes (int | None): the number of utf8 encoded bytes to keep. If
+            None the text is returned as is.
+
+    Returns:
+        str
+
+    Example:
+        >>> print(truncate_output('abcdefghijklmnop', 6))
+        abc
+        <... 10 bytes truncated ...>
+        nop
+        >>> print(truncate_output('abc', 6))
+        abc
+        >>> print(truncate_output('\u00e9' * 3, 6))
+        ééé
+        >>> print(truncate_output('\u00e9' * 5, 8))
+        éé
+        <... 2 bytes truncated ...>
+        éé
+    """
+    if max_bytes is None:
+        return text
+    if six.PY2:
+        from xdoctest.utils.util_str import ensure_unicode
+        text = ensure_unicode(text)
+    data = text.encode('utf8')
+    if len(data) <= max_bytes:
+        return text
+    max_head = max_bytes // 2
+    head = data[:max_head]
+    tail = data[len(data) - (max_bytes - max_head):]
+    return (head.decode('utf8', 'replace') +
+            _truncation_marker(len(data) - max_bytes) +
+            tail.decode('utf8', 'replace'))
+
+
+def _truncation_marker(n_truncated):
+    if n_truncated <= 0:
+        return ''
+    return '\n<... {} bytes truncated ...>\n'.format(n_truncated)
+
+
 class CaptureStream(object):
     """
     Generic class for capturing streaming output from stdout or stderr
@@ -114,6 +261,17 @@ class CaptureStdout(CaptureStream):
             if True, stdout is not printed while captured
         enabled (bool, default=True):
             does nothing if this is False
+        max_bytes (int | None, default=None):
+            if specified, each part only keeps the head and the tail of its
+            output. The output is also bounded while it is written, unless
+            :attr:`keep_full` is set before the part is started.
+
+    Attributes:
+        parts (List[str]): the (possibly truncated) output of each part
+        text (str): the output of the last part, which is complete if
+            :attr:`keep_full` was set
+        keep_full (bool): if True, the output of the next part is buffered in
+            full and only truncated when it is logged
 
     Example:
         >>> self = CaptureStdout(supress=True)
@@ -136,35 +294,64 @@ class CaptureStdout(CaptureStream):
         >>> with self:
         ...     print('dont capture')
         >>> assert self.text is None
+
+    Example:
+        >>> self = CaptureStdout(supress=True, max_bytes=8)
+        >>> with self:
+        ...     print('a long line of output')
+        >>> self.keep_full = True
+        >>> with self:
+        ...     print('another long line')
+        >>> print(self.parts[0])
+        a lo
+        <... 14 bytes truncated ...>
+        put
+        >>> print(self.text.strip())
+        another long line
     """
-    def __init__(self, supress=True, enabled=True):
+    def __init__(self, supress=True, enabled=True, max_bytes=None):
         self.enabled = enabled
         self.supress = supress
+        self.max_bytes = max_bytes
+        self.keep_full = False
         self.orig_stdout = sys.stdout
         if supress:
             redirect = None
         else:
             redirect = self.orig_stdout
         self.cap_stdout = TeeStringIO(redirect)
+        if max_bytes is None:
+            self.cap_bounded = None
+        else:
+            self.cap_bounded = BoundedTeeIO(max_bytes, redirect)
         self.text = None
 
-        self._pos = 0  # keep track of how much has been logged
         self.parts = []
         self.started = False
 
     def log_part(self):
         """ Log what has been captured so far """
-        self.cap_stdout.seek(self._pos)
-        text = self.cap_stdout.read()
-        self._pos = self.cap_stdout.tell()
-        self.parts.append(text)
+        if sys.stdout is self.cap_bounded:
+            text = self.cap_bounded.getvalue()
+            self.cap_bounded.clear()
+            self.parts.append(text)
+        else:
+            text = self.cap_stdout.getvalue()
+            # Logged text is dropped so the buffer never holds more than one
+            # part
+            self.cap_stdout.seek(0)
+            self.cap_stdout.truncate()
+            self.parts.append(truncate_output(text, self.max_bytes))
         self.text = text
 
     def start(self):
         if self.enabled:
             self.text = ''
             self.started = True
-            sys.stdout = self.cap_stdout
+            if self.cap_bounded is None or self.keep_full:
+                sys.stdout = self.cap_stdout
+            else:
+                sys.stdout = self.cap_bounded
 
     def stop(self):
         """
@@ -189,6 +376,9 @@ class CaptureStdout(CaptureStream):
     def close(self):
         self.cap_stdout.close()
         self.cap_stdout = None
+        if self.cap_bounded is not None:
+            self.cap_bounded.close()
+            self.cap_bounded = None
 
     def __exit__(self, type_, value, trace):
         if self.enabled:
@@ -200,3 +390,263 @@ class CaptureStdout(CaptureStream):
                 self.stop()
         if trace is not None:
             return False  # return a falsey value on error
+
+
+class CaptureFD(CaptureStream):
+    r"""
+    Context manager that captures stdout and stderr by redirecting file
+    descriptors 1 and 2 to temporary files (Python 3 only).
+
+    Unlike :class:`CaptureStdout` this captures output that bypasses
+    ``sys.stdout``, e.g. from C extensions or subprocesses. Each time the
+    context is exited the byte offsets of the output are recorded as a part,
+    and the text of a part is only decoded when it is requested.
+
+    Args:
+        supress (bool, default=True):
+            if True, the captured output is not written to the original
+            stdout and stderr after each part
+        enabled (bool, default=True):
+            does nothing if this is False
+        max_bytes (int | None, default=None):
+            if specified, :func:`part_text` only decodes the head and the tail
+            of a part, and :func:`detach` only keeps those in memory
+
+    Attributes:
+        parts (List[Tuple[int, int]]): byte offsets of each stdout part
+        stderr_parts (List[Tuple[int, int]]): byte offsets of each stderr part
+
+    Example:
+        >>> # xdoctest: +REQUIRES(PY3)
+        >>> import subprocess
+        >>> self = CaptureFD(supress=True)
+        >>> with self:
+        ...     print('from python')
+        ...     _ = subprocess.call([sys.executable, '-c', 'print("from a child")'])
+        >>> with self:
+        ...     os.write(2, b'to stderr\n')
+        >>> print(repr(self.part_text(0)))
+        'from python\nfrom a child\n'
+        >>> print(repr(self.text), repr(self.stderr_text))
+        '' 'to stderr\n'
+        >>> self.detach()
+        >>> print(repr(self.part_text(1, stream='stderr')))
+        'to stderr\n'
+
+    Example:
+        >>> self = CaptureFD(supress=True, enabled=False)
+        >>> with self:
+        ...     print('dont capture')
+        >>> assert self.text is None
+
+    Example:
+        >>> # xdoctest: +REQUIRES(PY3)
+        >>> self = CaptureFD(supress=True, max_bytes=8)
+        >>> with self:
+        ...     print('a long line of output')
+        >>> print(self.text.strip())
+        a long line of output
+        >>> self.detach()
+        >>> print(self.part_text(0))
+        a lo
+        <... 14 bytes truncated ...>
+        put
+    """
+    def __init__(self, supress=True, enabled=True, max_bytes=None):
+        self.enabled = enabled
+        self.supress = supress
+        self.max_bytes = max_bytes
+        self.started = False
+        self.parts = []
+        self.stderr_parts = []
+        self._files = None
+        self._data = None
+        self._decoded = {}
+        self._last_full = None
+
+    @property
+    def text(self):
+        """ The complete stdout of the last part (until it is detached) """
+        if not self.parts:
+            return '' if self.started else None
+        return self._full_text(len(self.parts) - 1, 'stdout')
+
+    @property
+    def stderr_text(self):
+        """ The complete stderr of the last part (until it is detached) """
+        if not self.stderr_parts:
+            return '' if self.started else None
+        return self._full_text(len(self.stderr_parts) - 1, 'stderr')
+
+    def _full_text(self, index, stream):
+        if self.max_bytes is None or self._files is None:
+            return self.part_text(index, stream=stream)
+        # Only the most recent complete text is cached
+        key = (stream, index)
+        if self._last_full is None or self._last_full[0] != key:
+            self._last_full = (key, self._decode(stream, index, None))
+        return self._last_full[1]
+
+    def part_text(self, index, stream='stdout'):
+        """
+        Decodes the output of a part, truncated to ``max_bytes``
+
+        Args:
+            index (int): the index of the part
+            stream (str): either stdout or stderr
+
+        Returns:
+            str
+        """
+        key = (stream, index)
+        if key not in self._decoded:
+            self._decoded[key] = self._decode(stream, index, self.max_bytes)
+        return self._decoded[key]
+
+    def _decode(self, stream, index, max_bytes):
+        streamx = 0 if stream == 'stdout' else 1
+        offsets = (self.parts, self.stderr_parts)[streamx]
+        start, stop = offsets[index]
+        n_truncated = 0 if max_bytes is None else stop - start - max_bytes
+        if n_truncated <= 0:
+            return self._read(streamx, start, stop).decode('utf8', 'replace')
+        # Only the head and the tail are read. A character cut in half by
+        # the truncation is decoded as a replacement character.
+        max_head = max_bytes // 2
+        head = self._read(streamx, start, start + max_head)
+        tail = self._read(streamx, stop - (max_bytes - max_head), stop)
+        return (head.decode('utf8', 'replace') +
+                _truncation_marker(n_truncated) +
+                tail.decode('utf8', 'replace'))
+
+    def part_loader(self, stream='stdout'):
+        """
+        Returns:
+            Callable[[], str]: decodes the last part when called
+        """
+        offsets = self.parts if stream == 'stdout' else self.stderr_parts
+        return partial(self.part_text, len(offsets) - 1, stream=stream)
+
+    def _read(self, streamx, start, stop):
+        if self._data is not None:
+            return self._data[streamx][start:stop]
+        fd = self._files[streamx].fileno()
+        os.lseek(fd, start, os.SEEK_SET)
+        chunks = []
+        n_remain = stop - start
+        while n_remain > 0:
+            chunk = os.read(fd, n_remain)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            n_remain -= len(chunk)
+        return b''.join(chunks)
+
+    def log_part(self):
+        """ Record the offsets of what has been captured so far """
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for streamx, offsets in enumerate([self.parts, self.stderr_parts]):
+            fd = self._files[streamx].fileno()
+            offsets.append((self._starts[streamx],
+                            os.lseek(fd, 0, os.SEEK_END)))
+
+    def start(self):
+        if not self.enabled:
+            return
+        import tempfile
+        if self._files is None:
+            self._files = (tempfile.TemporaryFile(), tempfile.TemporaryFile())
+        for stream in [sys.stdout, sys.stderr]:
+            try:
+                stream.flush()
+            except Exception:  # nocover
+                pass
+        self._orig_streams = (sys.stdout, sys.stderr)
+        self._saved_fds = (os.dup(1), os.dup(2))
+        # Writes always go to the end, even if a part was read in between
+        self._starts = tuple(os.lseek(file.fileno(), 0, os.SEEK_END)
+                             for file in self._files)
+        os.dup2(self._files[0].fileno(), 1)
+        os.dup2(self._files[1].fileno(), 2)
+        # sys.stdout may have been replaced by an object without a file
+        # descriptor, so python output is explicitly sent to the new fds
+        sys.stdout = _fd_text_stream(1)
+        sys.stderr = _fd_text_stream(2)
+        self.started = True
+
+    def stop(self):
+        """
+        Example:
+            >>> CaptureFD(enabled=False).stop()
+            >>> CaptureFD(enabled=True).stop()
+        """
+        if not self.enabled or not self.started:
+            return
+        self.started = False
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            sys.stdout, sys.stderr = self._orig_streams
+            for fd, saved_fd in zip([1, 2], self._saved_fds):
+                os.dup2(saved_fd, fd)
+                os.close(saved_fd)
+        if not self.supress and self.parts:
+            # Show the output after the fact, through the original streams
+            self._orig_streams[0].write(self.text)
+            self._orig_streams[1].write(self.stderr_text)
+
+    def detach(self):
+        """
+        Reads all captured output into memory and closes the temporary
+        files. Parts can still be decoded afterwards. If ``max_bytes`` is
+        specified only the truncated text of each part is kept.
+        """
+        if self._files is not None and not self.started:
+            if self.max_bytes is None:
+                self._data = tuple(
+                    self._read(streamx, 0, os.lseek(file.fileno(), 0,
+                                                    os.SEEK_END))
+                    for streamx, file in enumerate(self._files))
+            else:
+                for index in range(len(self.parts)):
+                    self.part_text(index)
+                for index in range(len(self.stderr_parts)):
+                    self.part_text(index, stream='stderr')
+                self._last_full = None
+            self.close()
+
+    def close(self):
+        if self._files is not None:
+            for file in self._files:
+                file.close()
+            self._files = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __del__(self):  # nocover
+        if self.started:
+            self.stop()
+        self.close()
+
+    def __exit__(self, type_, value, trace):
+        if self.enabled:
+            try:
+                self.log_part()
+            finally:
+                self.stop()
+        if trace is not None:
+            return False  # return a falsey value on error
+
+
+def _fd_text_stream(fd):
+    """
+    Opens an unbuffered text stream on a file descriptor, so its output is
+    never reordered with output written to the descriptor directly.
+    """
+    raw = io.FileIO(fd, 'w', closefd=False)
+    return io.TextIOWrapper(raw, encoding='utf8', errors='backslashreplace',
+                            line_buffering=True, write_through=True)